@@ -1,38 +1,97 @@
+import click
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
-from flask_mail import Mail
-from flasgger import Swagger
-import telegram
 from config import Config
+from app.utils.lazy import LazyProxy
 
 # Initialize Flask extensions
 db = SQLAlchemy()
-migrate = Migrate()
-mail = Mail()
-bot = None
+# Flask-Mail and the Telegram bot are built on first use with LAZY_STARTUP
+# (python-telegram-bot alone pulls in httpx and its whole stack).
+mail = LazyProxy()
+bot = LazyProxy()
 
 def create_app(config_class=Config):
     app = Flask(__name__)
     app.config.from_object(config_class)
+    lazy = app.config['LAZY_STARTUP']
+    if app.config['JSON_PROVIDER'] == 'orjson':
+        from app.utils.json_provider import OrjsonProvider
+        app.json = OrjsonProvider(app)
 
     # Initialize extensions
     db.init_app(app)
-    migrate.init_app(app, db)
-    mail.init_app(app)
-    
+    # Flask-Migrate (and Alembic) only matter to `flask db`.
+    if not lazy or click.get_current_context(silent=True) is not None:
+        from flask_migrate import Migrate
+        Migrate(app, db)
+
+    def build_mail():
+        from flask_mail import Mail
+        return Mail(app)
+
+    mail.bind(build_mail)
+    if app.config['MAIL_POOL_ENABLED']:
+        from app.utils.mail_pool import mail_pool
+        mail_pool.init_app(app)
+
     # Initialize Swagger
-    swagger = Swagger(app, template={
-        'title': 'Electric Checker API',
-        'uiversion': 3,
-        'specs_route': '/swagger/',
-        'openapi': '3.0.2',
-        'static_url_path': '/flasgger_static',
-        'swagger_ui': True
-    })
-    
-    global bot
-    bot = telegram.Bot(token=Config.TELEGRAM_TOKEN)
+    from app.utils.apidocs import init_apidocs
+    init_apidocs(app)
+
+    def build_bot():
+        import telegram
+        from telegram.request import HTTPXRequest
+        return telegram.Bot(token=app.config['TELEGRAM_TOKEN'], base_url=app.config['TELEGRAM_API_URL'], request=HTTPXRequest(
+            connection_pool_size=app.config['TELEGRAM_CONNECTION_POOL_SIZE'],
+            pool_timeout=app.config['TELEGRAM_POOL_TIMEOUT']
+        ))
+
+    bot.bind(build_bot)
+    if not lazy:
+        mail.get()
+        bot.get()
+
+    from app.utils.async_runner import async_runner
+    async_runner.init_app(app, bot)
+
+    from app.utils.log_sink import init_log_sink
+    init_log_sink(app)
+
+    if app.config['QUERY_STATS_ENABLED']:
+        from app.utils.query_stats import query_stats
+        query_stats.init_app(app)
+
+    if app.config['METRICS_ENABLED']:
+        from app.utils.metrics import metrics
+        metrics.init_app(app)
+
+    if app.config['PROFILING_ENABLED']:
+        from app.utils.profiler import request_profiler
+        request_profiler.init_app(app)
+
+    from app.utils.health import health_prober
+    health_prober.init_app(app, bot)
+
+    if app.config['LICENSE_INDEX_ENABLED']:
+        from app.utils.license_index import license_index
+        license_index.init_app(app)
+
+    if app.config['HEARTBEAT_WRITE_BEHIND']:
+        from app.utils.heartbeat_buffer import heartbeat_buffer
+        heartbeat_buffer.init_app(app)
+
+    if app.config['PERIODIC_CHECK_SCHEDULER']:
+        from app.utils.periodic_check import periodic_check_scheduler
+        periodic_check_scheduler.init_app(app)
+
+    if app.config['OUTAGE_DETECTOR_ENABLED']:
+        from app.utils.outage_detector import outage_detector
+        outage_detector.init_app(app)
+
+    if app.config['LOG_ROLLUPS_ENABLED']:
+        from app.utils.log_rollups import log_rollup_refresher
+        log_rollup_refresher.init_app(app)
 
     # Register blueprints
     from app.routes.admin import admin_bp
@@ -45,4 +104,7 @@ def create_app(config_class=Config):
     app.register_blueprint(telegram_bp, url_prefix='/telegram')
     app.register_blueprint(root_bp, url_prefix='/')
 
+    from app.commands import register_commands
+    register_commands(app)
+
     return app 
\ No newline at end of file
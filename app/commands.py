@@ -0,0 +1,162 @@
+import json
+
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+from app.utils.log_rollups import refresh_log_rollups
+from app.utils.log_partitions import apply_retention, create_partitions
+from app.utils.outbox import run_outbox_workers
+from app.utils.query_plans import check_heartbeat_flush, check_query_plans, seed
+
+
+@click.command('outbox-worker')
+@click.option('--workers', type=int, default=None, help='Number of worker threads (default: OUTBOX_WORKERS).')
+@click.option('--batch-size', type=int, default=None, help='Rows claimed per batch (default: OUTBOX_BATCH_SIZE).')
+@click.option('--once', is_flag=True, help='Deliver everything that is due, then exit.')
+@with_appcontext
+def outbox_worker_command(workers, batch_size, once):
+    """Deliver queued notifications from the notification outbox."""
+    app = current_app._get_current_object()
+    processed = run_outbox_workers(
+        app,
+        workers=workers or app.config['OUTBOX_WORKERS'],
+        batch_size=batch_size or app.config['OUTBOX_BATCH_SIZE'],
+        poll_interval=app.config['OUTBOX_POLL_INTERVAL'],
+        once=once
+    )
+    if once:
+        click.echo(f"Processed {processed} outbox rows.")
+
+
+@click.command('check-query-plans')
+@click.option('--seed-users', type=int, default=0, help='Insert this many synthetic users first (test databases only!).')
+@click.option('--seed-logs', type=int, default=0, help='Insert this many synthetic log rows first (test databases only!).')
+@with_appcontext
+def check_query_plans_command(seed_users, seed_logs):
+    """EXPLAIN the hot route queries and fail on sequential scans or a broken heartbeat flush."""
+    if seed_users or seed_logs:
+        seed(seed_users, seed_logs)
+
+    failed = False
+    for route, ok, plan in check_query_plans():
+        click.echo(f"{'OK ' if ok else 'SEQ'} {route}")
+        for line in plan:
+            click.echo(f"      {line}")
+        failed = failed or not ok
+
+    ok, detail = check_heartbeat_flush()
+    click.echo(f"{'OK ' if ok else 'ERR'} heartbeat flush of 2 rows")
+    click.echo(f"      {detail}")
+    failed = failed or not ok
+
+    if failed:
+        raise SystemExit(1)
+
+
+@click.group('logs')
+def logs_group():
+    """Maintain log partitions and retention."""
+
+
+@logs_group.command('create-partitions')
+@click.option('--ahead', type=int, default=None, help='Future partitions per group (default: LOG_PARTITIONS_AHEAD).')
+@with_appcontext
+def create_partitions_command(ahead):
+    """Create the current and upcoming time partitions of the log table."""
+    config = current_app.config
+    created = create_partitions(
+        config['LOG_RETENTION_GROUPS'],
+        ahead=config['LOG_PARTITIONS_AHEAD'] if ahead is None else ahead
+    )
+    click.echo(f"Created {len(created)} log partitions.")
+    for name in created:
+        click.echo(f"  {name}")
+
+
+@logs_group.command('apply-retention')
+@click.option('--archive-dir', default=None, help='Archive expired rows here before dropping them (default: LOG_ARCHIVE_DIR).')
+@with_appcontext
+def apply_retention_command(archive_dir):
+    """Drop (or archive) logs past their group's retention."""
+    config = current_app.config
+    removed = apply_retention(config['LOG_RETENTION_GROUPS'], archive_dir=archive_dir or config['LOG_ARCHIVE_DIR'])
+    for group, rows in removed.items():
+        click.echo(f"{group}: removed {rows} rows")
+
+
+@logs_group.command('refresh-rollups')
+@click.option('--batch-size', type=int, default=None, help='Log rows per batch (default: LOG_ROLLUP_BATCH_SIZE).')
+@click.option('--max-batches', type=int, default=None, help='Stop after this many batches.')
+@with_appcontext
+def refresh_rollups_command(batch_size, max_batches):
+    """Fold new log rows into the hourly and daily log rollups."""
+    config = current_app.config
+    rows, batches = refresh_log_rollups(
+        batch_size or config['LOG_ROLLUP_BATCH_SIZE'],
+        config['LOG_ROLLUP_SAFETY_LAG_SECONDS'],
+        config['LOG_ROLLUP_GAP_TIMEOUT_SECONDS'],
+        max_batches=max_batches
+    )
+    click.echo(f"Rolled up {rows} log rows in {batches} batches.")
+
+
+@click.command('loadgen')
+@click.option('--target', required=True, help='Base URL of the deployment, e.g. http://localhost:3003.')
+@click.option('--users', type=int, default=1000, help='Simulated meters (registered on first use, then reused).')
+@click.option('--duration', type=float, default=300, help='Seconds of heartbeat traffic.')
+@click.option('--interval', type=float, default=60, help='Seconds between heartbeats of one meter.')
+@click.option('--jitter', type=float, default=0.2, help='Random +/- fraction of the interval.')
+@click.option('--concurrency', type=int, default=200, help='Maximum requests in flight.')
+@click.option('--regions', type=int, default=10, help='Meters are spread round-robin over this many regions.')
+@click.option('--blackouts-per-minute', type=float, default=1.0, help='Rate of random regional blackouts (0 disables them).')
+@click.option('--blackout-min', type=float, default=30, help='Shortest blackout in seconds.')
+@click.option('--blackout-max', type=float, default=180, help='Longest blackout in seconds.')
+@click.option('--storm-jitter', type=float, default=2.0, help='A recovering region reports back within this many seconds.')
+@click.option('--threshold-seconds', type=int, default=None, help='Outage threshold set on the simulated users (default: OUTAGE_OFFLINE_SECONDS).')
+@click.option('--detect-slack', type=float, default=15, help='Seconds past the threshold an outage may take to be detected.')
+@click.option('--prefix', default='loadgen', help='Prefix of the synthetic users\' emails and chat ids.')
+@click.option('--seed', type=int, default=None, help='Random seed for schedules and blackouts.')
+@click.option('--json', 'json_path', default=None, help='Also write the report to this file.')
+@with_appcontext
+def loadgen_command(target, users, duration, interval, jitter, concurrency, regions, blackouts_per_minute,
+                    blackout_min, blackout_max, storm_jitter, threshold_seconds, detect_slack, prefix, seed, json_path):
+    """Drive a simulated meter fleet with blackouts against a deployment."""
+    # Imported here so other commands and app startup don't load httpx.
+    from app.utils.loadgen import LoadGenerator
+
+    report = LoadGenerator(
+        current_app._get_current_object(), target, users, duration,
+        interval=interval, jitter=jitter, concurrency=concurrency, regions=regions,
+        blackout_rate=blackouts_per_minute, blackout_min=blackout_min, blackout_max=blackout_max,
+        storm_jitter=storm_jitter, threshold=threshold_seconds, detect_slack=detect_slack,
+        prefix=prefix, seed=seed
+    ).run()
+
+    click.echo(f"Target {report['target_rps']} heartbeats/s over {report['duration_s']}s, "
+               f"dispatch lag {report['dispatch_lag_ms']} ms")
+    for name in ('registration', 'setup', 'heartbeats', 'recovery_storm'):
+        stats = report[name]
+        click.echo(f"{name:<15} {stats['requests']:>8} req {stats['rps'] or 0:>9}/s "
+                   f"errors {stats['error_rate']:.2%} latency {stats['latency_ms']} ms {stats['statuses']}")
+    for blackout in report['blackouts']:
+        click.echo(f"blackout region {blackout['region']} at {blackout['started']} for {blackout['duration_s']}s: "
+                   + ', '.join(f"{key} {value}" for key, value in blackout.items()
+                               if key not in ('region', 'started', 'duration_s')))
+    detection = report['detection']
+    click.echo(f"detection window {detection['window_s']}s: {detection['in_window']} in window, "
+               f"{detection['early']} early, {detection['late']} late, {detection['missed']} missed, "
+               f"delay {detection['delay_s']} s")
+
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump(report, f, indent=2)
+    if detection['early'] or detection['late'] or detection['missed']:
+        raise SystemExit(1)
+
+
+def register_commands(app):
+    app.cli.add_command(outbox_worker_command)
+    app.cli.add_command(check_query_plans_command)
+    app.cli.add_command(logs_group)
+    app.cli.add_command(loadgen_command)
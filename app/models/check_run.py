@@ -0,0 +1,44 @@
+from datetime import datetime
+
+from app import db
+
+
+class CheckRun(db.Model):
+    __tablename__ = 'check_run'
+
+    TRIGGER_SCHEDULER = 'scheduler'
+    TRIGGER_API = 'api'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    trigger = db.Column(db.String(20), nullable=False)
+    worker = db.Column(db.String(100), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='RUNNING')
+    started_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    duration_ms = db.Column(db.Integer, nullable=True)
+    went_offline = db.Column(db.Integer, nullable=False, default=0)
+    recovered = db.Column(db.Integer, nullable=False, default=0)
+    suspect = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.String(500), nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_check_run_started_at', started_at),
+    )
+
+    def __repr__(self):
+        return f'<CheckRun {self.id} - {self.status}>'
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "trigger": self.trigger,
+            "worker": self.worker,
+            "status": self.status,
+            "started_at": self.started_at.isoformat(),
+            "finished_at": None if self.finished_at is None else self.finished_at.isoformat(),
+            "duration_ms": self.duration_ms,
+            "went_offline": self.went_offline,
+            "recovered": self.recovered,
+            "suspect": self.suspect,
+            "error": self.error,
+        }
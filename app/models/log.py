@@ -47,6 +47,25 @@ class LogTypeEnum(PyEnum):
     ADMIN_TEST_EMAIL_SENT = "ADMIN_TEST_EMAIL_SENT"
     ADMIN_NOTIFICATION_SENT = "ADMIN_NOTIFICATION_SENT"
 
+    REGION_OUTAGE_BROADCAST = "REGION_OUTAGE_BROADCAST"
+
+# Log types grouped by retention. On PostgreSQL each group is its own LIST
+# partition of the log table (sub-partitioned by time); every type not listed
+# here belongs to the "default" group. Changing membership needs a migration.
+LOG_RETENTION_GROUP_TYPES = {
+    'electric_check': [
+        LogTypeEnum.ELECTRIC_CHECK_SUCCESS,
+        LogTypeEnum.ELECTRIC_CHECK_USER_NOT_FOUND,
+        LogTypeEnum.ELECTRIC_CHECK_INVALID_REQUEST,
+        LogTypeEnum.ELECTRIC_CHECK_RETRIEVAL,
+    ],
+    'security': [
+        LogTypeEnum.SECURITY_UNAUTHORIZED_ACCESS,
+        LogTypeEnum.SECURITY_LOGIN_FAILURE,
+        LogTypeEnum.SECURITY_PASSWORD_RESET,
+    ],
+}
+
 class Log(db.Model):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
@@ -59,6 +78,12 @@ class Log(db.Model):
         default=LogTypeEnum.ELECTRIC_CHECK_SUCCESS
     )
 
+    __table_args__ = (
+        db.Index('ix_log_timestamp_id', timestamp.desc(), id.desc()),
+        db.Index('ix_log_log_type_timestamp_id', log_type, timestamp.desc(), id.desc()),
+        db.Index('ix_log_username_timestamp_id', username, timestamp.desc(), id.desc()),
+    )
+
     def __repr__(self):
         return f'<Log {self.id} - {self.level}>'
 
@@ -0,0 +1,70 @@
+from app import db
+
+
+class LogHourlyRollup(db.Model):
+    # Number of log rows per UTC hour, log type and level.
+    __tablename__ = 'log_rollup_hourly'
+
+    bucket = db.Column(db.DateTime, primary_key=True)
+    log_type = db.Column(db.String(64), primary_key=True)
+    level = db.Column(db.String(20), primary_key=True)
+    count = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def to_dict(self):
+        return {
+            "bucket": self.bucket.isoformat(),
+            "log_type": self.log_type,
+            "level": self.level,
+            "count": self.count,
+        }
+
+
+class LogDailyUserRollup(db.Model):
+    # Number of log rows per UTC day, user and log type; rows without a
+    # username are not counted here.
+    __tablename__ = 'log_rollup_daily_user'
+
+    day = db.Column(db.Date, primary_key=True)
+    username = db.Column(db.String(36), primary_key=True)
+    log_type = db.Column(db.String(64), primary_key=True)
+    count = db.Column(db.BigInteger, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_log_rollup_daily_user_username_day', username, day, log_type),
+    )
+
+    def to_dict(self):
+        return {
+            "day": self.day.isoformat(),
+            "username": self.username,
+            "log_type": self.log_type,
+            "count": self.count,
+        }
+
+
+class RollupWatermark(db.Model):
+    # How far into the log table (by id) a rollup has been applied.
+    __tablename__ = 'rollup_watermark'
+
+    name = db.Column(db.String(50), primary_key=True)
+    last_log_id = db.Column(db.BigInteger, nullable=False, default=0)
+    rows_processed = db.Column(db.BigInteger, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=True)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "last_log_id": self.last_log_id,
+            "rows_processed": self.rows_processed,
+            "updated_at": None if self.updated_at is None else self.updated_at.isoformat(),
+        }
+
+
+class LogRollupGap(db.Model):
+    # A log id the watermark moved past while no row with it was visible:
+    # rolled back, or still uncommitted. Folded in if the row shows up
+    # before LOG_ROLLUP_GAP_TIMEOUT_SECONDS, dropped otherwise.
+    __tablename__ = 'log_rollup_gap'
+
+    log_id = db.Column(db.BigInteger, primary_key=True, autoincrement=False)
+    first_seen_at = db.Column(db.DateTime, nullable=False)
@@ -0,0 +1,44 @@
+from datetime import datetime
+
+from app import db
+
+
+class NotificationOutbox(db.Model):
+    __tablename__ = 'notification_outbox'
+    __table_args__ = (
+        db.UniqueConstraint('username', 'episode_key', 'channel', name='uq_notification_outbox_dedupe'),
+        # Regional broadcasts have no username; they dedupe per outage instead.
+        db.UniqueConstraint('region_outage_id', 'episode_key', 'channel', name='uq_notification_outbox_broadcast_dedupe'),
+        db.Index('ix_notification_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+
+    CHANNEL_EMAIL = 'EMAIL'
+    CHANNEL_TELEGRAM = 'TELEGRAM'
+
+    STATUS_PENDING = 'PENDING'
+    STATUS_SENDING = 'SENDING'
+    STATUS_SENT = 'SENT'
+    STATUS_FAILED = 'FAILED'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    username = db.Column(db.String(36), nullable=True)
+    region_outage_id = db.Column(db.Integer, db.ForeignKey('region_outage.id'), nullable=True)
+    episode_key = db.Column(db.String(64), nullable=False)
+    channel = db.Column(db.String(20), nullable=False)
+    recipient = db.Column(db.String(200), nullable=False)
+    # JSON list of BCC addresses for a broadcast email; recipient then
+    # holds the region.
+    recipients = db.Column(db.Text, nullable=True)
+    subject = db.Column(db.String(200), nullable=True)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=STATUS_PENDING)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claimed_by = db.Column(db.String(36), nullable=True)
+    claimed_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.String(500), nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<NotificationOutbox {self.id} - {self.channel} {self.status}>'
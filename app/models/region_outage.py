@@ -0,0 +1,50 @@
+from datetime import datetime
+
+from app import db
+
+
+class RegionOutage(db.Model):
+    # One outage event for a whole region: opened when a large share of its
+    # licensed users goes offline together, resolved once most of them are
+    # back. Its users are told once, through a regional broadcast, instead
+    # of one notification each.
+    __tablename__ = 'region_outage'
+
+    STATUS_ACTIVE = 'ACTIVE'
+    STATUS_RESOLVED = 'RESOLVED'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    region = db.Column(db.String(64), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=STATUS_ACTIVE)
+    started_at = db.Column(db.DateTime, nullable=False)
+    detected_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    resolved_at = db.Column(db.DateTime, nullable=True)
+    affected_users = db.Column(db.Integer, nullable=False, default=0)
+    total_users = db.Column(db.Integer, nullable=False, default=0)
+    job_id = db.Column(db.String(36), nullable=True)
+    recovery_job_id = db.Column(db.String(36), nullable=True)
+
+    __table_args__ = (
+        # At most one active outage per region, whichever worker opens it.
+        db.Index('ux_region_outage_active_region', region, unique=True,
+                 postgresql_where=status == STATUS_ACTIVE,
+                 sqlite_where=status == STATUS_ACTIVE),
+        db.Index('ix_region_outage_region_detected_at', region, detected_at),
+    )
+
+    def __repr__(self):
+        return f'<RegionOutage {self.id} - {self.region} {self.status}>'
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "region": self.region,
+            "status": self.status,
+            "started_at": self.started_at.isoformat(),
+            "detected_at": self.detected_at.isoformat(),
+            "resolved_at": None if self.resolved_at is None else self.resolved_at.isoformat(),
+            "affected_users": self.affected_users,
+            "total_users": self.total_users,
+            "job_id": self.job_id,
+            "recovery_job_id": self.recovery_job_id,
+        }
@@ -1,7 +1,17 @@
+from sqlalchemy import and_
+
 from app import db
 import uuid
 
 class User(db.Model):
+    # Outage state machine: ONLINE -> SUSPECT -> OFFLINE -> RECOVERED -> ONLINE.
+    # The periodic check moves users forward on silence; heartbeats move
+    # SUSPECT back to ONLINE and OFFLINE to RECOVERED.
+    STATE_ONLINE = 'ONLINE'
+    STATE_SUSPECT = 'SUSPECT'
+    STATE_OFFLINE = 'OFFLINE'
+    STATE_RECOVERED = 'RECOVERED'
+
     username = db.Column(db.String(36), primary_key=True, unique=True,
                         nullable=False, default=lambda: str(uuid.uuid4()))
     email = db.Column(db.String(200), unique=True, nullable=False)
@@ -11,6 +21,33 @@ class User(db.Model):
     last_name = db.Column(db.String(100), nullable=False)
     phone_number = db.Column(db.String(20), unique=True, nullable=False)
     chat_id = db.Column(db.String(50), unique=True, nullable=False)
+    outage_state = db.Column(db.String(16), nullable=False, default=STATE_ONLINE, server_default=STATE_ONLINE)
+    outage_started_at = db.Column(db.DateTime, nullable=True)
+    outage_state_changed_at = db.Column(db.DateTime, nullable=True)
+    # Seconds without a heartbeat before this user counts as offline; None
+    # means OUTAGE_OFFLINE_SECONDS.
+    outage_threshold_seconds = db.Column(db.Integer, nullable=True)
+    # Region or feeder the meter hangs off; users sharing one are checked
+    # together for regional outages.
+    region = db.Column(db.String(64), nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_user_licensed_last_request_date', last_request_date,
+                 postgresql_where=has_license.is_(True),
+                 sqlite_where=has_license.is_(True)),
+        db.Index('ix_user_licensed_outage_state_last_request_date', outage_state, last_request_date,
+                 postgresql_where=has_license.is_(True),
+                 sqlite_where=has_license.is_(True)),
+        # Users outside ONLINE are few; this keeps the SUSPECT and RECOVERED
+        # scans on an index even when statistics say nearly everyone is ONLINE.
+        db.Index('ix_user_licensed_not_online_outage_state', outage_state, last_request_date,
+                 postgresql_where=and_(has_license.is_(True), outage_state != STATE_ONLINE),
+                 sqlite_where=and_(has_license.is_(True), outage_state != STATE_ONLINE)),
+        db.Index('ix_user_outage_state_changed_at', outage_state_changed_at),
+        db.Index('ix_user_licensed_region_outage_state', region, outage_state,
+                 postgresql_where=has_license.is_(True),
+                 sqlite_where=has_license.is_(True)),
+    )
 
     def to_dict(self):
         return {
@@ -22,4 +59,8 @@ class User(db.Model):
             "last_name": self.last_name,
             "phone_number": self.phone_number,
             "chat_id": self.chat_id,
+            "outage_state": self.outage_state,
+            "outage_started_at": None if self.outage_started_at is None else self.outage_started_at.isoformat(),
+            "outage_threshold_seconds": self.outage_threshold_seconds,
+            "region": self.region,
         } 
\ No newline at end of file
@@ -1,19 +1,90 @@
-import asyncio
-from datetime import datetime, timedelta
+from datetime import date, datetime
 
-from flasgger import swag_from
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, Response, current_app, jsonify, request, send_file, stream_with_context
 
 from app import db
-from app.models.log import Log, LogTypeEnum
+from app.models.log import LogTypeEnum
+from app.models.check_run import CheckRun
+from app.models.notification_job import NotificationJob
+from app.models.region_outage import RegionOutage
 from app.models.user import User
+from app.utils.apidocs import swag_from
+from app.utils.license_index import license_index
+from app.utils.log_rollups import rollup_watermark
 from app.utils.logger import log_message
-from app.utils.notifications import send_information
+from app.utils.pagination import keyset_page
+from app.utils.periodic_check import run_periodic_check
+from app.utils.profiler import KIND_CPROFILE, request_profiler
+from app.utils.query_stats import query_stats
+from app.utils.region_outages import valid_region
+from app.utils.queries import (daily_user_rollup_query, hourly_rollup_query, logs_query, region_status_query,
+                               users_export_query, users_list_query)
+from app.utils.serialization import LOGS_FIELDS, USERS_LIST_FIELDS
+from app.utils.user_export import parse_user_fields, stream_users
 from config import Config
 
 admin_bp = Blueprint('admin', __name__)
 
 
+def _parse_timestamp_header(name):
+    value = request.headers.get(name, None, type=str)
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid {name} header, expected an ISO 8601 timestamp")
+
+
+def _parse_date_header(name):
+    value = request.headers.get(name, None, type=str)
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid {name} header, expected an ISO 8601 date")
+
+
+def _parse_per_page(default):
+    value = request.headers.get('X-Per-Page', None, type=str)
+    if value is None:
+        return default
+    maximum = current_app.config['MAX_PER_PAGE']
+    try:
+        per_page = int(value)
+    except ValueError:
+        per_page = 0
+    if not 1 <= per_page <= maximum:
+        raise ValueError(f"Invalid X-Per-Page header, expected an integer from 1 to {maximum}")
+    return per_page
+
+
+def _rollup_response(query, message):
+    page = request.headers.get('X-Page', 1, type=int)
+    try:
+        per_page = _parse_per_page(100)
+    except ValueError as e:
+        return jsonify(status="NOK", message=str(e)), 400
+    paginated = query.paginate(page=page, per_page=per_page, error_out=False)
+    log_message(
+        level="INFO",
+        message=message,
+        log_type=LogTypeEnum.ADMIN_LOGS_VIEWED
+    )
+    return jsonify(status='OK', message=message, data={
+        'rows': [row.to_dict() for row in paginated.items],
+        'pagination': {
+            'page': paginated.page,
+            'per_page': paginated.per_page,
+            'total': paginated.total,
+            'pages': paginated.pages,
+        },
+        # Rollups trail the log table by up to LOG_ROLLUP_INTERVAL_SECONDS.
+        'watermark': rollup_watermark()
+    }), 200
+
+
 @admin_bp.route('/logs', methods=['GET'])
 @swag_from('../swagger_specs/logs_get.yaml')
 def get_logs():
@@ -28,26 +99,51 @@ def get_logs():
         return jsonify(status="NOK", message='Invalid or missing admin key'), 400
 
     page = request.headers.get('X-Page', 1, type=int)
-    per_page = request.headers.get('X-Per-Page', 10, type=int)
     log_type = request.headers.get('X-Log-Type', None, type=str)
+    username = request.headers.get('X-Username', None, type=str)
+    cursor = request.headers.get('X-Cursor', None, type=str)
+    cursor_mode = cursor is not None or request.headers.get('X-Pagination', 'page') == 'cursor'
+    include_total = request.headers.get('X-Include-Total', 'false').lower() == 'true'
 
     try:
-        if log_type:
-            logs_query = Log.query.filter_by(log_type=log_type).order_by(Log.timestamp.desc())
-        else:
-            logs_query = Log.query.order_by(Log.timestamp.desc())
-        
-        paginated_logs = logs_query.paginate(page=page, per_page=per_page, error_out=False)
-        logs_data = [log.to_dict() for log in paginated_logs.items]
+        per_page = _parse_per_page(10)
+        since = _parse_timestamp_header('X-From')
+        until = _parse_timestamp_header('X-To')
+    except ValueError as e:
+        return jsonify(status="NOK", message=str(e)), 400
 
-        response_data = {
-            'logs': logs_data,
-            'pagination': {
+    try:
+        query = logs_query(log_type=log_type, username=username, since=since, until=until, fields=LOGS_FIELDS)
+        headers = {}
+
+        if cursor_mode:
+            try:
+                logs, next_cursor = keyset_page(query, per_page, cursor)
+            except ValueError as e:
+                return jsonify(status="NOK", message=str(e)), 400
+
+            pagination = {
+                'per_page': per_page,
+                'next_cursor': next_cursor,
+                'has_more': next_cursor is not None,
+            }
+            if include_total:
+                pagination['total'] = query.order_by(None).count()
+            if next_cursor is not None:
+                headers['X-Next-Cursor'] = next_cursor
+        else:
+            paginated_logs = query.paginate(page=page, per_page=per_page, error_out=False)
+            logs = paginated_logs.items
+            pagination = {
                 'page': paginated_logs.page,
                 'per_page': paginated_logs.per_page,
                 'total': paginated_logs.total,
                 'pages': paginated_logs.pages,
             }
+
+        response_data = {
+            'logs': LOGS_FIELDS.serialize(logs),
+            'pagination': pagination
         }
 
         log_message(
@@ -55,7 +151,7 @@ def get_logs():
             message="Logs retrieved successfully by admin.",
             log_type=LogTypeEnum.ADMIN_LOGS_VIEWED
         )
-        return jsonify(status='OK', message='Logs retrieved successfully', data=response_data), 200
+        return jsonify(status='OK', message='Logs retrieved successfully', data=response_data), 200, headers
 
     except Exception as e:
         log_message(
@@ -67,6 +163,62 @@ def get_logs():
         return jsonify(status="NOK", message="An error occurred while retrieving logs"), 500
 
 
+@admin_bp.route('/logs/rollups/hourly', methods=['GET'])
+@swag_from('../swagger_specs/log_rollups_hourly.yaml')
+def get_hourly_log_rollups():
+    admin_key_request = request.headers.get('admin-key', None)
+
+    if admin_key_request is None or admin_key_request != Config.ADMIN_KEY:
+        log_message(
+            level="ERROR",
+            message="Invalid or missing admin key for hourly log rollups.",
+            log_type=LogTypeEnum.SECURITY_UNAUTHORIZED_ACCESS
+        )
+        return jsonify(status="NOK", message='Invalid or missing admin key'), 400
+
+    try:
+        since = _parse_timestamp_header('X-From')
+        until = _parse_timestamp_header('X-To')
+    except ValueError as e:
+        return jsonify(status="NOK", message=str(e)), 400
+
+    query = hourly_rollup_query(
+        since=since,
+        until=until,
+        log_type=request.headers.get('X-Log-Type', None, type=str),
+        level=request.headers.get('X-Level', None, type=str)
+    )
+    return _rollup_response(query, "Hourly log rollups retrieved successfully.")
+
+
+@admin_bp.route('/logs/rollups/daily-users', methods=['GET'])
+@swag_from('../swagger_specs/log_rollups_daily_users.yaml')
+def get_daily_user_log_rollups():
+    admin_key_request = request.headers.get('admin-key', None)
+
+    if admin_key_request is None or admin_key_request != Config.ADMIN_KEY:
+        log_message(
+            level="ERROR",
+            message="Invalid or missing admin key for daily user log rollups.",
+            log_type=LogTypeEnum.SECURITY_UNAUTHORIZED_ACCESS
+        )
+        return jsonify(status="NOK", message='Invalid or missing admin key'), 400
+
+    try:
+        since = _parse_date_header('X-From')
+        until = _parse_date_header('X-To')
+    except ValueError as e:
+        return jsonify(status="NOK", message=str(e)), 400
+
+    query = daily_user_rollup_query(
+        since=since,
+        until=until,
+        username=request.headers.get('X-Username', None, type=str),
+        log_type=request.headers.get('X-Log-Type', None, type=str)
+    )
+    return _rollup_response(query, "Daily user log rollups retrieved successfully.")
+
+
 @admin_bp.route('/users/list', methods=['GET'])
 @swag_from('../swagger_specs/users_list.yaml')
 def users_list():
@@ -80,14 +232,14 @@ def users_list():
         )
         return jsonify(status="NOK", message='Operation Failed.'), 400
 
-    users = User.query.all()
+    users = USERS_LIST_FIELDS.serialize(db.session.execute(users_list_query(USERS_LIST_FIELDS)))
     if users:
         log_message(
             level="INFO",
             message="User list retrieved successfully by admin.",
             log_type=LogTypeEnum.ADMIN_USER_LIST_VIEWED
         )
-        return jsonify(status='OK', message='Users retrieved successfully', data={'users': [user.to_dict() for user in users]}), 200
+        return jsonify(status='OK', message='Users retrieved successfully', data={'users': users}), 200
 
     log_message(
         level="INFO",
@@ -97,6 +249,49 @@ def users_list():
     return jsonify(status='OK', message='Users retrieved successfully', data={'users': []}), 200
 
 
+@admin_bp.route('/users/export', methods=['GET'])
+@swag_from('../swagger_specs/users_export.yaml')
+def users_export():
+    admin_key_request = request.headers.get('admin-key', None)
+
+    if admin_key_request is None or admin_key_request != Config.ADMIN_KEY:
+        log_message(
+            level="ERROR",
+            message="Invalid or missing admin key for user export.",
+            log_type=LogTypeEnum.SECURITY_UNAUTHORIZED_ACCESS
+        )
+        return jsonify(status="NOK", message='Operation Failed.'), 400
+
+    output_format = request.headers.get('X-Format', 'ndjson')
+    fields = request.headers.get('X-Fields', None, type=str)
+    licensed = request.headers.get('X-Licensed', None, type=str)
+    has_chat_id = request.headers.get('X-Has-Chat-Id', None, type=str)
+
+    if output_format not in ('ndjson', 'json'):
+        return jsonify(status="NOK", message="X-Format must be ndjson or json"), 400
+
+    try:
+        fields = parse_user_fields(fields)
+        inactive_since = _parse_timestamp_header('X-Inactive-Since')
+    except ValueError as e:
+        return jsonify(status="NOK", message=str(e)), 400
+
+    statement = users_export_query(
+        fields,
+        licensed=None if licensed is None else licensed.lower() == 'true',
+        inactive_since=inactive_since,
+        has_chat_id=None if has_chat_id is None else has_chat_id.lower() == 'true'
+    )
+
+    log_message(
+        level="INFO",
+        message="User export streamed by admin.",
+        log_type=LogTypeEnum.ADMIN_USER_LIST_VIEWED
+    )
+    mimetype = 'application/x-ndjson' if output_format == 'ndjson' else 'application/json'
+    return Response(stream_with_context(stream_users(statement, fields, output_format)), mimetype=mimetype)
+
+
 @admin_bp.route('/users/register', methods=['POST'])
 @swag_from('../swagger_specs/users_register.yaml')
 def create_user():
@@ -115,6 +310,7 @@ def create_user():
     last_name = data.get('last_name')
     email = data.get('email')
     phone_number = data.get('phone_number')
+    region = data.get('region')
 
     if not all([first_name, last_name, email, phone_number]):
         log_message(
@@ -124,6 +320,9 @@ def create_user():
         )
         return jsonify(status="NOK", message="Missing information"), 400
 
+    if not valid_region(region):
+        return jsonify(status="NOK", message="region must be a string of at most 64 characters or null"), 400
+
     if User.query.filter_by(email=email).first():
         log_message(
             level="ERROR",
@@ -137,10 +336,12 @@ def create_user():
         last_name=last_name,
         email=email,
         phone_number=phone_number,
-        chat_id="default"
+        chat_id="default",
+        region=region
     )
     db.session.add(new_user)
     db.session.commit()
+    license_index.set(new_user.username, new_user.has_license)
     log_message(
         level="INFO",
         message="New user registered successfully.",
@@ -182,6 +383,7 @@ def delete_user():
 
     db.session.delete(user)
     db.session.commit()
+    license_index.remove(user.username)
     log_message(
         level="INFO",
         message="User deleted successfully.",
@@ -216,6 +418,7 @@ def deactivate_license(username):
 
     user.has_license = False
     db.session.commit()
+    license_index.set(username, False)
     log_message(
         level="INFO",
         message=f"License deactivated for user {username}.",
@@ -249,7 +452,10 @@ def activate_license(username):
         return jsonify(status="NOK", message="User not found"), 404
 
     user.has_license = True
+    # Lets the outage detector pick the user up again.
+    user.outage_state_changed_at = datetime.now()
     db.session.commit()
+    license_index.set(username, True)
     log_message(
         level="INFO",
         message=f"License activated for user {username}.",
@@ -259,6 +465,116 @@ def activate_license(username):
     return jsonify(status="OK", message="License activated"), 200
 
 
+@admin_bp.route('/users/<username>/outage-threshold', methods=['PATCH'])
+@swag_from('../swagger_specs/outage_threshold_patch.yaml')
+def set_outage_threshold(username):
+    admin_key = request.headers.get('admin-key')
+
+    if admin_key is None or admin_key != Config.ADMIN_KEY:
+        log_message(
+            level="ERROR",
+            message="Invalid or missing admin key for setting outage threshold.",
+            log_type=LogTypeEnum.SECURITY_UNAUTHORIZED_ACCESS
+        )
+        return jsonify(status="NOK", message="Invalid or missing admin key"), 400
+
+    data = request.get_json(silent=True) or {}
+    threshold = data.get('threshold_seconds')
+    if threshold is not None and (not isinstance(threshold, int) or isinstance(threshold, bool) or threshold <= 0):
+        return jsonify(status="NOK", message="threshold_seconds must be a positive integer or null"), 400
+
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        return jsonify(status="NOK", message="User not found"), 404
+
+    user.outage_threshold_seconds = threshold
+    # Lets the outage detector reschedule the user's deadline.
+    user.outage_state_changed_at = datetime.now()
+    db.session.commit()
+    log_message(
+        level="INFO",
+        message=f"Outage threshold for user {username} set to {threshold if threshold is not None else 'default'}.",
+        username=username,
+        log_type=LogTypeEnum.USER_UPDATE
+    )
+    return jsonify(status="OK", message="Outage threshold updated", data={'threshold_seconds': threshold}), 200
+
+
+@admin_bp.route('/users/<username>/region', methods=['PATCH'])
+@swag_from('../swagger_specs/user_region_patch.yaml')
+def set_user_region(username):
+    admin_key = request.headers.get('admin-key')
+
+    if admin_key is None or admin_key != Config.ADMIN_KEY:
+        log_message(
+            level="ERROR",
+            message="Invalid or missing admin key for setting user region.",
+            log_type=LogTypeEnum.SECURITY_UNAUTHORIZED_ACCESS
+        )
+        return jsonify(status="NOK", message="Invalid or missing admin key"), 400
+
+    data = request.get_json(silent=True) or {}
+    region = data.get('region')
+    if not valid_region(region):
+        return jsonify(status="NOK", message="region must be a string of at most 64 characters or null"), 400
+
+    user = User.query.filter_by(username=username).first()
+    if user is None:
+        return jsonify(status="NOK", message="User not found"), 404
+
+    user.region = region
+    db.session.commit()
+    log_message(
+        level="INFO",
+        message=f"Region for user {username} set to {region if region is not None else 'none'}.",
+        username=username,
+        log_type=LogTypeEnum.USER_UPDATE
+    )
+    return jsonify(status="OK", message="Region updated", data={'region': region}), 200
+
+
+@admin_bp.route('/regions/status', methods=['GET'])
+@swag_from('../swagger_specs/regions_status.yaml')
+def regions_status():
+    admin_key = request.headers.get('admin-key')
+
+    if admin_key is None or admin_key != Config.ADMIN_KEY:
+        log_message(
+            level="ERROR",
+            message="Invalid or missing admin key for region status.",
+            log_type=LogTypeEnum.SECURITY_UNAUTHORIZED_ACCESS
+        )
+        return jsonify(status="NOK", message="Invalid or missing admin key"), 400
+
+    region = request.headers.get('X-Region', None, type=str)
+
+    regions = {}
+    for name, state, count in region_status_query(region):
+        entry = regions.setdefault(name, {
+            'region': name,
+            'total_users': 0,
+            'states': {state: 0 for state in (User.STATE_ONLINE, User.STATE_SUSPECT,
+                                              User.STATE_OFFLINE, User.STATE_RECOVERED)},
+            'outage': None,
+        })
+        entry['total_users'] += count
+        entry['states'][state] = count
+
+    active = RegionOutage.query.filter_by(status=RegionOutage.STATUS_ACTIVE)
+    if region is not None:
+        active = active.filter_by(region=region)
+    for outage in active:
+        if outage.region in regions:
+            regions[outage.region]['outage'] = outage.to_dict()
+
+    log_message(
+        level="INFO",
+        message="Region status retrieved by admin.",
+        log_type=LogTypeEnum.ADMIN_USER_LIST_VIEWED
+    )
+    return jsonify(status="OK", message="Region status retrieved.", data={'regions': list(regions.values())}), 200
+
+
 @admin_bp.route('/send-test-email')
 @swag_from('../swagger_specs/send_test_email.yaml')
 def send_test_email():
@@ -291,31 +607,119 @@ def periodic_check():
         )
         return jsonify(status="NOK", message="Invalid or missing admin key"), 400
 
-    two_hours_ago = datetime.now() - timedelta(hours=2)
-    inactive_users = User.query.filter(
-        User.last_request_date < two_hours_ago).all()
-    log_message(
-        level="INFO",
-        message=f"Periodic check performed, found {len(inactive_users)} inactive users.",
-        log_type=LogTypeEnum.ADMIN_PERIODIC_CHECK_STARTED
-    )
+    result = run_periodic_check(current_app._get_current_object(), CheckRun.TRIGGER_API)
+    if result is None:
+        return jsonify(status="NOK", message="A periodic check is already running"), 409
+
+    _, data = result
+    if not data['inactive_users'] and not data['recovered_users']:
+        return jsonify(status="OK", message="Periodic Check Started!", data=data), 200
+    return jsonify(status="OK", message="Periodic Check Started!", data=data), 202
+
+
+@admin_bp.route('/periodic-check/runs', methods=['GET'])
+@swag_from('../swagger_specs/periodic_check_runs.yaml')
+def list_periodic_check_runs():
+    admin_key = request.headers.get('admin-key')
+
+    if admin_key is None or admin_key != Config.ADMIN_KEY:
+        log_message(
+            level="ERROR",
+            message="Invalid or missing admin key for periodic check runs.",
+            log_type=LogTypeEnum.SECURITY_UNAUTHORIZED_ACCESS
+        )
+        return jsonify(status="NOK", message="Invalid or missing admin key"), 400
+
+    try:
+        per_page = _parse_per_page(20)
+    except ValueError as e:
+        return jsonify(status="NOK", message=str(e)), 400
+    runs = CheckRun.query.order_by(CheckRun.started_at.desc(), CheckRun.id.desc()).limit(per_page).all()
+    return jsonify(status="OK", message="Periodic check runs retrieved.", data=[run.to_dict() for run in runs]), 200
+
+
+@admin_bp.route('/notification-jobs/<job_id>', methods=['GET'])
+@swag_from('../swagger_specs/notification_job_get.yaml')
+def get_notification_job(job_id):
+    admin_key = request.headers.get('admin-key')
+
+    if admin_key is None or admin_key != Config.ADMIN_KEY:
+        log_message(
+            level="ERROR",
+            message="Invalid or missing admin key for notification job retrieval.",
+            log_type=LogTypeEnum.SECURITY_UNAUTHORIZED_ACCESS
+        )
+        return jsonify(status="NOK", message="Invalid or missing admin key"), 400
+
+    job = db.session.get(NotificationJob, job_id)
+    if job is None:
+        return jsonify(status="NOK", message="Notification job not found"), 404
+
+    return jsonify(status="OK", message="Notification job retrieved.", data=job.to_dict()), 200
+
+
+@admin_bp.route('/query-stats', methods=['GET', 'DELETE'])
+@swag_from('../swagger_specs/query_stats.yaml')
+def get_query_stats():
+    admin_key = request.headers.get('admin-key')
+
+    if admin_key is None or admin_key != Config.ADMIN_KEY:
+        log_message(
+            level="ERROR",
+            message="Invalid or missing admin key for query stats.",
+            log_type=LogTypeEnum.SECURITY_UNAUTHORIZED_ACCESS
+        )
+        return jsonify(status="NOK", message="Invalid or missing admin key"), 400
+
+    if not query_stats.detect:
+        return jsonify(status="NOK", message="Query stats are disabled"), 404
+
+    data = query_stats.snapshot()
+    if request.method == 'DELETE':
+        query_stats.reset()
+        return jsonify(status="OK", message="Query stats reset.", data=data), 200
+    return jsonify(status="OK", message="Query stats retrieved.", data=data), 200
+
+
+@admin_bp.route('/profiles', methods=['GET'])
+@swag_from('../swagger_specs/profiles_list.yaml')
+def list_profiles():
+    admin_key = request.headers.get('admin-key')
+
+    if admin_key is None or admin_key != Config.ADMIN_KEY:
+        log_message(
+            level="ERROR",
+            message="Invalid or missing admin key for profile list.",
+            log_type=LogTypeEnum.SECURITY_UNAUTHORIZED_ACCESS
+        )
+        return jsonify(status="NOK", message="Invalid or missing admin key"), 400
+
+    if not request_profiler.enabled:
+        return jsonify(status="NOK", message="Profiling is disabled"), 404
+
+    return jsonify(status="OK", message="Profiles retrieved.", data=request_profiler.list()), 200
+
+
+@admin_bp.route('/profiles/<profile_id>', methods=['GET'])
+@swag_from('../swagger_specs/profile_download.yaml')
+def download_profile(profile_id):
+    admin_key = request.headers.get('admin-key')
+
+    if admin_key is None or admin_key != Config.ADMIN_KEY:
+        log_message(
+            level="ERROR",
+            message="Invalid or missing admin key for profile download.",
+            log_type=LogTypeEnum.SECURITY_UNAUTHORIZED_ACCESS
+        )
+        return jsonify(status="NOK", message="Invalid or missing admin key"), 400
+
+    artifact = request_profiler.artifact(profile_id) if request_profiler.enabled else None
+    if artifact is None:
+        return jsonify(status="NOK", message="Profile not found"), 404
 
-    if inactive_users:
-        for user in inactive_users:
-            log_message(
-                level="INFO",
-                message=f"Sending notification to user {user.username}.",
-                username=user.username,
-                log_type=LogTypeEnum.ADMIN_INACTIVE_USERS_NOTIFIED
-            )
-            asyncio.run(send_information(
-                subject="Dikkat!",
-                recipient=user.email,
-                chat_id=user.chat_id,
-                body=Config.MAIL_BODY
-            ))
-
-    return "Periodic Check Started!"
+    path, meta = artifact
+    mimetype = 'application/octet-stream' if meta['kind'] == KIND_CPROFILE else 'text/plain'
+    return send_file(path, mimetype=mimetype, as_attachment=True, download_name=meta['filename'])
 
 
 @admin_bp.route('/log-type/list')
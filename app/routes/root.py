@@ -1,49 +1,40 @@
-from flask import Blueprint, jsonify
-from app import db
-from app.models.log import LogTypeEnum
-from app.utils.logger import log_message
-import asyncio
-import psutil
-from flasgger import swag_from
-from sqlalchemy import text
-from app import bot
-from config import Config
+from flask import Blueprint, Response, abort, current_app, jsonify
+from app.utils.apidocs import swag_from
+from app.utils.health import health_prober
+from app.utils.heartbeat_buffer import heartbeat_buffer
+from app.utils.metrics import metrics
 
 root_bp = Blueprint('root', __name__)
 
 @root_bp.route('/health-check', methods=['GET'])
 @swag_from('../swagger_specs/health_check.yaml')
 def health_check():
-    log_message(
-        level="INFO",
-        message="Health check was performed.",
-        log_type=LogTypeEnum.HEALTH_CHECK
-    )
+    # Liveness only: no database, no log row, so load balancer probes stay free.
     return jsonify(status='OK', message="System Working!"), 200
 
 
 @root_bp.route('/detailed-health-check', methods=['GET'])
 @swag_from('../swagger_specs/detailed_health_check.yaml')
 def detailed_health_check():
-    try:
-        db.session.execute(text('SELECT 1'))
-        database_status = 'OK'
-    except Exception as e:
-        database_status = f'NOT OK: {str(e)}'
-
-    try:
-        telegram_status = asyncio.run(bot.get_me())
-        telegram_status = 'OK' if telegram_status else 'NOT OK'
-    except Exception as e:
-        telegram_status = f'NOT OK: {str(e)}'
-
+    # Served from the background prober's snapshot; see HEALTH_PROBE_* config.
+    checks = health_prober.snapshot()
+    system = checks.get('system', {})
     health_status = {
-        'database': database_status,
-        'telegram_bot': telegram_status,
-        'cpu_usage': psutil.cpu_percent(),
-        'memory_usage': psutil.virtual_memory().percent,
-        'disk_usage': psutil.disk_usage('/').percent
+        'database': checks.get('database', {}).get('status', 'PENDING'),
+        'telegram_bot': checks.get('telegram_bot', {}).get('status', 'PENDING'),
+        'cpu_usage': system.get('cpu_usage'),
+        'memory_usage': system.get('memory_usage'),
+        'disk_usage': system.get('disk_usage'),
+        'log_sink': current_app.extensions['log_sink'].stats(),
+        'heartbeat_buffer': heartbeat_buffer.stats() if heartbeat_buffer.enabled else None,
+        'checks': checks
     }
     return jsonify(health_status), 200
 
 
+@root_bp.route('/metrics', methods=['GET'])
+@swag_from('../swagger_specs/metrics.yaml')
+def metrics_endpoint():
+    if not metrics.enabled:
+        abort(404)
+    return Response(metrics.exposition(), mimetype='text/plain; version=0.0.4')
@@ -3,8 +3,10 @@ from app import db
 from app.models.user import User
 from app.models.log import LogTypeEnum
 from app.utils.logger import log_message
-from sqlalchemy import or_
-from flasgger import swag_from
+from app.utils.license_index import license_index
+from app.utils.queries import telegram_user_lookup_query
+from app.utils.region_outages import valid_region
+from app.utils.apidocs import swag_from
 
 telegram_bp = Blueprint('telegram', __name__)
 
@@ -18,6 +20,7 @@ def create_user_with_telegram():
     email = data.get('email')
     phone_number = data.get('phone_number')
     chat_id = data.get('chat_id')
+    region = data.get('region')
 
     if not all([first_name, last_name, email, phone_number, chat_id]):
         log_message(
@@ -27,12 +30,10 @@ def create_user_with_telegram():
         )
         return jsonify(status="NOK", message="Missing information"), 400
 
-    user = User.query.filter(
-        or_(
-            User.chat_id == chat_id,
-            User.phone_number == phone_number,
-            User.email == email
-        )).first()
+    if not valid_region(region):
+        return jsonify(status="NOK", message="region must be a string of at most 64 characters or null"), 400
+
+    user = telegram_user_lookup_query(chat_id, phone_number, email).first()
 
     if user:
         log_message(
@@ -49,11 +50,13 @@ def create_user_with_telegram():
             last_name=last_name,
             email=email,
             phone_number=phone_number,
-            chat_id=chat_id
+            chat_id=chat_id,
+            region=region
         )
         db.session.add(new_user)
         db.session.commit()
-        
+        license_index.set(new_user.username, new_user.has_license)
+
         log_message(
             level="INFO",
             message="User created successfully.",
@@ -1,10 +1,13 @@
-from flask import Blueprint, jsonify, request
-from app import db
+from flask import Blueprint, current_app, jsonify, request
 from app.models.user import User
 from app.models.log import LogTypeEnum
 from app.utils.logger import log_message
+from app.utils.heartbeat_batch import STATUS_INVALID, STATUS_NOT_FOUND, STATUS_OK, STATUS_STALE, apply_heartbeat_batch
+from app.utils.heartbeat_buffer import apply_heartbeats, heartbeat_buffer
+from app.utils.license_index import license_index
+from app.utils.outage_detector import outage_detector
 from datetime import datetime
-from flasgger import swag_from
+from app.utils.apidocs import swag_from
 
 user_bp = Blueprint('user', __name__)
 
@@ -22,7 +25,11 @@ def post_electric_check():
         )
         return jsonify(message='Username is required'), 400
 
-    user = User.query.filter_by(username=username, has_license=True).first()
+    # The shared license index answers unknown/unlicensed usernames without
+    # a database round-trip; licensed ones still load the row.
+    user = None
+    if license_index.is_licensed(username) is not False:
+        user = User.query.filter_by(username=username, has_license=True).first()
     if user is None:
         log_message(
             level="ERROR",
@@ -32,16 +39,61 @@ def post_electric_check():
         )
         return jsonify(message='User not found'), 404
 
+    # Read before apply_heartbeats commits: attributes are expired on commit
+    # and would otherwise be reloaded with another SELECT.
+    email, outage_threshold_seconds = user.email, user.outage_threshold_seconds
     last_request_date = datetime.now()
-    user.last_request_date = last_request_date
-    db.session.commit()
+    if heartbeat_buffer.enabled:
+        heartbeat_buffer.record(username, last_request_date)
+    else:
+        apply_heartbeats({username: last_request_date})
+    if outage_detector.enabled:
+        outage_detector.record(username, last_request_date, outage_threshold_seconds)
     log_message(
         level="INFO",
         message="Electric check completed and last request date updated.",
         username=username,
         log_type=LogTypeEnum.ELECTRIC_CHECK_SUCCESS
     )
-    return jsonify(status='OK', message='Last request date updated', data={'user': user.email, 'last_request_date': last_request_date.isoformat()}), 200
+    return jsonify(status='OK', message='Last request date updated', data={'user': email, 'last_request_date': last_request_date.isoformat()}), 200
+
+
+@user_bp.route('/electric-check/batch', methods=['POST'])
+@swag_from('../swagger_specs/electric_check_batch_post.yaml')
+def post_electric_check_batch():
+    data = request.get_json(silent=True)
+    entries = data.get('heartbeats') if isinstance(data, dict) else None
+    max_entries = current_app.config['HEARTBEAT_BATCH_MAX_ENTRIES']
+
+    if not isinstance(entries, list) or not entries:
+        log_message(
+            level="ERROR",
+            message="Heartbeats list is required for batch electric check.",
+            log_type=LogTypeEnum.ELECTRIC_CHECK_INVALID_REQUEST
+        )
+        return jsonify(message='Heartbeats list is required'), 400
+    if len(entries) > max_entries:
+        log_message(
+            level="ERROR",
+            message=f"Batch electric check with {len(entries)} entries exceeds the limit of {max_entries}.",
+            log_type=LogTypeEnum.ELECTRIC_CHECK_INVALID_REQUEST
+        )
+        return jsonify(message=f'At most {max_entries} heartbeats per batch'), 400
+
+    results, counts = apply_heartbeat_batch(entries)
+    # One summary row instead of one log row per heartbeat.
+    log_message(
+        level="INFO",
+        message=f"Batch electric check completed: {counts[STATUS_OK]} updated, {counts[STATUS_NOT_FOUND]} not found, {counts[STATUS_INVALID]} invalid, {counts[STATUS_STALE]} stale.",
+        log_type=LogTypeEnum.ELECTRIC_CHECK_SUCCESS
+    )
+    return jsonify(status='OK', message='Batch processed', data={
+        'updated': counts[STATUS_OK],
+        'not_found': counts[STATUS_NOT_FOUND],
+        'invalid': counts[STATUS_INVALID],
+        'stale': counts[STATUS_STALE],
+        'results': results
+    }), 200
 
 
 @user_bp.route('/electric-check', methods=['GET'])
@@ -57,7 +109,11 @@ def get_electric_check():
         )
         return jsonify(message='Username is required'), 400
 
-    user = User.query.filter_by(username=username, has_license=True).first()
+    # The shared license index answers unknown/unlicensed usernames without
+    # a database round-trip; licensed ones still load the row.
+    user = None
+    if license_index.is_licensed(username) is not False:
+        user = User.query.filter_by(username=username, has_license=True).first()
     if user is None:
         log_message(
             level="ERROR",
@@ -67,10 +123,15 @@ def get_electric_check():
         )
         return jsonify(message='User not found'), 404
 
+    last_request_date = user.last_request_date
+    pending_request_date = heartbeat_buffer.pending_for(username) if heartbeat_buffer.enabled else None
+    if pending_request_date is not None and (last_request_date is None or pending_request_date > last_request_date):
+        last_request_date = pending_request_date
+
     log_message(
         level="INFO",
         message="Electric check retrieval successful.",
         username=username,
         log_type=LogTypeEnum.ELECTRIC_CHECK_RETRIEVAL
     )
-    return jsonify(status='OK', message='Last request date retrieved', data={'user': user.email, 'last_request_date': user.last_request_date.isoformat() if user.last_request_date else None}), 200
+    return jsonify(status='OK', message='Last request date retrieved', data={'user': user.email, 'last_request_date': last_request_date.isoformat() if last_request_date else None}), 200
@@ -0,0 +1,126 @@
+import logging
+import os
+import sys
+from functools import cache, partial
+from importlib.metadata import version
+from importlib.util import find_spec
+
+from flask import Blueprint
+
+from config import Config
+from app.utils.lazy import LazyProxy
+
+logger = logging.getLogger(__name__)
+
+# The lazy path mirrors flasgger internals (the attributes swag_from sets,
+# the views and blueprint Swagger registers) as of this release, the one
+# pinned in requirements.txt. Any other version gets stock flasgger.
+TESTED_FLASGGER_VERSION = '0.9.7.1'
+
+SWAGGER_TEMPLATE = {
+    'title': 'Electric Checker API',
+    'uiversion': 3,
+    'specs_route': '/swagger/',
+    'openapi': '3.0.2',
+    'static_url_path': '/flasgger_static',
+    'swagger_ui': True
+}
+
+
+@cache
+def _lazy_apidocs(lazy_startup):
+    if not lazy_startup:
+        return False
+    installed = version('flasgger')
+    if installed != TESTED_FLASGGER_VERSION:
+        logger.warning(f"flasgger {installed} is not the tested {TESTED_FLASGGER_VERSION}; "
+                       f"loading it at startup instead of lazily.")
+        return False
+    return True
+
+
+def swag_from(specs):
+    # Views are decorated at import, before any app exists, so this follows
+    # Config.LAZY_STARTUP. Without it, flasgger's own decorator; with it,
+    # records a view's YAML spec on the function, the attributes
+    # flasgger.swag_from sets and Swagger reads when it builds the apispec,
+    # without importing flasgger or wrapping the view.
+    if not _lazy_apidocs(Config.LAZY_STARTUP):
+        from flasgger import swag_from as flasgger_swag_from
+        return flasgger_swag_from(specs)
+
+    def decorator(function):
+        root_path = os.path.dirname(os.path.abspath(sys.modules[function.__module__].__file__))
+        function.root_path = root_path
+        function.swag_path = os.path.join(root_path, specs)
+        function.swag_type = specs.rsplit('.', 1)[-1]
+        return function
+    return decorator
+
+
+def _build_swagger(app):
+    # The Swagger object flasgger would create in init_app, minus the
+    # blueprint and request hooks, which _lazy_blueprint provides.
+    from flasgger import Swagger
+
+    swagger = Swagger(template=SWAGGER_TEMPLATE)
+    swagger.app = app
+    swagger.load_config(app)
+    return swagger
+
+
+def _build_views(swagger):
+    from flasgger.base import APIDocsView, APISpecsView, OAuthRedirect
+
+    swagger = swagger.get()
+    views = {
+        'apidocs': APIDocsView.as_view('apidocs', view_args=dict(config=swagger.config)),
+        'oauth_redirect': OAuthRedirect.as_view('oauth_redirect'),
+    }
+    for spec in swagger.config['specs']:
+        views[spec['endpoint']] = APISpecsView.as_view(
+            spec['endpoint'], loader=partial(swagger.get_apispecs, endpoint=spec['endpoint']))
+    return views
+
+
+def _lazy_view(views, name):
+    # A plain function: flasgger inspects the source of every view when it
+    # builds the apispec.
+    def view(**kwargs):
+        return views.get()[name](**kwargs)
+    view.__name__ = name
+    return view
+
+
+def _lazy_blueprint(config, swagger):
+    # Same blueprint name, routes and static files as flasgger registers, so
+    # url_for('flasgger.static', ...) in its templates keeps working.
+    # flasgger itself (with jsonschema, yaml and mistune) is imported and
+    # the Swagger object built only when one of the routes is requested.
+    package = find_spec('flasgger').submodule_search_locations[0]
+    uiversion = config.get('uiversion', 3)
+    blueprint = Blueprint(
+        'flasgger',
+        __name__,
+        template_folder=os.path.join(package, f'ui{uiversion}', 'templates'),
+        static_folder=os.path.join(package, f'ui{uiversion}', 'static'),
+        static_url_path=config.get('static_url_path')
+    )
+    views = LazyProxy(partial(_build_views, swagger))
+    blueprint.add_url_rule(config.get('specs_route', '/apidocs/'), 'apidocs', view_func=_lazy_view(views, 'apidocs'))
+    blueprint.add_url_rule('/oauth2-redirect.html', 'oauth_redirect', view_func=_lazy_view(views, 'oauth_redirect'))
+    for spec in config.get('specs', [{'endpoint': 'apispec_1', 'route': '/apispec_1.json'}]):
+        blueprint.add_url_rule(spec['route'], spec['endpoint'], view_func=_lazy_view(views, spec['endpoint']))
+    return blueprint
+
+
+def init_apidocs(app):
+    if _lazy_apidocs(app.config['LAZY_STARTUP']):
+        swagger = LazyProxy(partial(_build_swagger, app))
+        # Where flasgger's `flask generate-api-schema` looks for it.
+        app.swag = swagger
+        app.register_blueprint(_lazy_blueprint(app.config['SWAGGER'], swagger))
+        return
+
+    from flasgger import Swagger
+    Swagger(app, template=SWAGGER_TEMPLATE)
@@ -0,0 +1,89 @@
+import asyncio
+import atexit
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncRunner:
+    # One long-lived event loop per worker, running in a background thread.
+    # It owns the Telegram bot so its HTTP connection pool survives between
+    # calls, and sync Flask code talks to it through submit()/run().
+    def __init__(self):
+        self.loop = None
+        self.bot = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app, bot):
+        self.bot = bot
+        self.shutdown_timeout = app.config['ASYNC_RUNNER_SHUTDOWN_TIMEOUT']
+        app.extensions['async_runner'] = self
+        atexit.register(self.shutdown)
+
+    @property
+    def running(self):
+        return self.loop is not None and self.loop.is_running()
+
+    def submit(self, coro):
+        # Thread-safe; returns a concurrent.futures.Future.
+        self._ensure_started()
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro, timeout=None):
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def shutdown(self):
+        with self._lock:
+            if self.loop is None:
+                return
+            loop, thread = self.loop, self._thread
+            self.loop = None
+            self._thread = None
+
+        try:
+            # A bot that was never used has no connections to close.
+            if self.bot is not None and getattr(self.bot, 'loaded', True):
+                asyncio.run_coroutine_threadsafe(self.bot.shutdown(), loop).result(self.shutdown_timeout)
+        except Exception as e:
+            logger.error(f"Error while shutting down telegram bot: {str(e)}")
+
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(self.shutdown_timeout)
+        # A callback blocking the loop keeps it running past the timeout;
+        # closing a running loop raises, and the daemon thread dies with
+        # the process anyway.
+        if thread.is_alive():
+            logger.warning(f"Async runner loop still running after {self.shutdown_timeout}s, not closing it.")
+            return
+        loop.close()
+
+    def _ensure_started(self):
+        if self.loop is not None:
+            return
+
+        with self._lock:
+            if self.loop is not None:
+                return
+            loop = asyncio.new_event_loop()
+            started = threading.Event()
+            thread = threading.Thread(target=self._run_loop, args=(loop, started), name='async-runner', daemon=True)
+            thread.start()
+            started.wait()
+            self._thread = thread
+            self.loop = loop
+
+    @staticmethod
+    def _run_loop(loop, started):
+        asyncio.set_event_loop(loop)
+        loop.call_soon(started.set)
+        loop.run_forever()
+
+
+async_runner = AsyncRunner()
@@ -0,0 +1,192 @@
+import asyncio
+import logging
+import threading
+import time
+from datetime import datetime
+
+from app import db
+from app.models.notification_job import NotificationJob
+from app.utils.async_runner import async_runner
+from app.utils.notifications import send_broadcast_email, send_email, send_telegram
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncRateLimiter:
+    # Token bucket: at most `rate` acquisitions per second, bursting to `rate`.
+    def __init__(self, rate):
+        self.rate = float(rate)
+        self.tokens = self.rate
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.rate, self.tokens + (now - self.updated_at) * self.rate)
+                self.updated_at = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class PerKeyInterval:
+    # Minimum spacing between two acquisitions for the same key.
+    def __init__(self, interval):
+        self.interval = interval
+        self._next_allowed = {}
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, key):
+        async with self._lock:
+            now = time.monotonic()
+            allowed_at = max(now, self._next_allowed.get(key, now))
+            self._next_allowed[key] = allowed_at + self.interval
+        if allowed_at > now:
+            await asyncio.sleep(allowed_at - now)
+
+
+_limiters = None
+
+
+def telegram_limiters(app):
+    # TELEGRAM_GLOBAL_RATE is a per-bot limit, so every notification job and
+    # outbox worker of this process shares one pair of limiters. They are
+    # only touched from the async runner's loop and are rebuilt if the
+    # runner was restarted with a new one.
+    global _limiters
+    loop = asyncio.get_running_loop()
+    if _limiters is None or _limiters[0] is not loop:
+        _limiters = (loop,
+                     AsyncRateLimiter(app.config['TELEGRAM_GLOBAL_RATE']),
+                     PerKeyInterval(app.config['TELEGRAM_PER_CHAT_INTERVAL']))
+    return _limiters[1:]
+
+
+class NotificationFanout:
+    def __init__(self, app, job_id, concurrency, progress_interval=1.0):
+        self.app = app
+        self.job_id = job_id
+        self.concurrency = concurrency
+        self.progress_interval = progress_interval
+        self.succeeded = 0
+        self.failed = 0
+
+    async def run(self, subject, body, emails=(), chat_ids=(), email_batches=()):
+        # Every address in emails and chat id in chat_ids gets a message of
+        # its own; every list in email_batches gets one BCC email.
+        # Runs on the worker's shared event loop; push an app context so the
+        # tasks below (and log_message) can reach the app.
+        with self.app.app_context():
+            await self._send_all(subject, body, emails, chat_ids, email_batches)
+
+    async def _send_all(self, subject, body, emails, chat_ids, email_batches):
+        semaphore = asyncio.Semaphore(self.concurrency)
+        telegram_limiter, chat_limiter = telegram_limiters(self.app)
+
+        async def send_mail_to(email):
+            async with semaphore:
+                ok = await asyncio.to_thread(self._in_app_context, send_email, subject, email, body)
+            self._record(ok)
+
+        async def send_broadcast_mail_to(batch):
+            async with semaphore:
+                ok = await asyncio.to_thread(self._in_app_context, send_broadcast_email, subject, batch, body)
+            self._record(ok)
+
+        async def send_telegram_to(chat_id):
+            await chat_limiter.acquire(chat_id)
+            await telegram_limiter.acquire()
+            async with semaphore:
+                ok = await send_telegram(chat_id, body)
+            self._record(ok)
+
+        tasks = [asyncio.create_task(send_mail_to(email)) for email in emails]
+        tasks += [asyncio.create_task(send_broadcast_mail_to(batch)) for batch in email_batches]
+        tasks += [asyncio.create_task(send_telegram_to(chat_id)) for chat_id in chat_ids]
+
+        reporter = asyncio.create_task(self._report_progress())
+        try:
+            await asyncio.gather(*tasks)
+        finally:
+            reporter.cancel()
+
+    def _record(self, ok):
+        if ok:
+            self.succeeded += 1
+        else:
+            self.failed += 1
+
+    def _in_app_context(self, func, *args):
+        with self.app.app_context():
+            return func(*args)
+
+    async def _report_progress(self):
+        while True:
+            await asyncio.sleep(self.progress_interval)
+            await asyncio.to_thread(self._in_app_context, self.save_progress)
+
+    def save_progress(self, status=None):
+        job = db.session.get(NotificationJob, self.job_id)
+        job.succeeded = self.succeeded
+        job.failed = self.failed
+        if status is not None:
+            job.status = status
+            if status in ('DONE', 'FAILED'):
+                job.finished_at = datetime.utcnow()
+        db.session.commit()
+
+
+def _run_job(app, job_id, subject, body, targets):
+    fanout = NotificationFanout(
+        app,
+        job_id,
+        concurrency=app.config['NOTIFICATION_CONCURRENCY']
+    )
+    with app.app_context():
+        job = db.session.get(NotificationJob, job_id)
+        job.status = 'RUNNING'
+        job.started_at = datetime.utcnow()
+        db.session.commit()
+
+        try:
+            async_runner.run(fanout.run(subject, body, **targets))
+            fanout.save_progress(status='DONE')
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Notification job {job_id} failed: {str(e)}")
+            fanout.save_progress(status='FAILED')
+
+
+def _start_job(app, subject, body, **targets):
+    job = NotificationJob(status='PENDING', total=sum(len(sends) for sends in targets.values()))
+    db.session.add(job)
+    db.session.commit()
+    job_id = job.id
+
+    thread = threading.Thread(
+        target=_run_job,
+        args=(app, job_id, subject, body, targets),
+        name=f'notification-job-{job_id}',
+        daemon=True
+    )
+    thread.start()
+    return job_id
+
+
+def start_notification_job(app, recipients, subject, body):
+    # recipients: list of (email, chat_id). Returns the job id immediately and
+    # delivers in a background thread on a single event loop.
+    return _start_job(app, subject, body,
+                      emails=[email for email, _ in recipients],
+                      chat_ids=[chat_id for _, chat_id in recipients])
+
+
+def start_broadcast_job(app, email_batches, chat_ids, subject, body):
+    # Same, for one message to many users: each list of addresses in
+    # email_batches is sent a single BCC email.
+    return _start_job(app, subject, body,
+                      email_batches=[list(batch) for batch in email_batches],
+                      chat_ids=list(chat_ids))
@@ -0,0 +1,148 @@
+import atexit
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from datetime import datetime
+
+import click
+from sqlalchemy import text
+
+from app import db
+from app.utils.async_runner import async_runner
+
+logger = logging.getLogger(__name__)
+
+
+class HealthProber:
+    # Probes the dependencies in the background every `interval` seconds and
+    # keeps the latest result of each, so health endpoints only read a
+    # snapshot. Each probe has its own timeout; a probe that is still stuck
+    # from an earlier round is reported as such instead of being started again.
+    def __init__(self, app=None):
+        self.app = None
+        self._results = {}
+        self._running = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app, bot=None):
+        self.app = app
+        self.bot = bot
+        self.interval = app.config['HEALTH_PROBE_INTERVAL_SECONDS']
+        # The probes build the Telegram bot and load psutil; a lazily started
+        # worker leaves that until after its first interval.
+        self.delay_first_probe = app.config['LAZY_STARTUP']
+        self.timeouts = {
+            'database': app.config['HEALTH_DATABASE_TIMEOUT_SECONDS'],
+            'telegram_bot': app.config['HEALTH_TELEGRAM_TIMEOUT_SECONDS'],
+            'system': app.config['HEALTH_SYSTEM_TIMEOUT_SECONDS'],
+        }
+        self._executor = ThreadPoolExecutor(max_workers=len(self.timeouts), thread_name_prefix='health-probe')
+        app.extensions['health_prober'] = self
+
+        # CLI commands have nothing to serve; the first snapshot() call
+        # probes synchronously there instead.
+        if click.get_current_context(silent=True) is not None:
+            return
+
+        self._thread = threading.Thread(target=self._run, name='health-prober', daemon=True)
+        self._thread.start()
+        atexit.register(self._stop.set)
+
+    def snapshot(self):
+        # {name: result} with each result's age at the time of the call.
+        with self._lock:
+            results = dict(self._results)
+        if not results:
+            results = self.refresh()
+
+        now = time.time()
+        snapshot = {}
+        for name, result in results.items():
+            result = dict(result)
+            result['age_seconds'] = round(now - result.pop('checked_at_ts'), 3)
+            snapshot[name] = result
+        return snapshot
+
+    def refresh(self):
+        futures = {}
+        started = {}
+        for name, probe in (('database', self._probe_database),
+                            ('telegram_bot', self._probe_telegram),
+                            ('system', self._probe_system)):
+            with self._lock:
+                if self._running.get(name):
+                    continue
+                self._running[name] = True
+            started[name] = time.monotonic()
+            futures[name] = self._executor.submit(self._call, name, probe)
+
+        for name, future in futures.items():
+            timeout = self.timeouts[name]
+            try:
+                status, details = future.result(max(0.0, timeout - (time.monotonic() - started[name])))
+            except FutureTimeoutError:
+                status, details = f'NOT OK: timed out after {timeout}s', {}
+            self._store(name, status, details, started[name])
+
+        with self._lock:
+            return dict(self._results)
+
+    def _call(self, name, probe):
+        try:
+            with self.app.app_context():
+                return 'OK', probe()
+        except Exception as e:
+            return f'NOT OK: {str(e)}', {}
+        finally:
+            with self._lock:
+                self._running[name] = False
+
+    def _store(self, name, status, details, started):
+        result = {
+            'status': status,
+            'checked_at': datetime.utcnow().isoformat(),
+            'checked_at_ts': time.time(),
+            'duration_ms': int((time.monotonic() - started) * 1000),
+        }
+        result.update(details)
+        with self._lock:
+            self._results[name] = result
+
+    def _probe_database(self):
+        try:
+            db.session.execute(text('SELECT 1'))
+        finally:
+            db.session.rollback()
+        return {}
+
+    def _probe_telegram(self):
+        if not async_runner.run(self.bot.get_me(), timeout=self.timeouts['telegram_bot']):
+            raise RuntimeError('get_me returned nothing')
+        return {}
+
+    def _probe_system(self):
+        import psutil
+        return {
+            'cpu_usage': psutil.cpu_percent(),
+            'memory_usage': psutil.virtual_memory().percent,
+            'disk_usage': psutil.disk_usage('/').percent,
+        }
+
+    def _run(self):
+        if self.delay_first_probe:
+            self._stop.wait(self.interval)
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception as e:
+                logger.error(f"Health probe round failed: {str(e)}")
+            self._stop.wait(self.interval)
+
+
+health_prober = HealthProber()
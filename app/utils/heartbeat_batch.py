@@ -0,0 +1,98 @@
+from datetime import datetime
+
+from sqlalchemy import select
+
+from app import db
+from app.models.user import User
+from app.utils.heartbeat_buffer import apply_heartbeats, heartbeat_buffer
+from app.utils.license_index import license_index
+from app.utils.outage_detector import outage_detector
+
+STATUS_OK = 'OK'
+STATUS_NOT_FOUND = 'NOT_FOUND'
+STATUS_INVALID = 'INVALID'
+STATUS_STALE = 'STALE'
+
+
+def _parse_entry(entry, now):
+    # Returns (username, seen_at) or raises ValueError. Timestamps from the
+    # future are clamped to now; aware ones are converted to server time,
+    # which is what last_request_date holds.
+    if not isinstance(entry, dict):
+        raise ValueError('Entry must be an object')
+    username = entry.get('username')
+    if not isinstance(username, str) or not username:
+        raise ValueError('Username is required')
+
+    observed_at = entry.get('observed_at')
+    if observed_at is None:
+        return username, now
+    if not isinstance(observed_at, str):
+        raise ValueError('observed_at must be an ISO 8601 timestamp')
+    try:
+        seen_at = datetime.fromisoformat(observed_at)
+    except ValueError:
+        raise ValueError('observed_at must be an ISO 8601 timestamp')
+    if seen_at.tzinfo is not None:
+        seen_at = seen_at.astimezone().replace(tzinfo=None)
+    return username, min(seen_at, now)
+
+
+def apply_heartbeat_batch(entries, now=None):
+    # One license query and one bulk UPDATE for the whole batch, whatever
+    # its size. Returns (results, counts) with one result per entry, in order.
+    now = now or datetime.now()
+    parsed = []
+    latest = {}
+    for entry in entries:
+        try:
+            username, seen_at = _parse_entry(entry, now)
+        except ValueError as e:
+            username = entry.get('username') if isinstance(entry, dict) else None
+            parsed.append((username if isinstance(username, str) else None, str(e)))
+            continue
+        parsed.append((username, None))
+        if username not in latest or latest[username] < seen_at:
+            latest[username] = seen_at
+
+    # The license index rules out unknown usernames without touching the
+    # database; whatever it cannot answer goes into a single IN query.
+    candidates = [username for username in latest if license_index.is_licensed(username) is not False]
+    found = {}
+    if candidates:
+        found = {row.username: row for row in db.session.execute(
+            select(User.username, User.outage_threshold_seconds, User.last_request_date)
+            .where(User.username.in_(candidates), User.has_license.is_(True))
+        )}
+    thresholds = {username: row.outage_threshold_seconds for username, row in found.items()}
+
+    # Heartbeats no newer than the stored one would not change anything.
+    stale = {
+        username: row.last_request_date for username, row in found.items()
+        if row.last_request_date is not None and latest[username] <= row.last_request_date
+    }
+    heartbeats = {username: latest[username] for username in found if username not in stale}
+    if heartbeat_buffer.enabled:
+        for username, seen_at in heartbeats.items():
+            heartbeat_buffer.record(username, seen_at)
+    else:
+        apply_heartbeats(heartbeats)
+    if outage_detector.enabled:
+        for username, seen_at in heartbeats.items():
+            outage_detector.record(username, seen_at, thresholds[username])
+
+    results = []
+    counts = {STATUS_OK: 0, STATUS_NOT_FOUND: 0, STATUS_INVALID: 0, STATUS_STALE: 0}
+    for username, error in parsed:
+        if error is not None:
+            result = {'username': username, 'status': STATUS_INVALID, 'message': error}
+        elif username in stale:
+            result = {'username': username, 'status': STATUS_STALE, 'message': 'Not newer than the last heartbeat',
+                      'last_request_date': stale[username].isoformat()}
+        elif username in heartbeats:
+            result = {'username': username, 'status': STATUS_OK, 'last_request_date': heartbeats[username].isoformat()}
+        else:
+            result = {'username': username, 'status': STATUS_NOT_FOUND, 'message': 'User not found'}
+        counts[result['status']] += 1
+        results.append(result)
+    return results, counts
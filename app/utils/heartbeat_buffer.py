@@ -0,0 +1,173 @@
+import atexit
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from sqlalchemy import DateTime, String, bindparam, column, update, values
+
+from app import db
+from app.models.user import User
+from app.utils.outages import heartbeat_values
+
+logger = logging.getLogger(__name__)
+
+# Two bind parameters per row, well below PostgreSQL's 65535 limit.
+VALUES_CHUNK_SIZE = 10000
+
+
+def heartbeat_update():
+    # Executed with one {b_username, b_seen_at} parameter set per heartbeat.
+    return (
+        update(User.__table__)
+        .where(User.username == bindparam('b_username'))
+        .values(heartbeat_values(bindparam('b_seen_at')))
+    )
+
+
+def apply_heartbeats(heartbeats):
+    # heartbeats: {username: seen_at}. Never moves last_request_date
+    # backwards, and drives the outage state machine. On PostgreSQL each
+    # chunk is a single UPDATE ... FROM (VALUES ...); elsewhere one
+    # executemany UPDATE.
+    if not heartbeats:
+        return 0
+
+    items = list(heartbeats.items())
+    if db.session.get_bind().dialect.name == 'postgresql':
+        for start in range(0, len(items), VALUES_CHUNK_SIZE):
+            rows = values(
+                column('b_username', String), column('b_seen_at', DateTime), name='heartbeat'
+            ).data(items[start:start + VALUES_CHUNK_SIZE])
+            db.session.execute(
+                update(User.__table__)
+                .where(User.username == rows.c.b_username)
+                .values(heartbeat_values(rows.c.b_seen_at))
+            )
+    else:
+        db.session.execute(heartbeat_update(), [
+            {'b_username': username, 'b_seen_at': last_seen}
+            for username, last_seen in items
+        ])
+    db.session.commit()
+    return len(heartbeats)
+
+
+class HeartbeatBuffer:
+    def __init__(self, app=None):
+        self.app = None
+        self._pending = {}
+        # When the oldest entry still in _pending was accepted; requeued
+        # entries keep theirs, so this covers failed flushes too.
+        self._oldest_pending_at = None
+        self.failed_flushes = 0
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.flush_interval = app.config['HEARTBEAT_FLUSH_INTERVAL_MS'] / 1000.0
+        self.max_entries = app.config['HEARTBEAT_FLUSH_MAX_ENTRIES']
+        app.extensions['heartbeat_buffer'] = self
+
+        self._thread = threading.Thread(target=self._run, name='heartbeat-flusher', daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    @property
+    def enabled(self):
+        return self.app is not None
+
+    @property
+    def oldest_pending_age(self):
+        # How long the oldest heartbeat this worker has not yet written has
+        # been waiting. Grows without bound while flushes keep failing.
+        with self._lock:
+            oldest = self._oldest_pending_at
+        if oldest is None:
+            return timedelta(0)
+        return timedelta(seconds=time.monotonic() - oldest)
+
+    @property
+    def max_staleness(self):
+        # How far the database may lag behind accepted heartbeats. A healthy
+        # worker flushes within one interval, and the flush itself can take
+        # up to another; this worker's unflushed backlog may be older still.
+        # Other workers' backlogs are not visible from here (see README).
+        if not self.enabled:
+            return timedelta(0)
+        return max(timedelta(seconds=2 * self.flush_interval), self.oldest_pending_age)
+
+    def stats(self):
+        with self._lock:
+            pending_count = len(self._pending)
+        return {
+            'pending': pending_count,
+            'oldest_pending_seconds': round(self.oldest_pending_age.total_seconds(), 3),
+            'failed_flushes': self.failed_flushes,
+        }
+
+    def record(self, username, seen_at):
+        with self._lock:
+            if not self._pending:
+                self._oldest_pending_at = time.monotonic()
+            current = self._pending.get(username)
+            if current is None or current < seen_at:
+                self._pending[username] = seen_at
+            pending_count = len(self._pending)
+
+        if pending_count >= self.max_entries:
+            self._wakeup.set()
+
+    def pending_for(self, username):
+        with self._lock:
+            return self._pending.get(username)
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            pending_since, self._oldest_pending_at = self._oldest_pending_at, None
+
+        if not pending:
+            return 0
+
+        # The rollback and the app context can fail too (database gone);
+        # the heartbeats go back into the buffer whatever raised.
+        try:
+            with self.app.app_context():
+                try:
+                    return apply_heartbeats(pending)
+                except Exception:
+                    db.session.rollback()
+                    raise
+        except Exception as e:
+            logger.error(f"Heartbeat flush of {len(pending)} entries failed: {str(e)}")
+            self.failed_flushes += 1
+            self._requeue(pending, pending_since)
+            return 0
+
+    def _requeue(self, pending, pending_since):
+        with self._lock:
+            if self._oldest_pending_at is None or pending_since < self._oldest_pending_at:
+                self._oldest_pending_at = pending_since
+            for username, seen_at in pending.items():
+                current = self._pending.get(username)
+                if current is None or current < seen_at:
+                    self._pending[username] = seen_at
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            # Nothing may end this thread: pending heartbeats would pile up
+            # unflushed without any further error.
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Heartbeat flusher round failed")
+
+
+heartbeat_buffer = HeartbeatBuffer()
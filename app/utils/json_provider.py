@@ -0,0 +1,35 @@
+import orjson
+from flask.json.provider import JSONProvider, _default
+
+
+class OrjsonProvider(JSONProvider):
+    # Flask JSON provider backed by orjson, selected with JSON_PROVIDER.
+    # Like Flask's default provider: keys sorted, compact unless debug, and
+    # dates, Decimals and __html__ objects encoded the same way (datetimes
+    # as HTTP dates, not orjson's ISO strings). Unlike it, non-ASCII text
+    # is written as raw UTF-8 rather than \u escapes; orjson has no
+    # ensure_ascii. The decoded documents are equal, the bytes are not.
+    sort_keys = True
+    compact = None
+    mimetype = 'application/json'
+
+    def _options(self, indent=False):
+        options = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=_default, option=self._options(kwargs.get('indent'))).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        # orjson returns bytes; skip the str round trip dumps() makes.
+        body = orjson.dumps(obj, default=_default, option=self._options(indent) | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
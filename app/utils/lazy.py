@@ -0,0 +1,35 @@
+import threading
+
+
+class LazyProxy:
+    # Stands in for an object that is expensive to import or build (the
+    # Telegram bot, Flask-Mail) and builds it on first attribute access, so
+    # processes that never use it never pay for it. bind() sets the factory;
+    # get() builds eagerly.
+    def __init__(self, factory=None):
+        self._factory = factory
+        self._target = None
+        self._lock = threading.Lock()
+
+    def bind(self, factory):
+        with self._lock:
+            self._factory = factory
+            self._target = None
+
+    @property
+    def loaded(self):
+        return self._target is not None
+
+    def get(self):
+        target = self._target
+        if target is None:
+            with self._lock:
+                if self._target is None:
+                    if self._factory is None:
+                        raise RuntimeError("Lazy object used before create_app() configured it")
+                    self._target = self._factory()
+                target = self._target
+        return target
+
+    def __getattr__(self, name):
+        return getattr(self.get(), name)
@@ -0,0 +1,65 @@
+import fcntl
+import hashlib
+import os
+import tempfile
+import zlib
+from contextlib import contextmanager
+
+from sqlalchemy import text
+
+from app import db
+
+
+def _default_path(name, database_uri):
+    suffix = hashlib.blake2b(str(database_uri).encode(), digest_size=6).hexdigest()
+    return os.path.join(tempfile.gettempdir(), f'electric-checker-{name}-{suffix}.lock')
+
+
+class LeaderLock:
+    # Non-blocking, deployment-wide mutex. On PostgreSQL it is a session
+    # advisory lock, so it spans hosts and is released if the holder dies;
+    # elsewhere (SQLite) an flock on a file next to the other workers.
+    def __init__(self, name, path=None):
+        self.name = name
+        self.key = zlib.crc32(name.encode())
+        self.path = path
+
+    @contextmanager
+    def hold(self):
+        # Yields True if this process now holds the lock, False if someone
+        # else does; never waits.
+        if db.engine.dialect.name == 'postgresql':
+            with self._hold_advisory() as acquired:
+                yield acquired
+        else:
+            with self._hold_file() as acquired:
+                yield acquired
+
+    @contextmanager
+    def _hold_advisory(self):
+        with db.engine.connect() as connection:
+            acquired = connection.execute(text('SELECT pg_try_advisory_lock(:key)'), {'key': self.key}).scalar()
+            connection.commit()
+            try:
+                yield bool(acquired)
+            finally:
+                if acquired:
+                    connection.execute(text('SELECT pg_advisory_unlock(:key)'), {'key': self.key})
+                    connection.commit()
+
+    @contextmanager
+    def _hold_file(self):
+        path = self.path or _default_path(self.name, db.engine.url)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
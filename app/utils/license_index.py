@@ -0,0 +1,292 @@
+import fcntl
+import hashlib
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+import uuid
+
+from sqlalchemy import select
+
+from app import db
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+# Shared, mmap'd username -> (licensed, version) table. Every gunicorn worker
+# maps the same file; writers serialize on a thread lock plus flock (which
+# only excludes other open files, not threads sharing this one) and bump a
+# seqlock counter so readers never need a lock.
+MAGIC = b'ECLI'
+LAYOUT_VERSION = 1
+HEADER = struct.Struct('<4sIIQBBxxdI')
+HEADER_SIZE = 64
+SEQ_OFFSET = 12
+SLOT = struct.Struct('<16sBBxxI')
+
+SLOT_EMPTY = 0
+SLOT_USED = 1
+SLOT_DELETED = 2
+
+MAX_LOAD_FACTOR = 0.75
+READ_RETRIES = 100
+
+
+def _key(username):
+    try:
+        return uuid.UUID(username).bytes
+    except (ValueError, AttributeError, TypeError):
+        return hashlib.blake2b(str(username).encode(), digest_size=16).digest()
+
+
+def _default_path(database_uri):
+    directory = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+    suffix = hashlib.blake2b(str(database_uri).encode(), digest_size=6).hexdigest()
+    return os.path.join(directory, f'electric-checker-license-index-{suffix}')
+
+
+class LicenseIndex:
+    def __init__(self, app=None):
+        self.app = None
+        self._map = None
+        self._thread_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.capacity = app.config['LICENSE_INDEX_CAPACITY']
+        self.reconcile_interval = app.config['LICENSE_INDEX_RECONCILE_SECONDS']
+        self.path = app.config['LICENSE_INDEX_PATH'] or _default_path(app.config['SQLALCHEMY_DATABASE_URI'])
+        self.size = HEADER_SIZE + self.capacity * SLOT.size
+
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        fcntl.flock(self._fd, fcntl.LOCK_EX)
+        try:
+            if os.fstat(self._fd).st_size != self.size or not self._header_matches():
+                os.ftruncate(self._fd, 0)
+                os.ftruncate(self._fd, self.size)
+                os.pwrite(self._fd, HEADER.pack(MAGIC, LAYOUT_VERSION, self.capacity, 0, 0, 0, 0.0, 0), 0)
+        finally:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+
+        self._map = mmap.mmap(self._fd, self.size, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        app.extensions['license_index'] = self
+
+        self._thread = threading.Thread(target=self._run, name='license-index-reconciler', daemon=True)
+        self._thread.start()
+
+    @property
+    def enabled(self):
+        return self._map is not None
+
+    def is_licensed(self, username):
+        # True/False when the index can answer, None when the caller has to
+        # ask the database (index disabled, not built yet or overflowed).
+        if not self.enabled:
+            return None
+
+        key = _key(username)
+        for _ in range(READ_RETRIES):
+            seq = self._seq()
+            if seq & 1:
+                time.sleep(0)
+                continue
+
+            _, _, _, _, ready, overflow, _, _ = HEADER.unpack_from(self._map, 0)
+            if not ready or overflow:
+                return None
+
+            slot = self._find(key)
+            licensed = False
+            if slot is not None:
+                licensed = bool(SLOT.unpack_from(self._map, self._offset(slot))[2])
+
+            if self._seq() == seq:
+                return licensed
+
+        return None
+
+    def set(self, username, licensed):
+        if not self.enabled:
+            return
+
+        key = _key(username)
+        with self._write():
+            slot = self._find(key)
+            if slot is None:
+                # Same limit as reconcile(): past it, probe chains get long
+                # and lookups go to the database until a larger capacity.
+                count = HEADER.unpack_from(self._map, 0)[7]
+                slot = self._free_slot(key) if count + 1 <= int(self.capacity * MAX_LOAD_FACTOR) else None
+                if slot is None:
+                    self._set_header(overflow=1)
+                    logger.error("License index is full, falling back to database lookups.")
+                    return
+                version = 0
+                self._set_header(count=count + 1)
+            else:
+                version = SLOT.unpack_from(self._map, self._offset(slot))[3]
+            SLOT.pack_into(self._map, self._offset(slot), key, SLOT_USED, int(bool(licensed)), version + 1)
+
+    def remove(self, username):
+        if not self.enabled:
+            return
+
+        key = _key(username)
+        with self._write():
+            slot = self._find(key)
+            if slot is not None:
+                version = SLOT.unpack_from(self._map, self._offset(slot))[3]
+                SLOT.pack_into(self._map, self._offset(slot), key, SLOT_DELETED, 0, version + 1)
+                self._set_header(count=HEADER.unpack_from(self._map, 0)[7] - 1)
+
+    def reconcile(self, force=False):
+        # Rebuild the table from the user table. The write lock is held while
+        # reading so admin writes, from any worker or thread, can't
+        # interleave with the snapshot.
+        with self._write(mark=False):
+            _, _, _, _, ready, overflow, last_reconcile, _ = HEADER.unpack_from(self._map, 0)
+            if not force and ready and time.time() - last_reconcile < self.reconcile_interval:
+                return None
+
+            table = bytearray(self.capacity * SLOT.size)
+            limit = int(self.capacity * MAX_LOAD_FACTOR)
+            count = 0
+            drift = 0
+            with self.app.app_context():
+                rows = db.session.execute(
+                    select(User.username, User.has_license).execution_options(yield_per=5000)
+                )
+                for username, has_license in rows:
+                    count += 1
+                    if count > limit:
+                        break
+
+                    key = _key(username)
+                    licensed = int(bool(has_license))
+                    version = 1
+                    old_slot = self._find(key) if ready and not overflow else None
+                    if old_slot is not None:
+                        _, _, old_licensed, old_version = SLOT.unpack_from(self._map, self._offset(old_slot))
+                        version = old_version if old_licensed == licensed else old_version + 1
+                        if old_licensed != licensed:
+                            drift += 1
+                    elif ready and not overflow:
+                        drift += 1
+
+                    slot = self._hash(key)
+                    while table[slot * SLOT.size + 16] != SLOT_EMPTY:
+                        slot = (slot + 1) % self.capacity
+                    SLOT.pack_into(table, slot * SLOT.size, key, SLOT_USED, licensed, version)
+                rows.close()
+
+            if count > limit:
+                self._bump_seq()
+                self._set_header(ready=1, overflow=1, last_reconcile=time.time())
+                self._bump_seq()
+                logger.error(f"License index capacity {self.capacity} is too small for the user table.")
+                return None
+
+            self._bump_seq()
+            self._map[HEADER_SIZE:self.size] = table
+            self._set_header(ready=1, overflow=0, last_reconcile=time.time(), count=count)
+            self._bump_seq()
+
+        if drift:
+            logger.info(f"License index reconciled, repaired {drift} entries.")
+        return drift
+
+    def _run(self):
+        while True:
+            try:
+                self.reconcile()
+            except Exception as e:
+                logger.error(f"License index reconcile failed: {str(e)}")
+            time.sleep(self.reconcile_interval)
+
+    def _header_matches(self):
+        header = os.pread(self._fd, HEADER.size, 0)
+        if len(header) != HEADER.size:
+            return False
+        magic, layout_version, capacity = HEADER.unpack(header)[:3]
+        return magic == MAGIC and layout_version == LAYOUT_VERSION and capacity == self.capacity
+
+    def _seq(self):
+        return struct.unpack_from('<Q', self._map, SEQ_OFFSET)[0]
+
+    def _bump_seq(self):
+        struct.pack_into('<Q', self._map, SEQ_OFFSET, self._seq() + 1)
+
+    def _set_header(self, **values):
+        magic, layout_version, capacity, seq, ready, overflow, last_reconcile, count = HEADER.unpack_from(self._map, 0)
+        HEADER.pack_into(
+            self._map, 0, magic, layout_version, capacity, seq,
+            values.get('ready', ready),
+            values.get('overflow', overflow),
+            values.get('last_reconcile', last_reconcile),
+            values.get('count', count)
+        )
+
+    def _write(self, mark=True):
+        return _WriteLock(self, mark)
+
+    def _hash(self, key):
+        return int.from_bytes(key[:8], 'little') % self.capacity
+
+    def _offset(self, slot):
+        return HEADER_SIZE + slot * SLOT.size
+
+    def _find(self, key):
+        slot = self._hash(key)
+        for _ in range(self.capacity):
+            slot_key, state, _, _ = SLOT.unpack_from(self._map, self._offset(slot))
+            if state == SLOT_EMPTY:
+                return None
+            if state == SLOT_USED and slot_key == key:
+                return slot
+            slot = (slot + 1) % self.capacity
+        return None
+
+    def _free_slot(self, key):
+        slot = self._hash(key)
+        for _ in range(self.capacity):
+            state = SLOT.unpack_from(self._map, self._offset(slot))[1]
+            if state != SLOT_USED:
+                return slot
+            slot = (slot + 1) % self.capacity
+        return None
+
+
+class _WriteLock:
+    def __init__(self, index, mark):
+        self.index = index
+        self.mark = mark
+
+    def __enter__(self):
+        # flock is held per open file description, which all threads of a
+        # worker share; the thread lock excludes them from each other.
+        self.index._thread_lock.acquire()
+        try:
+            fcntl.flock(self.index._fd, fcntl.LOCK_EX)
+        except BaseException:
+            self.index._thread_lock.release()
+            raise
+        if self.mark:
+            self.index._bump_seq()
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if self.mark:
+                self.index._bump_seq()
+        finally:
+            try:
+                fcntl.flock(self.index._fd, fcntl.LOCK_UN)
+            finally:
+                self.index._thread_lock.release()
+
+
+license_index = LicenseIndex()
@@ -0,0 +1,414 @@
+import asyncio
+import heapq
+import logging
+import random
+import time
+import zlib
+from collections import Counter
+from datetime import datetime
+
+import httpx
+from sqlalchemy import select
+
+from app import db
+from app.models.user import User
+from config import Config
+
+POLL_BATCH_SIZE = 500
+POLL_INTERVAL = 1.0
+EMAIL_DOMAIN = 'loadgen.invalid'
+
+
+def percentiles(values, keys=(50, 90, 99)):
+    values = sorted(values)
+    result = {}
+    for p in keys:
+        result[f'p{p}'] = round(values[min(len(values) - 1, int(len(values) * p / 100))], 2) if values else None
+    result['max'] = round(values[-1], 2) if values else None
+    return result
+
+
+class RequestStats:
+    def __init__(self):
+        self.latencies_ms = []
+        self.statuses = Counter()
+        self.errors = 0
+
+    def record(self, status, latency):
+        self.statuses[status] += 1
+        if not 200 <= status < 300 and status != 409:
+            self.errors += 1
+        self.latencies_ms.append(latency * 1000)
+
+    def failed(self, error):
+        self.statuses[type(error).__name__] += 1
+        self.errors += 1
+
+    def summary(self, elapsed):
+        total = sum(self.statuses.values())
+        return {
+            'requests': total,
+            'rps': round(total / elapsed, 1) if elapsed else None,
+            'error_rate': round(self.errors / total, 4) if total else 0.0,
+            'statuses': {str(status): count for status, count in sorted(self.statuses.items(), key=str)},
+            'latency_ms': percentiles(self.latencies_ms),
+        }
+
+
+class Blackout:
+    def __init__(self, region, meters, started, ends):
+        self.region = region
+        self.meters = meters
+        self.started = started
+        self.ends = ends
+        self.last_seen = {}
+        self.detected = {}
+
+
+class LoadGenerator:
+    # Simulates a fleet of meters against a running deployment. Each meter
+    # sends a heartbeat every `interval` seconds (+/- jitter) to
+    # /user/electric-check. Whole regions black out at random (Poisson,
+    # `blackout_rate` per minute) and come back as a recovery storm: every
+    # meter of the region reports within `storm_jitter` seconds. The
+    # database the app is configured with is polled to check that each
+    # injected outage was detected between `threshold` and `threshold +
+    # detect_slack` seconds after the meter's last heartbeat.
+    def __init__(self, app, target, users, duration, interval=60.0, jitter=0.2, concurrency=200,
+                 regions=10, blackout_rate=1.0, blackout_min=30.0, blackout_max=180.0,
+                 storm_jitter=2.0, threshold=None, detect_slack=15.0, prefix='loadgen', seed=None):
+        self.app = app
+        self.target = target.rstrip('/')
+        self.users = users
+        self.duration = duration
+        self.interval = interval
+        self.jitter = jitter
+        self.concurrency = concurrency
+        self.regions = max(1, min(regions, users))
+        self.blackout_rate = blackout_rate
+        self.blackout_min = blackout_min
+        self.blackout_max = blackout_max
+        self.storm_jitter = storm_jitter
+        self.threshold = threshold
+        self.detect_slack = detect_slack
+        self.prefix = prefix
+        self.rng = random.Random(seed)
+
+        self.usernames = []
+        self.registration = RequestStats()
+        self.setup = RequestStats()
+        self.heartbeats = RequestStats()
+        self.storm = RequestStats()
+        self.lag_ms = []
+        self.blackouts = []
+        self._active = {}
+        self._heap = []
+        self._next_due = []
+        self._storming = set()
+        self._last_seen = {}
+
+    def region_of(self, meter):
+        return meter % self.regions
+
+    def email(self, meter):
+        return f'{self.prefix}-{meter}@{EMAIL_DOMAIN}'
+
+    def run(self):
+        # One line per request would drown the report.
+        logging.getLogger('httpx').setLevel(logging.WARNING)
+        return asyncio.run(self._run())
+
+    async def _run(self):
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        async with httpx.AsyncClient(base_url=self.target, limits=limits, timeout=30) as client:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+            started = time.monotonic()
+            await self._register(client)
+            await self._prepare(client)
+            setup_elapsed = time.monotonic() - started
+
+            started = time.monotonic()
+            await self._drive(client)
+            elapsed = time.monotonic() - started
+
+        report = {
+            'registration': self.registration.summary(setup_elapsed),
+            'setup': self.setup.summary(setup_elapsed),
+            'heartbeats': self.heartbeats.summary(elapsed),
+            'recovery_storm': self.storm.summary(elapsed),
+            'target_rps': round(len(self.usernames) / self.interval, 1),
+            'dispatch_lag_ms': percentiles(self.lag_ms),
+            'duration_s': round(elapsed, 1),
+        }
+        report.update(self._detection_report())
+        return report
+
+    # Setup
+
+    def _in_app(self, func, *args):
+        with self.app.app_context():
+            try:
+                return func(*args)
+            finally:
+                db.session.remove()
+
+    def _existing(self):
+        emails = [self.email(meter) for meter in range(self.users)]
+        rows = {}
+        for start in range(0, len(emails), POLL_BATCH_SIZE):
+            for row in db.session.execute(
+                select(User.email, User.username, User.has_license, User.outage_threshold_seconds)
+                .where(User.email.in_(emails[start:start + POLL_BATCH_SIZE]))
+            ):
+                rows[row.email] = row
+        return rows
+
+    async def _register(self, client):
+        # Synthetic users are kept between runs; only missing ones are
+        # registered, through the same endpoint the Telegram bot uses.
+        existing = await asyncio.to_thread(self._in_app, self._existing)
+        phone_prefix = zlib.crc32(self.prefix.encode()) % 1000
+        missing = [meter for meter in range(self.users) if self.email(meter) not in existing]
+
+        async def register(meter):
+            await self._request(client, self.registration, 'POST', '/telegram/user-data', json={
+                'first_name': 'Loadgen',
+                'last_name': f'Region {self.region_of(meter)}',
+                'email': self.email(meter),
+                'phone_number': f'+{phone_prefix:03d}{meter:09d}',
+                'chat_id': f'{self.prefix}-{meter}',
+            })
+
+        await asyncio.gather(*(register(meter) for meter in missing))
+
+    async def _prepare(self, client):
+        existing = await asyncio.to_thread(self._in_app, self._existing)
+        self.usernames = [existing[self.email(meter)].username for meter in range(self.users)
+                          if self.email(meter) in existing]
+        if len(self.usernames) < self.users:
+            raise RuntimeError(f"Only {len(self.usernames)} of {self.users} synthetic users could be registered "
+                               f"(registration responses: {dict(self.registration.statuses)}).")
+
+        headers = {'admin-key': Config.ADMIN_KEY or ''}
+        calls = []
+        for meter in range(self.users):
+            row = existing[self.email(meter)]
+            if not row.has_license:
+                calls.append(self._request(client, self.setup, 'PATCH', f'/admin/license/activate/{row.username}',
+                                           headers=headers))
+            if self.threshold is not None and row.outage_threshold_seconds != self.threshold:
+                calls.append(self._request(client, self.setup, 'PATCH', f'/admin/users/{row.username}/outage-threshold',
+                                           headers=headers, json={'threshold_seconds': self.threshold}))
+        await asyncio.gather(*calls)
+        if self.setup.errors:
+            raise RuntimeError(f"{self.setup.errors} license/threshold updates failed; check ADMIN_KEY.")
+
+    async def _request(self, client, stats, method, url, **kwargs):
+        async with self._semaphore:
+            started = time.perf_counter()
+            try:
+                response = await client.request(method, url, **kwargs)
+            except httpx.HTTPError as e:
+                stats.failed(e)
+                return None
+            stats.record(response.status_code, time.perf_counter() - started)
+            return response
+
+    # Traffic
+
+    def _schedule(self, meter, due):
+        self._next_due[meter] = due
+        heapq.heappush(self._heap, (due, meter))
+
+    def _next_interval(self):
+        return self.interval * (1 + self.rng.uniform(-self.jitter, self.jitter))
+
+    async def _drive(self, client):
+        now = time.time()
+        self._next_due = [0.0] * len(self.usernames)
+        for meter in range(len(self.usernames)):
+            self._schedule(meter, now + self.rng.uniform(0, self.interval))
+
+        end = now + self.duration
+        next_blackout = now + self._next_blackout_gap()
+        tasks = set()
+        monitor = asyncio.create_task(self._monitor(end))
+
+        while True:
+            now = time.time()
+            if now >= end:
+                break
+            if now >= next_blackout:
+                self._start_blackout(now, end)
+                next_blackout = now + self._next_blackout_gap()
+            self._end_blackouts(now)
+
+            if not self._heap or self._heap[0][0] > now:
+                wake = min(end, next_blackout, self._heap[0][0] if self._heap else end,
+                           *(blackout.ends for blackout in self._active.values()))
+                await asyncio.sleep(max(0.0, min(wake - now, 0.25)))
+                continue
+
+            due, meter = heapq.heappop(self._heap)
+            if self._next_due[meter] != due:
+                continue
+            blackout = self._active.get(self.region_of(meter))
+            if blackout is not None:
+                self._schedule(meter, due + self._next_interval())
+                continue
+
+            self._schedule(meter, due + self._next_interval())
+            # Waiting here for a free slot is what shows up as dispatch lag
+            # when the target (or this client) cannot keep up.
+            await self._semaphore.acquire()
+            self.lag_ms.append((time.time() - due) * 1000)
+            stats = self.storm if meter in self._storming else self.heartbeats
+            self._storming.discard(meter)
+            task = asyncio.create_task(self._heartbeat(client, meter, stats))
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+
+        # Traffic stops here, so regions still dark stay dark; they are
+        # watched only until their meters' detection windows have closed.
+        window = self.threshold_seconds + self.detect_slack
+        for blackout in self._active.values():
+            latest = max(blackout.last_seen.values(), default=end)
+            blackout.ends = max(end, min(blackout.ends, latest + window + POLL_INTERVAL))
+        self._active = {}
+        await asyncio.gather(*tasks)
+        await monitor
+
+    async def _heartbeat(self, client, meter, stats):
+        try:
+            sent_at = time.time()
+            started = time.perf_counter()
+            try:
+                response = await client.post('/user/electric-check', json={'username': self.usernames[meter]})
+            except httpx.HTTPError as e:
+                stats.failed(e)
+                return
+            stats.record(response.status_code, time.perf_counter() - started)
+            if response.status_code == 200:
+                self._last_seen[meter] = max(self._last_seen.get(meter, 0.0), sent_at)
+                # Landed after its region went dark: the server saw it, so
+                # the outage starts from here.
+                blackout = self._active.get(self.region_of(meter))
+                if blackout is not None and sent_at < blackout.started:
+                    blackout.last_seen[meter] = max(blackout.last_seen.get(meter, 0.0), sent_at)
+        finally:
+            self._semaphore.release()
+
+    # Outage model
+
+    @property
+    def threshold_seconds(self):
+        return self.threshold or self.app.config['OUTAGE_OFFLINE_SECONDS']
+
+    def _next_blackout_gap(self):
+        if self.blackout_rate <= 0:
+            return float('inf')
+        return self.rng.expovariate(self.blackout_rate / 60)
+
+    def _start_blackout(self, now, end):
+        candidates = [region for region in range(self.regions) if region not in self._active]
+        if not candidates:
+            return
+        region = self.rng.choice(candidates)
+        meters = [meter for meter in range(len(self.usernames)) if self.region_of(meter) == region]
+        blackout = Blackout(region, meters, now, min(end, now + self.rng.uniform(self.blackout_min, self.blackout_max)))
+        blackout.last_seen = {meter: self._last_seen[meter] for meter in meters if meter in self._last_seen}
+        self._active[region] = blackout
+        self.blackouts.append(blackout)
+
+    def _end_blackouts(self, now):
+        for region, blackout in list(self._active.items()):
+            if blackout.ends > now:
+                continue
+            del self._active[region]
+            for meter in blackout.meters:
+                self._storming.add(meter)
+                self._schedule(meter, blackout.ends + self.rng.uniform(0, self.storm_jitter))
+
+    async def _monitor(self, end):
+        # A region's meters can only be seen OFFLINE while it is dark; the
+        # recovery storm moves them on to RECOVERED.
+        while True:
+            pending = []
+            now = time.time()
+            for blackout in self.blackouts:
+                if blackout.ends < now - POLL_INTERVAL:
+                    continue
+                pending.extend((blackout, meter) for meter in blackout.last_seen if meter not in blackout.detected)
+            if not pending and now >= end:
+                return
+            if pending:
+                offline = await asyncio.to_thread(self._in_app, self._offline_since, pending)
+                seen_at = time.time()
+                for blackout, meter in pending:
+                    if (self.usernames[meter], blackout.started) in offline:
+                        blackout.detected[meter] = seen_at
+            await asyncio.sleep(POLL_INTERVAL)
+
+    def _offline_since(self, pending):
+        # {(username, blackout start)} of the pending meters now OFFLINE in
+        # an episode that began during that blackout.
+        by_start = {}
+        for blackout, meter in pending:
+            by_start.setdefault(blackout.started, []).append(self.usernames[meter])
+
+        offline = set()
+        for started, usernames in by_start.items():
+            since = datetime.fromtimestamp(started)
+            for start in range(0, len(usernames), POLL_BATCH_SIZE):
+                for username in db.session.execute(
+                    select(User.username).where(User.username.in_(usernames[start:start + POLL_BATCH_SIZE]),
+                                                User.outage_state == User.STATE_OFFLINE,
+                                                User.outage_state_changed_at >= since)
+                ).scalars():
+                    offline.add((username, started))
+        return offline
+
+    # Report
+
+    def _detection_report(self):
+        threshold = self.threshold_seconds
+        totals = Counter()
+        delays = []
+        blackouts = []
+        for blackout in self.blackouts:
+            counts = Counter()
+            for meter, last_seen in blackout.last_seen.items():
+                silent_for = blackout.ends - last_seen
+                detected_at = blackout.detected.get(meter)
+                if detected_at is None:
+                    counts['missed' if silent_for >= threshold + self.detect_slack else 'not_expected'] += 1
+                    continue
+                delay = detected_at - last_seen
+                delays.append(delay)
+                if delay < threshold:
+                    counts['early'] += 1
+                elif delay > threshold + self.detect_slack:
+                    counts['late'] += 1
+                else:
+                    counts['in_window'] += 1
+            totals.update(counts)
+            blackouts.append({
+                'region': blackout.region,
+                'meters': len(blackout.meters),
+                'started': datetime.fromtimestamp(blackout.started).isoformat(timespec='seconds'),
+                'duration_s': round(blackout.ends - blackout.started, 1),
+                **counts,
+            })
+        return {
+            'blackouts': blackouts,
+            'detection': {
+                'threshold_s': threshold,
+                'window_s': [threshold, threshold + self.detect_slack],
+                'in_window': totals['in_window'],
+                'early': totals['early'],
+                'late': totals['late'],
+                'missed': totals['missed'],
+                'not_expected': totals['not_expected'],
+                'delay_s': percentiles(delays),
+            },
+        }
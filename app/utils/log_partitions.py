@@ -0,0 +1,190 @@
+import gzip
+import json
+import logging
+import os
+import re
+from datetime import datetime, timedelta
+
+from sqlalchemy import MetaData, and_, delete, select, text
+
+from app import db
+from app.models.log import LOG_RETENTION_GROUP_TYPES, Log, LogTypeEnum
+
+logger = logging.getLogger(__name__)
+
+PARTITION_BOUND = re.compile(r"FROM \('([^']+)'\) TO \('([^']+)'\)")
+DELETE_BATCH_SIZE = 5000
+
+
+def group_types(group):
+    # Log types of a retention group; the default group is everything else.
+    if group in LOG_RETENTION_GROUP_TYPES:
+        return LOG_RETENTION_GROUP_TYPES[group]
+    grouped = {log_type for types in LOG_RETENTION_GROUP_TYPES.values() for log_type in types}
+    return [log_type for log_type in LogTypeEnum if log_type not in grouped]
+
+
+def period_start(moment, interval):
+    if interval == 'day':
+        return datetime(moment.year, moment.month, moment.day)
+    if interval == 'month':
+        return datetime(moment.year, moment.month, 1)
+    raise ValueError(f"Unknown log partition interval: {interval}")
+
+
+def next_period(start, interval):
+    if interval == 'day':
+        return start + timedelta(days=1)
+    if start.month == 12:
+        return datetime(start.year + 1, 1, 1)
+    return datetime(start.year, start.month + 1, 1)
+
+
+def partition_name(group, start, interval):
+    suffix = start.strftime('%Y%m%d') if interval == 'day' else start.strftime('%Y%m')
+    return f'log_{group}_{suffix}'
+
+
+def is_partitioned(connection):
+    if connection.dialect.name != 'postgresql':
+        return False
+    relkind = connection.execute(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass('log')")
+    ).scalar()
+    return relkind == 'p'
+
+
+def create_partitions(groups, ahead, now=None):
+    # Creates the current and `ahead` future time partitions of every group.
+    # Rows that already landed in the group's default partition for that
+    # range are moved into the new partition before it is attached.
+    now = now or datetime.utcnow()
+    created = []
+    with db.engine.connect() as connection:
+        if not is_partitioned(connection):
+            return created
+
+        for group, settings in groups.items():
+            interval = settings['interval']
+            start = period_start(now, interval)
+            for _ in range(ahead + 1):
+                end = next_period(start, interval)
+                name = partition_name(group, start, interval)
+                if connection.execute(text("SELECT to_regclass(:name)"), {'name': name}).scalar() is None:
+                    try:
+                        with connection.begin():
+                            _create_partition(connection, group, name, start, end)
+                        created.append(name)
+                    except Exception as e:
+                        logger.error(f"Could not create log partition {name}: {str(e)}")
+                start = end
+    return created
+
+
+def _create_partition(connection, group, name, start, end):
+    parent = f'log_{group}'
+    default = f'{parent}_default'
+    bounds = {'start': start, 'end': end}
+    connection.execute(text(f'CREATE TABLE {name} (LIKE {parent} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)'))
+    connection.execute(text(
+        f'INSERT INTO {name} SELECT * FROM {default} WHERE timestamp >= :start AND timestamp < :end'
+    ), bounds)
+    connection.execute(text(f'DELETE FROM {default} WHERE timestamp >= :start AND timestamp < :end'), bounds)
+    connection.execute(text(
+        f"ALTER TABLE {parent} ATTACH PARTITION {name} FOR VALUES FROM ('{start.isoformat(' ')}') TO ('{end.isoformat(' ')}')"
+    ))
+
+
+def apply_retention(groups, archive_dir=None, now=None):
+    # Drops (after optionally archiving) every time partition whose whole
+    # range is past its group's retention. Rows outside any partition, and
+    # databases without partitioning, fall back to batched DELETEs.
+    now = now or datetime.utcnow()
+    removed = {}
+    with db.engine.connect() as connection:
+        partitioned = is_partitioned(connection)
+
+    for group, settings in groups.items():
+        cutoff = now - timedelta(days=settings['retention_days'])
+        if partitioned:
+            removed[group] = _drop_expired_partitions(group, cutoff, archive_dir)
+            removed[group] += _delete_expired_rows(group, cutoff, archive_dir, table=f'log_{group}_default')
+        else:
+            removed[group] = _delete_expired_rows(group, cutoff, archive_dir)
+    return removed
+
+
+def _drop_expired_partitions(group, cutoff, archive_dir):
+    parent = f'log_{group}'
+    dropped = 0
+    with db.engine.connect() as connection:
+        partitions = connection.execute(text(
+            "SELECT child.relname, pg_get_expr(child.relpartbound, child.oid) "
+            "FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = to_regclass(:parent)"
+        ), {'parent': parent}).all()
+        connection.commit()
+
+        for name, bound in partitions:
+            match = PARTITION_BOUND.search(bound or '')
+            if match is None or datetime.fromisoformat(match.group(2)) > cutoff:
+                continue
+
+            if archive_dir:
+                _archive_partition(connection, name, archive_dir)
+            with connection.begin():
+                rows = connection.execute(text(f'SELECT count(*) FROM {name}')).scalar()
+                connection.execute(text(f'ALTER TABLE {parent} DETACH PARTITION {name}'))
+                connection.execute(text(f'DROP TABLE {name}'))
+            dropped += rows
+            logger.info(f"Dropped expired log partition {name} ({rows} rows).")
+    return dropped
+
+
+def _archive_partition(connection, name, archive_dir):
+    os.makedirs(archive_dir, exist_ok=True)
+    path = os.path.join(archive_dir, f'{name}.csv.gz')
+    cursor = connection.connection.cursor()
+    try:
+        with gzip.open(path, 'wb') as archive:
+            cursor.copy_expert(f'COPY {name} TO STDOUT WITH (FORMAT csv, HEADER)', archive)
+    finally:
+        cursor.close()
+    connection.commit()
+    return path
+
+
+def _delete_expired_rows(group, cutoff, archive_dir, table=None):
+    # `table` names a partition to prune directly; it has the log columns.
+    table = Log.__table__.to_metadata(MetaData(), name=table) if table else Log.__table__
+    condition = and_(table.c.log_type.in_(group_types(group)), table.c.timestamp < cutoff)
+
+    archive = None
+    deleted = 0
+    try:
+        with db.engine.connect() as connection:
+            while True:
+                with connection.begin():
+                    rows = connection.execute(
+                        select(table).where(condition).order_by(table.c.id).limit(DELETE_BATCH_SIZE)
+                    ).mappings().all()
+                    if not rows:
+                        break
+                    if archive_dir:
+                        if archive is None:
+                            os.makedirs(archive_dir, exist_ok=True)
+                            archive = gzip.open(os.path.join(
+                                archive_dir, f"{table.name}_{group}_before_{cutoff.strftime('%Y%m%d%H%M%S')}.ndjson.gz"
+                            ), 'wt')
+                        for row in rows:
+                            archive.write(json.dumps({
+                                key: (value.isoformat() if isinstance(value, datetime)
+                                      else value.name if isinstance(value, LogTypeEnum) else value)
+                                for key, value in row.items()
+                            }) + '\n')
+                    connection.execute(delete(table).where(table.c.id.in_([row['id'] for row in rows])))
+                deleted += len(rows)
+    finally:
+        if archive is not None:
+            archive.close()
+    return deleted
@@ -0,0 +1,244 @@
+import atexit
+import logging
+import threading
+from datetime import date, datetime, timedelta
+
+import click
+from sqlalchemy import Date, and_, cast, delete, func, insert, literal_column, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models.log import Log
+from app.models.log_rollup import LogDailyUserRollup, LogHourlyRollup, LogRollupGap, RollupWatermark
+from app.utils.leader_lock import LeaderLock
+
+logger = logging.getLogger(__name__)
+
+WATERMARK_NAME = 'log_rollups'
+
+log_rollup_lock = LeaderLock('log-rollups')
+
+
+def _hour_bucket(dialect):
+    # Literal formats: GROUP BY has to repeat the select expression exactly,
+    # which bound parameters would not on PostgreSQL.
+    if dialect == 'postgresql':
+        return func.date_trunc(literal_column("'hour'"), Log.timestamp)
+    if dialect == 'sqlite':
+        return func.strftime(literal_column("'%Y-%m-%d %H:00:00'"), Log.timestamp)
+    return func.date_format(Log.timestamp, literal_column("'%Y-%m-%d %H:00:00'"))
+
+
+def _day_bucket(dialect):
+    if dialect == 'sqlite':
+        return func.date(Log.timestamp)
+    return cast(Log.timestamp, Date)
+
+
+def _as_datetime(value):
+    return datetime.fromisoformat(value) if isinstance(value, str) else value
+
+
+def _as_date(value):
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    return value.date() if isinstance(value, datetime) else value
+
+
+def _add_counts(table, key_columns, rows):
+    # count += excluded.count; the watermark row lock serialises refreshes,
+    # so the portable fallback does not race with itself.
+    if not rows:
+        return
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        dialect_insert = postgresql_insert if dialect == 'postgresql' else sqlite_insert
+        stmt = dialect_insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=key_columns,
+            set_={'count': table.c.count + stmt.excluded['count']}
+        )
+        db.session.execute(stmt, rows)
+        return
+
+    for row in rows:
+        updated = db.session.execute(
+            update(table)
+            .where(*[table.c[column] == row[column] for column in key_columns])
+            .values(count=table.c.count + row['count'])
+        ).rowcount
+        if not updated:
+            db.session.execute(insert(table), [row])
+
+
+def _lock_watermark():
+    statement = select(RollupWatermark).where(RollupWatermark.name == WATERMARK_NAME).with_for_update()
+    watermark = db.session.execute(statement).scalar_one_or_none()
+    if watermark is None:
+        try:
+            db.session.add(RollupWatermark(name=WATERMARK_NAME, last_log_id=0, rows_processed=0))
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+        watermark = db.session.execute(statement).scalar_one()
+    return watermark
+
+
+def _record_gaps(after, upper, now):
+    # Ids in (after, upper] without a visible row. Ids come from a sequence
+    # but commit in any order, and timestamps do not bound commit time (the
+    # queue log sink inserts rows well after their timestamp), so a lower id
+    # can still be in flight while the watermark moves past it.
+    previous = func.lag(Log.id).over(order_by=Log.id)
+    ids = select(Log.id.label('id'), previous.label('previous')).where(Log.id > after, Log.id <= upper).subquery()
+    rows = db.session.execute(
+        select(ids.c.id, ids.c.previous).where(or_(ids.c.previous.is_(None), ids.c.id > ids.c.previous + 1))
+    ).all()
+    missing = []
+    for log_id, previous_id in rows:
+        missing.extend(range((after if previous_id is None else previous_id) + 1, log_id))
+    if missing:
+        db.session.execute(insert(LogRollupGap.__table__), [
+            {'log_id': log_id, 'first_seen_at': now} for log_id in missing
+        ])
+
+
+def refresh_batch(batch_size, cutoff, gap_timeout_seconds):
+    # Folds the next `batch_size` log rows after the watermark into both
+    # rollups and moves the watermark, in one transaction. Only ids up to
+    # the newest row older than `cutoff` are taken, so most rows commit
+    # before the watermark reaches them. Ids it passes without a row are
+    # kept as gaps and folded in when their row shows up, for up to
+    # `gap_timeout_seconds`. Returns the rows folded in.
+    watermark = _lock_watermark()
+    after = watermark.last_log_id
+    now = datetime.utcnow()
+
+    late_ids = db.session.execute(
+        select(Log.id).where(Log.id.in_(select(LogRollupGap.log_id))).limit(batch_size)
+    ).scalars().all()
+    db.session.execute(delete(LogRollupGap).where(or_(
+        LogRollupGap.log_id.in_(late_ids),
+        LogRollupGap.first_seen_at < now - timedelta(seconds=gap_timeout_seconds)
+    )))
+
+    eligible = select(Log.id).where(Log.id > after, Log.timestamp < cutoff)
+    upper = db.session.execute(eligible.order_by(Log.id).offset(batch_size - 1).limit(1)).scalar()
+    if upper is None:
+        upper = db.session.execute(select(func.max(Log.id)).where(Log.id > after, Log.timestamp < cutoff)).scalar()
+    if upper is None and not late_ids:
+        db.session.rollback()
+        return 0
+
+    conditions = []
+    if upper is not None:
+        _record_gaps(after, upper, now)
+        # Rows that commit while this runs stay gaps rather than being
+        # counted by one of the queries below and not the other.
+        conditions.append(and_(
+            Log.id > after, Log.id <= upper,
+            Log.id.not_in(select(LogRollupGap.log_id).where(LogRollupGap.log_id > after))
+        ))
+    if late_ids:
+        conditions.append(Log.id.in_(late_ids))
+
+    dialect = db.session.get_bind().dialect.name
+    in_batch = or_(*conditions)
+
+    hour = _hour_bucket(dialect)
+    hourly = db.session.execute(
+        select(hour, Log.log_type, Log.level, func.count())
+        .where(in_batch)
+        .group_by(hour, Log.log_type, Log.level)
+    ).all()
+    _add_counts(LogHourlyRollup.__table__, ['bucket', 'log_type', 'level'], [
+        {'bucket': _as_datetime(bucket), 'log_type': log_type.value, 'level': level, 'count': count}
+        for bucket, log_type, level, count in hourly
+    ])
+
+    day = _day_bucket(dialect)
+    daily = db.session.execute(
+        select(day, Log.username, Log.log_type, func.count())
+        .where(in_batch, Log.username.isnot(None))
+        .group_by(day, Log.username, Log.log_type)
+    ).all()
+    _add_counts(LogDailyUserRollup.__table__, ['day', 'username', 'log_type'], [
+        {'day': _as_date(bucket), 'username': username, 'log_type': log_type.value, 'count': count}
+        for bucket, username, log_type, count in daily
+    ])
+
+    processed = sum(row[-1] for row in hourly)
+    if upper is not None:
+        watermark.last_log_id = upper
+    watermark.rows_processed += processed
+    watermark.updated_at = now
+    db.session.commit()
+    return processed
+
+
+def refresh_log_rollups(batch_size, safety_lag_seconds, gap_timeout_seconds, max_batches=None):
+    # Catches the rollups up with the log table. Returns (rows, batches).
+    cutoff = datetime.utcnow() - timedelta(seconds=safety_lag_seconds)
+    rows = batches = 0
+    while max_batches is None or batches < max_batches:
+        processed = refresh_batch(batch_size, cutoff, gap_timeout_seconds)
+        if not processed:
+            break
+        rows += processed
+        batches += 1
+    return rows, batches
+
+
+def rollup_watermark():
+    watermark = db.session.get(RollupWatermark, WATERMARK_NAME)
+    return None if watermark is None else watermark.to_dict()
+
+
+class LogRollupRefresher:
+    # Keeps the rollups a refresh interval behind the log table. Every
+    # worker runs the loop; the leader lock makes one of them do each
+    # round, and the others skip it.
+    def __init__(self, app=None):
+        self.app = None
+        self._stop = threading.Event()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = app.config['LOG_ROLLUP_INTERVAL_SECONDS']
+        self.batch_size = app.config['LOG_ROLLUP_BATCH_SIZE']
+        self.safety_lag = app.config['LOG_ROLLUP_SAFETY_LAG_SECONDS']
+        self.gap_timeout = app.config['LOG_ROLLUP_GAP_TIMEOUT_SECONDS']
+        app.extensions['log_rollup_refresher'] = self
+
+        # `flask logs refresh-rollups` does the same from the CLI.
+        if click.get_current_context(silent=True) is not None:
+            return
+
+        self._thread = threading.Thread(target=self._run, name='log-rollups', daemon=True)
+        self._thread.start()
+        atexit.register(self._stop.set)
+
+    @property
+    def enabled(self):
+        return self.app is not None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            with self.app.app_context():
+                try:
+                    with log_rollup_lock.hold() as acquired:
+                        if acquired:
+                            rows, batches = refresh_log_rollups(self.batch_size, self.safety_lag, self.gap_timeout)
+                            if rows:
+                                logger.debug(f"Rolled up {rows} log rows in {batches} batches.")
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Log rollup refresh failed: {str(e)}")
+
+
+log_rollup_refresher = LogRollupRefresher()
@@ -0,0 +1,184 @@
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from sqlalchemy import insert
+
+from app import db
+from app.models.log import Log
+
+logger = logging.getLogger(__name__)
+
+
+class SyncLogSink:
+    # Writes each record immediately, on its own connection, so a failed log
+    # insert can never poison the request's session.
+    name = 'sync'
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.written = 0
+        self.failed = 0
+
+    def emit(self, record):
+        try:
+            with self.engine.begin() as connection:
+                connection.execute(insert(Log.__table__), [record])
+            self.written += 1
+        except Exception as e:
+            self.failed += 1
+            logger.error(f"Failed to write log record: {str(e)}")
+
+    def flush(self):
+        pass
+
+    def stats(self):
+        return {
+            'sink': self.name,
+            'queue_depth': 0,
+            'dropped': 0,
+            'written': self.written,
+            'failed': self.failed,
+        }
+
+
+class QueueLogSink:
+    # Bounded queue drained by a background writer that inserts records in
+    # batches (a single multi-row INSERT per batch).
+    name = 'queue'
+
+    def __init__(self, engine, queue_size, batch_size, flush_interval, full_policy='drop', block_timeout=0.1):
+        if full_policy not in ('drop', 'block'):
+            raise ValueError(f"Unknown log sink full policy: {full_policy}")
+
+        self.engine = engine
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.full_policy = full_policy
+        self.block_timeout = block_timeout
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self._counter_lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+        self._thread = threading.Thread(target=self._run, name='log-sink-writer', daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def emit(self, record):
+        try:
+            if self.full_policy == 'block':
+                self.queue.put(record, timeout=self.block_timeout)
+            else:
+                self.queue.put_nowait(record)
+        except queue.Full:
+            with self._counter_lock:
+                self.dropped += 1
+
+    def flush(self, timeout=5.0):
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                break
+            self._write(batch)
+
+        # Wait for the batch the background writer may still be holding.
+        deadline = time.monotonic() + timeout
+        with self.queue.all_tasks_done:
+            while self.queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self.queue.all_tasks_done.wait(remaining)
+
+    def stats(self):
+        return {
+            'sink': self.name,
+            'queue_depth': self.queue.qsize(),
+            'queue_capacity': self.queue.maxsize,
+            'full_policy': self.full_policy,
+            'dropped': self.dropped,
+            'written': self.written,
+            'failed': self.failed,
+        }
+
+    def _drain(self, limit):
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _collect(self):
+        # Block for the first record, then keep collecting until the batch is
+        # full or the flush interval has elapsed.
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        with self._write_lock:
+            try:
+                with self.engine.begin() as connection:
+                    connection.execute(insert(Log.__table__), batch)
+                with self._counter_lock:
+                    self.written += len(batch)
+            except Exception as e:
+                logger.error(f"Failed to write {len(batch)} log records, retrying one by one: {str(e)}")
+                self._write_each(batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+
+    def _write_each(self, batch):
+        # Isolate the bad record(s) so one failure doesn't drop the whole batch.
+        for record in batch:
+            try:
+                with self.engine.begin() as connection:
+                    connection.execute(insert(Log.__table__), [record])
+                with self._counter_lock:
+                    self.written += 1
+            except Exception as e:
+                with self._counter_lock:
+                    self.failed += 1
+                logger.error(f"Failed to write log record: {str(e)}")
+
+    def _run(self):
+        while True:
+            self._write(self._collect())
+
+
+def init_log_sink(app):
+    with app.app_context():
+        engine = db.engine
+
+    if app.config['LOG_SINK'] == 'queue':
+        sink = QueueLogSink(
+            engine,
+            queue_size=app.config['LOG_SINK_QUEUE_SIZE'],
+            batch_size=app.config['LOG_SINK_BATCH_SIZE'],
+            flush_interval=app.config['LOG_SINK_FLUSH_INTERVAL_MS'] / 1000.0,
+            full_policy=app.config['LOG_SINK_FULL_POLICY'],
+            block_timeout=app.config['LOG_SINK_BLOCK_TIMEOUT_MS'] / 1000.0
+        )
+    elif app.config['LOG_SINK'] == 'sync':
+        sink = SyncLogSink(engine)
+    else:
+        raise ValueError(f"Unknown log sink: {app.config['LOG_SINK']}")
+
+    app.extensions['log_sink'] = sink
+    return sink
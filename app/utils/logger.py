@@ -1,15 +1,19 @@
 import logging
-from app import db
-from app.models.log import Log
+from datetime import datetime
+from flask import current_app
 
 # Logger setup
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 def log_message(level, message, username=None, log_type=None):
-    new_log = Log(level=level, message=message, username=username, log_type=log_type)
-    db.session.add(new_log)
-    db.session.commit()
+    current_app.extensions['log_sink'].emit({
+        'timestamp': datetime.utcnow(),
+        'level': level,
+        'message': message,
+        'username': username,
+        'log_type': log_type,
+    })
     
     if level == "ERROR":
         logger.error(f"{message} (User: {username})")
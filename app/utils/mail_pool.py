@@ -0,0 +1,129 @@
+import atexit
+import logging
+import queue
+import smtplib
+import threading
+import time
+
+from app import mail
+
+logger = logging.getLogger(__name__)
+
+# Errors after which the SMTP session can't be trusted any more.
+RECONNECT_ERRORS = (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError, ConnectionError, TimeoutError)
+
+
+class _PooledConnection:
+    def __init__(self, connection):
+        self.connection = connection
+        self.sent = 0
+        self.last_used = time.monotonic()
+
+
+class MailPool:
+    # Keeps a few authenticated SMTP sessions warm and sends many messages per
+    # session instead of connecting, logging in and quitting for every mail.
+    def __init__(self, app=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.size = app.config['MAIL_POOL_SIZE']
+        self.max_per_session = app.config['MAIL_POOL_MAX_PER_SESSION']
+        self.idle_timeout = app.config['MAIL_POOL_IDLE_SECONDS']
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(self.size)
+        self.opened = 0
+        self.reconnects = 0
+        app.extensions['mail_pool'] = self
+        atexit.register(self.close)
+
+    @property
+    def enabled(self):
+        return self.app is not None
+
+    def send(self, message):
+        with self._slots:
+            pooled = self._checkout()
+            try:
+                pooled.connection.send(message)
+            except RECONNECT_ERRORS as e:
+                logger.info(f"SMTP session dropped ({str(e)}), reconnecting.")
+                self._discard(pooled)
+                self.reconnects += 1
+                pooled = self._open()
+                try:
+                    pooled.connection.send(message)
+                except RECONNECT_ERRORS:
+                    self._discard(pooled)
+                    raise
+                except Exception:
+                    self._checkin(pooled)
+                    raise
+            except Exception:
+                # Message-level failures (refused recipient, bad headers)
+                # leave the session usable.
+                self._checkin(pooled)
+                raise
+
+            pooled.sent += 1
+            pooled.last_used = time.monotonic()
+            self._checkin(pooled)
+
+    def close(self):
+        while True:
+            try:
+                self._discard(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+    def stats(self):
+        return {
+            'size': self.size,
+            'idle': self._idle.qsize(),
+            'opened': self.opened,
+            'reconnects': self.reconnects,
+        }
+
+    def _checkout(self):
+        while True:
+            try:
+                pooled = self._idle.get_nowait()
+            except queue.Empty:
+                return self._open()
+
+            if time.monotonic() - pooled.last_used > self.idle_timeout:
+                self._discard(pooled)
+                continue
+            return pooled
+
+    def _checkin(self, pooled):
+        if self.max_per_session and pooled.sent >= self.max_per_session:
+            self._discard(pooled)
+            return
+        self._idle.put(pooled)
+
+    def _open(self):
+        from flask_mail import Connection
+        connection = Connection(mail.state)
+        connection.__enter__()
+        self.opened += 1
+        return _PooledConnection(connection)
+
+    def _discard(self, pooled):
+        try:
+            pooled.connection.__exit__(None, None, None)
+        except Exception:
+            pass
+
+
+mail_pool = MailPool()
+
+
+def send_mail(message):
+    if mail_pool.enabled:
+        mail_pool.send(message)
+    else:
+        mail.send(message)
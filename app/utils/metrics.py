@@ -0,0 +1,430 @@
+import atexit
+import fcntl
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from flask import request
+
+from app.utils.query_stats import query_stats
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+ARCHIVE_FILE = 'archive.json'
+ARCHIVE_LOCK_FILE = 'archive.lock'
+
+
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1.0):
+        with self._lock:
+            self.value += amount
+
+    def dump(self):
+        return self.value
+
+
+class _HistogramChild:
+    __slots__ = ('bounds', 'counts', 'sum', '_lock')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        # counts[i] holds observations in (bounds[i-1], bounds[i]]; the last
+        # slot is +Inf. Cumulated only when exposed.
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def dump(self):
+        with self._lock:
+            return {'counts': list(self.counts), 'sum': self.sum}
+
+
+class Metric:
+    # Children are created once per label combination; hot paths keep the
+    # child they get from labels() instead of looking it up per event.
+    def __init__(self, name, help_text, labelnames, buckets=None):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) if buckets is not None else None
+        self.type = 'histogram' if buckets is not None else 'counter'
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = _HistogramChild(self.buckets) if self.buckets is not None else _CounterChild()
+                    self._children[values] = child
+        return child
+
+    def dump(self):
+        return {
+            'type': self.type,
+            'help': self.help,
+            'labelnames': list(self.labelnames),
+            'buckets': None if self.buckets is None else list(self.buckets),
+            'samples': [[list(values), child.dump()] for values, child in list(self._children.items())],
+        }
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+
+    def counter(self, name, help_text, labelnames=()):
+        metric = Metric(name, help_text, labelnames)
+        self.metrics[name] = metric
+        return metric
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Metric(name, help_text, labelnames, buckets)
+        self.metrics[name] = metric
+        return metric
+
+    def dump(self):
+        return {name: metric.dump() for name, metric in self.metrics.items()}
+
+
+registry = Registry()
+
+http_requests = registry.counter(
+    'http_requests_total', 'HTTP requests by route, method and status.', ('endpoint', 'method', 'status'))
+http_request_duration = registry.histogram(
+    'http_request_duration_seconds', 'HTTP request latency by route and method.', ('endpoint', 'method'))
+http_request_db_queries = registry.histogram(
+    'http_request_db_queries', 'Database queries issued per HTTP request.', ('endpoint',), QUERY_COUNT_BUCKETS)
+http_request_db_duration = registry.histogram(
+    'http_request_db_duration_seconds', 'Time spent in database queries per HTTP request.', ('endpoint',))
+db_queries = registry.counter('db_queries_total', 'Database queries issued by this service.')
+db_query_duration = registry.histogram('db_query_duration_seconds', 'Latency of single database queries.')
+notification_duration = registry.histogram(
+    'notification_send_duration_seconds', 'Notification send latency by channel.', ('channel',))
+notifications = registry.counter(
+    'notifications_total', 'Notification sends by channel and outcome.', ('channel', 'outcome'))
+
+_db_queries = db_queries.labels()
+_db_query_duration = db_query_duration.labels()
+
+
+class _NotificationChannel:
+    __slots__ = ('duration', 'succeeded', 'failed')
+
+    def __init__(self, channel):
+        self.duration = notification_duration.labels(channel)
+        self.succeeded = notifications.labels(channel, 'success')
+        self.failed = notifications.labels(channel, 'failure')
+
+    def record(self, seconds, ok):
+        self.duration.observe(seconds)
+        (self.succeeded if ok else self.failed).inc()
+
+
+email_notifications = _NotificationChannel('email')
+telegram_notifications = _NotificationChannel('telegram')
+
+
+class _RouteMetrics:
+    __slots__ = ('duration', 'db_queries', 'db_duration', 'endpoint', 'method', 'statuses')
+
+    def __init__(self, endpoint, method):
+        self.endpoint = endpoint
+        self.method = method
+        self.duration = http_request_duration.labels(endpoint, method)
+        self.db_queries = http_request_db_queries.labels(endpoint)
+        self.db_duration = http_request_db_duration.labels(endpoint)
+        self.statuses = {}
+
+    def status(self, code):
+        child = self.statuses.get(code)
+        if child is None:
+            child = self.statuses[code] = http_requests.labels(self.endpoint, self.method, str(code))
+        return child
+
+
+class _RequestStats(threading.local):
+    active = False
+    started = 0.0
+
+
+def merge_dumps(dumps):
+    # dumps: one Registry.dump() per process; samples with equal labels are summed.
+    merged = {}
+    for dump in dumps:
+        for name, metric in dump.items():
+            target = merged.setdefault(name, dict(metric, samples={}))
+            for values, sample in metric['samples']:
+                key = tuple(values)
+                current = target['samples'].get(key)
+                if metric['type'] == 'counter':
+                    target['samples'][key] = (current or 0.0) + sample
+                elif current is None:
+                    target['samples'][key] = {'counts': list(sample['counts']), 'sum': sample['sum']}
+                else:
+                    current['counts'] = [a + b for a, b in zip(current['counts'], sample['counts'])]
+                    current['sum'] += sample['sum']
+    return merged
+
+
+def format_exposition(dumps):
+    merged = merge_dumps(dumps)
+    lines = []
+    for name, metric in merged.items():
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        for values, sample in sorted(metric['samples'].items()):
+            labels = [f'{label}="{_escape(value)}"' for label, value in zip(metric['labelnames'], values)]
+            if metric['type'] == 'counter':
+                lines.append(f"{name}{_labels(labels)} {_number(sample)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(list(metric['buckets']) + ['+Inf'], sample['counts']):
+                cumulative += count
+                le = 'le="{}"'.format(bound if bound == '+Inf' else _number(bound))
+                lines.append(f"{name}_bucket{_labels(labels + [le])} {cumulative}")
+            lines.append(f"{name}_sum{_labels(labels)} {_number(sample['sum'])}")
+            lines.append(f"{name}_count{_labels(labels)} {cumulative}")
+    return '\n'.join(lines) + '\n'
+
+
+def _labels(labels):
+    return '{' + ','.join(labels) + '}' if labels else ''
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _number(value):
+    return repr(float(value))
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _worker_files(directory):
+    for path in glob.glob(os.path.join(directory, '*.json')):
+        name = os.path.basename(path)[:-len('.json')]
+        if name.isdigit():
+            yield int(name), path
+
+
+class _ArchiveLock:
+    # Folding takes it exclusively, scrapes shared, so a scrape never sees a
+    # worker's counts both in the archive and in its own file.
+    def __init__(self, directory, operation):
+        self.path = os.path.join(directory, ARCHIVE_LOCK_FILE)
+        self.operation = operation
+        self._file = None
+
+    def __enter__(self):
+        self._file = open(self.path, 'a')
+        fcntl.flock(self._file, self.operation)
+        return self
+
+    def __exit__(self, *exc):
+        try:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+        finally:
+            self._file.close()
+
+
+def _archive(directory, paths):
+    # Sums the given worker files into archive.json and removes them, so the
+    # counts of exited workers stay in the totals without their files
+    # piling up, and a recycled pid starts from an empty file.
+    dumps = []
+    archive_path = os.path.join(directory, ARCHIVE_FILE)
+    for path in [archive_path] + paths:
+        try:
+            with open(path) as f:
+                dumps.append(json.load(f))
+        except FileNotFoundError:
+            continue
+        except (OSError, ValueError) as e:
+            logger.error(f"Dropping unreadable metrics file {path}: {str(e)}")
+    merged = merge_dumps(dumps)
+    payload = json.dumps({
+        name: dict(metric, samples=[[list(values), sample] for values, sample in metric['samples'].items()])
+        for name, metric in merged.items()
+    })
+    tmp_path = f'{archive_path}.tmp'
+    with open(tmp_path, 'w') as f:
+        f.write(payload)
+    os.replace(tmp_path, archive_path)
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def mark_process_dead(pid, multiproc_dir=None):
+    # For gunicorn's child_exit hook, which runs in the master once a worker
+    # is gone; the master may not have the app loaded, hence the env fallback.
+    multiproc_dir = multiproc_dir or os.environ.get('METRICS_MULTIPROC_DIR')
+    if not multiproc_dir:
+        return
+    path = os.path.join(multiproc_dir, f'{pid}.json')
+    with _ArchiveLock(multiproc_dir, fcntl.LOCK_EX):
+        if os.path.exists(path):
+            _archive(multiproc_dir, [path])
+
+
+class Metrics:
+    # Per-worker recording into the registry above. With a multiprocess
+    # directory each worker also writes its registry to <dir>/<pid>.json
+    # every flush interval (and at exit), and /metrics sums every file, so a
+    # scrape sees the whole gunicorn deployment whichever worker answers it.
+    # Files of workers that are gone are folded into archive.json when a
+    # worker starts (and by mark_process_dead from gunicorn's child_exit).
+    def __init__(self, app=None):
+        self.app = None
+        self.multiproc_dir = None
+        self._routes = {}
+        self._stats = _RequestStats()
+        self._flush_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.multiproc_dir = app.config['METRICS_MULTIPROC_DIR']
+        self.flush_interval = app.config['METRICS_FLUSH_SECONDS']
+        app.extensions['metrics'] = self
+
+        # Statement counts and timings come from the query stats listeners.
+        if app.extensions.get('query_stats') is not query_stats:
+            query_stats.init_app(app)
+        query_stats.add_query_hook(self._on_query)
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+        if self.multiproc_dir:
+            os.makedirs(self.multiproc_dir, exist_ok=True)
+            self._archive_dead_workers()
+            thread = threading.Thread(target=self._run, name='metrics-flusher', daemon=True)
+            thread.start()
+            atexit.register(self.flush)
+
+    @property
+    def enabled(self):
+        return self.app is not None
+
+    def _before_request(self):
+        stats = self._stats
+        stats.active = True
+        stats.started = time.perf_counter()
+
+    def _after_request(self, response):
+        stats = self._stats
+        if not stats.active:
+            return response
+        stats.active = False
+        elapsed = time.perf_counter() - stats.started
+
+        key = request.endpoint or 'unmatched'
+        routes = self._routes.get(request.method)
+        if routes is None:
+            routes = self._routes.setdefault(request.method, {})
+        route = routes.get(key)
+        if route is None:
+            route = routes[key] = _RouteMetrics(key, request.method)
+
+        route.duration.observe(elapsed)
+        route.status(response.status_code).inc()
+        queries, query_seconds = query_stats.current()
+        route.db_queries.observe(queries)
+        route.db_duration.observe(query_seconds)
+        return response
+
+    def _on_query(self, elapsed):
+        _db_queries.inc()
+        _db_query_duration.observe(elapsed)
+
+    def _archive_dead_workers(self):
+        # A file under our own pid was left by an earlier process that had
+        # the pid, unless this process already flushed it (another init_app).
+        pid = os.getpid()
+        with _ArchiveLock(self.multiproc_dir, fcntl.LOCK_EX):
+            stale = [
+                path for worker_pid, path in _worker_files(self.multiproc_dir)
+                if (worker_pid == pid and _archived_pids.get(self.multiproc_dir) != pid)
+                or (worker_pid != pid and not _pid_alive(worker_pid))
+            ]
+            if stale:
+                _archive(self.multiproc_dir, stale)
+        _archived_pids[self.multiproc_dir] = pid
+
+    def flush(self):
+        if not self.multiproc_dir:
+            return
+        # Scrapes, the flusher thread and atexit all flush; the lock keeps
+        # them from sharing the tmp file or replacing a newer payload with an
+        # older one, and os.replace keeps readers from seeing a half-written file.
+        path = os.path.join(self.multiproc_dir, f'{os.getpid()}.json')
+        tmp_path = f'{path}.tmp'
+        with self._flush_lock:
+            payload = json.dumps(registry.dump())
+            with open(tmp_path, 'w') as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+
+    def exposition(self):
+        if not self.multiproc_dir:
+            return format_exposition([registry.dump()])
+
+        self.flush()
+        dumps = []
+        with _ArchiveLock(self.multiproc_dir, fcntl.LOCK_SH):
+            for path in glob.glob(os.path.join(self.multiproc_dir, '*.json')):
+                try:
+                    with open(path) as f:
+                        dumps.append(json.load(f))
+                except FileNotFoundError:
+                    continue
+                except (OSError, ValueError) as e:
+                    logger.error(f"Skipping unreadable metrics file {path}: {str(e)}")
+        return format_exposition(dumps)
+
+    def _run(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Metrics flush failed: {str(e)}")
+
+
+# multiproc dir -> pid that last archived it, see _archive_dead_workers.
+_archived_pids = {}
+
+metrics = Metrics()
@@ -1,40 +1,124 @@
-from app import mail, bot
-from flask_mail import Message
+import asyncio
+import time
+from flask import current_app
+from app import bot, mail
 from app.utils.logger import log_message
+from app.utils.mail_pool import send_mail
 from app.models.log import LogTypeEnum
+from app.utils.metrics import email_notifications, telegram_notifications
 
-async def send_information(subject, recipient, body, chat_id):
+def _message(**kwargs):
+    # Message() takes its default sender from the Flask-Mail state, which
+    # LAZY_STARTUP only creates on first use.
+    from flask_mail import Message
+    mail.get()
+    return Message(**kwargs)
+
+def deliver_email(subject, recipient, body):
+    msg = _message(
+        subject=subject,
+        recipients=[recipient],
+        html=body
+    )
+    started = time.perf_counter()
+    ok = False
     try:
-        # Send email
-        msg = Message(
-            subject=subject,
-            recipients=[recipient],
-            html=body
-        )
-        mail.send(msg)
+        send_mail(msg)
+        ok = True
+    finally:
+        email_notifications.record(time.perf_counter() - started, ok)
+
+def deliver_broadcast_email(subject, recipients, body):
+    # One message for many users; BCC keeps their addresses from each other.
+    msg = _message(
+        subject=subject,
+        bcc=list(recipients),
+        html=body
+    )
+    started = time.perf_counter()
+    ok = False
+    try:
+        send_mail(msg)
+        ok = True
+    finally:
+        email_notifications.record(time.perf_counter() - started, ok)
+
+async def deliver_telegram(chat_id, body):
+    started = time.perf_counter()
+    ok = False
+    try:
+        await bot.send_message(chat_id=chat_id, text=body)
+        ok = True
+    finally:
+        telegram_notifications.record(time.perf_counter() - started, ok)
+
+def send_email(subject, recipient, body):
+    try:
+        deliver_email(subject, recipient, body)
         log_message(
             level="INFO", 
             message=f"Email sent to {recipient}", 
             log_type=LogTypeEnum.NOTIFICATION_EMAIL_SENT
         )
+        return True
     except Exception as e:
         log_message(
             level="ERROR",
             message=f"Error sending mail to: {recipient} - {str(e)}",
             log_type=LogTypeEnum.ERROR_NOTIFICATION
         )
+        return False
 
-    # Send telegram message
+def send_broadcast_email(subject, recipients, body):
     try:
-        await bot.send_message(chat_id=chat_id, text=body)
+        deliver_broadcast_email(subject, recipients, body)
         log_message(
             level="INFO",
-            message=f"Telegram message sent to {chat_id}",
-            log_type=LogTypeEnum.NOTIFICATION_TELEGRAM_SENT
+            message=f"Broadcast email sent to {len(recipients)} recipients",
+            log_type=LogTypeEnum.NOTIFICATION_EMAIL_SENT
         )
+        return True
     except Exception as e:
         log_message(
+            level="ERROR",
+            message=f"Error sending broadcast mail to {len(recipients)} recipients - {str(e)}",
+            log_type=LogTypeEnum.ERROR_NOTIFICATION
+        )
+        return False
+
+def _call_in_app_context(app, func, *args, **kwargs):
+    with app.app_context():
+        return func(*args, **kwargs)
+
+async def _off_loop(func, *args, **kwargs):
+    # The coroutines below run on the worker's shared event loop, where a
+    # blocking call (a sync log sink's INSERT, an SMTP send) would stall
+    # every other send. The thread gets an app context, and so a database
+    # session, of its own.
+    return await asyncio.to_thread(_call_in_app_context, current_app._get_current_object(), func, *args, **kwargs)
+
+async def send_telegram(chat_id, body):
+    try:
+        await deliver_telegram(chat_id, body)
+    except Exception as e:
+        await _off_loop(
+            log_message,
             level="ERROR",
             message=f"Error sending telegram message to: {chat_id} - {str(e)}",
             log_type=LogTypeEnum.ERROR_NOTIFICATION
-        ) 
\ No newline at end of file
+        )
+        return False
+    await _off_loop(
+        log_message,
+        level="INFO",
+        message=f"Telegram message sent to {chat_id}",
+        log_type=LogTypeEnum.NOTIFICATION_TELEGRAM_SENT
+    )
+    return True
+
+async def send_information(subject, recipient, body, chat_id):
+    # Send email
+    await _off_loop(send_email, subject, recipient, body)
+
+    # Send telegram message
+    await send_telegram(chat_id, body)
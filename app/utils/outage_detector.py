@@ -0,0 +1,228 @@
+import heapq
+import logging
+import threading
+from datetime import datetime, timedelta
+
+import click
+from sqlalchemy import select
+
+from app import db
+from app.models.log import LogTypeEnum
+from app.models.user import User
+from app.utils.heartbeat_buffer import heartbeat_buffer
+from app.utils.leader_lock import LeaderLock
+from app.utils.logger import log_message
+from app.utils.outages import finish_recoveries, mark_offline, notify_transitions
+from app.utils.region_outages import correlate_regions
+
+logger = logging.getLogger(__name__)
+
+TRACKED_STATES = (User.STATE_ONLINE, User.STATE_SUSPECT)
+TRACK_COLUMNS = (User.username, User.last_request_date, User.outage_threshold_seconds,
+                 User.outage_state, User.has_license)
+VERIFY_BATCH_SIZE = 500
+
+
+class OutageDetector:
+    # Keeps every tracked user's next deadline (last heartbeat + threshold)
+    # in a min-heap and reacts as soon as one passes, instead of scanning the
+    # user table on a timer. Only the worker holding the leader lock runs
+    # it. The leader sees just its own share of heartbeats, so an expired
+    # deadline is first checked against the user row (batched by primary
+    # key) and pushed back if another worker saw a newer heartbeat. Users it
+    # does not track yet (first heartbeat, recoveries, new thresholds) are
+    # picked up from outage_state_changed_at.
+    def __init__(self, app=None):
+        self.app = None
+        self.is_leader = False
+        self._heap = []
+        self._deadlines = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.default_threshold = app.config['OUTAGE_OFFLINE_SECONDS']
+        self.tick = app.config['OUTAGE_DETECTOR_TICK_SECONDS']
+        self.leader_retry = app.config['OUTAGE_DETECTOR_LEADER_RETRY_SECONDS']
+        self.leader_lock = LeaderLock('outage-detector')
+        app.extensions['outage_detector'] = self
+
+        # Same as the periodic check scheduler: CLI commands never lead.
+        if click.get_current_context(silent=True) is not None:
+            return
+
+        self._thread = threading.Thread(target=self._run, name='outage-detector', daemon=True)
+        self._thread.start()
+
+    @property
+    def enabled(self):
+        return self.app is not None
+
+    def record(self, username, seen_at, threshold_seconds=None):
+        # Hot path: O(log n) push. Superseded heap entries are skipped when
+        # they surface instead of being searched for and removed.
+        if not self.is_leader:
+            return
+        self._schedule(username, seen_at, threshold_seconds)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'leader': self.is_leader,
+                'tracked': len(self._deadlines),
+                'heap_size': len(self._heap),
+                'next_deadline': datetime.fromtimestamp(self._heap[0][0]).isoformat() if self._heap else None,
+            }
+
+    def _schedule(self, username, seen_at, threshold_seconds, replace=False):
+        # Heartbeats only ever push a deadline later; rows read back from the
+        # database (replace=True) may also pull it in, e.g. a lowered threshold.
+        deadline = (seen_at + timedelta(seconds=threshold_seconds or self.default_threshold)).timestamp()
+        with self._lock:
+            current = self._deadlines.get(username)
+            if current == deadline or (current is not None and current > deadline and not replace):
+                return
+            self._deadlines[username] = deadline
+            heapq.heappush(self._heap, (deadline, username))
+            earliest = self._heap[0][0] == deadline
+            if len(self._heap) > 2 * len(self._deadlines) + 1024:
+                self._heap = [(deadline, name) for name, deadline in self._deadlines.items()]
+                heapq.heapify(self._heap)
+        if earliest:
+            self._wakeup.set()
+
+    def _forget(self, username):
+        with self._lock:
+            self._deadlines.pop(username, None)
+
+    def _pop_expired(self, now):
+        expired = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                deadline, username = heapq.heappop(self._heap)
+                if self._deadlines.get(username) == deadline:
+                    del self._deadlines[username]
+                    expired.append(username)
+        return expired
+
+    def _seconds_to_next_deadline(self, now):
+        with self._lock:
+            if not self._heap:
+                return self.tick
+            return max(0.0, min(self.tick, self._heap[0][0] - now))
+
+    def _run(self):
+        while True:
+            with self.app.app_context():
+                try:
+                    with self.leader_lock.hold() as acquired:
+                        if acquired:
+                            self._lead()
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Outage detector stopped leading: {str(e)}")
+                finally:
+                    self.is_leader = False
+            self._wakeup.wait(self.leader_retry)
+            self._wakeup.clear()
+
+    def _lead(self):
+        watermark = datetime.now()
+        self._rebuild()
+        self.is_leader = True
+        logger.info(f"Outage detector leading, tracking {len(self._deadlines)} users.")
+
+        while True:
+            self._wakeup.wait(self._seconds_to_next_deadline(datetime.now().timestamp()))
+            self._wakeup.clear()
+
+            now = datetime.now()
+            # Rows are stamped by other workers' clocks and may commit late;
+            # re-reading a few seconds of changes is harmless.
+            watermark = self._follow_changes(watermark - timedelta(seconds=5) - heartbeat_buffer.max_staleness, now)
+            expired = self._pop_expired(now.timestamp())
+            for start in range(0, len(expired), VERIFY_BATCH_SIZE):
+                self._verify(expired[start:start + VERIFY_BATCH_SIZE], now)
+
+    def _rebuild(self):
+        # The only full pass over the user table, once per leadership.
+        with self._lock:
+            self._heap = []
+            self._deadlines = {}
+
+        result = db.session.execute(
+            select(User.username, User.last_request_date, User.outage_threshold_seconds)
+            .where(User.has_license.is_(True),
+                   User.outage_state.in_(TRACKED_STATES),
+                   User.last_request_date.isnot(None))
+            .execution_options(yield_per=5000)
+        )
+        deadlines = {}
+        for username, last_request_date, threshold in result:
+            deadlines[username] = (last_request_date + timedelta(seconds=threshold or self.default_threshold)).timestamp()
+        db.session.commit()
+
+        with self._lock:
+            self._deadlines = deadlines
+            self._heap = [(deadline, username) for username, deadline in deadlines.items()]
+            heapq.heapify(self._heap)
+
+    def _follow_changes(self, since, now):
+        recovered = finish_recoveries(now)
+        for row in recovered:
+            self._schedule(row.username, row.last_request_date, row.outage_threshold_seconds, replace=True)
+        if recovered:
+            _, recovered, _ = correlate_regions(self.app, [], recovered, now)
+            notify_transitions(self.app, [], recovered)
+
+        changed = db.session.execute(
+            select(*TRACK_COLUMNS).where(User.outage_state_changed_at > since)
+        ).all()
+        db.session.commit()
+        for row in changed:
+            self._track(row)
+        return now
+
+    def _track(self, row):
+        if row.has_license and row.outage_state in TRACKED_STATES and row.last_request_date is not None:
+            self._schedule(row.username, row.last_request_date, row.outage_threshold_seconds, replace=True)
+        else:
+            self._forget(row.username)
+
+    def _verify(self, usernames, now):
+        rows = db.session.execute(select(*TRACK_COLUMNS).where(User.username.in_(usernames))).all()
+        db.session.commit()
+
+        staleness = heartbeat_buffer.max_staleness
+        expired = []
+        for row in rows:
+            if not row.has_license or row.outage_state not in TRACKED_STATES or row.last_request_date is None:
+                continue
+            threshold = row.outage_threshold_seconds or self.default_threshold
+            if row.last_request_date + timedelta(seconds=threshold) + staleness > now:
+                self._schedule(row.username, row.last_request_date, row.outage_threshold_seconds)
+            else:
+                expired.append((row.username, threshold))
+
+        if not expired:
+            return
+
+        went_offline = mark_offline([username for username, _ in expired], now,
+                                    min_threshold=min(threshold for _, threshold in expired))
+        if not went_offline:
+            return
+
+        log_message(
+            level="INFO",
+            message=f"Outage detector found {len(went_offline)} users offline.",
+            log_type=LogTypeEnum.ADMIN_PERIODIC_CHECK_STARTED
+        )
+        went_offline, _, _ = correlate_regions(self.app, went_offline, [], now)
+        notify_transitions(self.app, went_offline, [])
+
+
+outage_detector = OutageDetector()
@@ -0,0 +1,186 @@
+from datetime import timedelta
+
+from sqlalchemy import and_, case, func, or_, select, update
+
+from app import db
+from app.models.log import LogTypeEnum
+from app.models.user import User
+from app.utils.fanout import start_notification_job
+from app.utils.logger import log_message
+from app.utils.outbox import enqueue_notifications
+from app.utils.queries import outage_state_query
+from config import Config
+
+NOTIFY_COLUMNS = (User.username, User.email, User.chat_id, User.outage_started_at,
+                  User.last_request_date, User.outage_threshold_seconds, User.region)
+
+
+def heartbeat_values(seen_at):
+    # SET clause for a heartbeat at `seen_at`. A heartbeat newer than the
+    # start of the current episode ends it: SUSPECT goes straight back to
+    # ONLINE (nobody was told), OFFLINE becomes RECOVERED until the check
+    # has sent the all-clear. Older (late flushed) heartbeats change nothing.
+    # outage_state_changed_at also marks a user's first heartbeat, so the
+    # outage detector can start tracking them.
+    # Plain comparisons rather than IN: expanding parameters cannot be used
+    # with the executemany UPDATE of apply_heartbeats.
+    fresh = or_(User.outage_started_at.is_(None), User.outage_started_at < seen_at)
+    in_outage = or_(User.outage_state == User.STATE_OFFLINE, User.outage_state == User.STATE_RECOVERED)
+    silent = or_(User.outage_state == User.STATE_SUSPECT, User.outage_state == User.STATE_OFFLINE)
+    return {
+        'last_request_date': case(
+            (or_(User.last_request_date.is_(None), User.last_request_date < seen_at), seen_at),
+            else_=User.last_request_date
+        ),
+        'outage_state': case(
+            (and_(fresh, in_outage), User.STATE_RECOVERED),
+            (fresh, User.STATE_ONLINE),
+            else_=User.outage_state
+        ),
+        'outage_started_at': case(
+            (and_(fresh, User.outage_state == User.STATE_SUSPECT), None),
+            else_=User.outage_started_at
+        ),
+        'outage_state_changed_at': case(
+            (and_(fresh, silent), seen_at),
+            (User.last_request_date.is_(None), seen_at),
+            else_=User.outage_state_changed_at
+        ),
+    }
+
+
+def threshold_for(row, default):
+    return row.outage_threshold_seconds or default
+
+
+def episode_start(row):
+    # Rows are read before their transition; users the detector takes
+    # straight from ONLINE to OFFLINE start the episode at their last heartbeat.
+    return row.outage_started_at or row.last_request_date
+
+
+def _transition(condition, now, accept=None, **values):
+    # Moves every user matching `condition` (and the optional `accept`
+    # predicate on the row) and returns the NOTIFY_COLUMNS rows of those
+    # that actually moved. The UPDATE re-checks the condition, so a
+    # heartbeat landing between the SELECT and the UPDATE wins.
+    candidates = db.session.execute(select(*NOTIFY_COLUMNS).where(condition)).all()
+    if accept is not None:
+        candidates = [row for row in candidates if accept(row)]
+    if not candidates:
+        return []
+
+    usernames = [row.username for row in candidates]
+    db.session.execute(
+        update(User)
+        .where(User.username.in_(usernames), condition)
+        .values(outage_state_changed_at=now, **values),
+        execution_options={'synchronize_session': False}
+    )
+    moved = set(db.session.execute(
+        select(User.username).where(User.username.in_(usernames), User.outage_state_changed_at == now)
+    ).scalars())
+    return [row for row in candidates if row.username in moved]
+
+
+def advance_outages(now, suspect_after, offline_after):
+    # One pass of the state machine. Only users whose state changes are
+    # touched; returns (went_offline, recovered, suspect_count) where the
+    # first two are rows of NOTIFY_COLUMNS to notify. Users with their own
+    # threshold longer than offline_after stay SUSPECT until it passes;
+    # shorter ones are caught by the outage detector.
+    recovered = finish_recoveries(now)
+    suspect = db.session.execute(
+        update(User)
+        .where(outage_state_query(User.STATE_ONLINE, now - timedelta(seconds=suspect_after)).whereclause)
+        .values(outage_state=User.STATE_SUSPECT,
+                outage_started_at=User.last_request_date,
+                outage_state_changed_at=now),
+        execution_options={'synchronize_session': False}
+    ).rowcount
+    went_offline = _transition(
+        outage_state_query(User.STATE_SUSPECT, now - timedelta(seconds=offline_after)).whereclause,
+        now,
+        accept=lambda row: row.last_request_date < now - timedelta(seconds=threshold_for(row, offline_after)),
+        outage_state=User.STATE_OFFLINE
+    )
+    db.session.commit()
+    return went_offline, recovered, suspect
+
+
+def mark_offline(usernames, now, min_threshold):
+    # Detector path: the caller has already checked each user's own deadline
+    # against fresh data; the re-check only has to reject users whose
+    # heartbeat arrived since, i.e. newer than the shortest threshold.
+    went_offline = _transition(
+        and_(User.username.in_(usernames),
+             User.has_license.is_(True),
+             User.outage_state.in_([User.STATE_ONLINE, User.STATE_SUSPECT]),
+             User.last_request_date < now - timedelta(seconds=min_threshold)),
+        now,
+        outage_state=User.STATE_OFFLINE,
+        outage_started_at=func.coalesce(User.outage_started_at, User.last_request_date)
+    )
+    db.session.commit()
+    return went_offline
+
+
+def finish_recoveries(now):
+    recovered = _transition(
+        outage_state_query(User.STATE_RECOVERED).whereclause,
+        now,
+        outage_state=User.STATE_ONLINE,
+        outage_started_at=None
+    )
+    db.session.commit()
+    return recovered
+
+
+def notify_transitions(app, went_offline, recovered):
+    # One outage notification per user going OFFLINE and one all-clear per
+    # recovery. Returns the job ids (job delivery) or the number of outbox
+    # rows written (outbox delivery).
+    if not app.config['OUTAGE_NOTIFY_RECOVERY']:
+        recovered = []
+    data = {'job_id': None}
+    if not went_offline and not recovered:
+        return data
+
+    for user in went_offline:
+        log_message(
+            level="INFO",
+            message=f"Sending notification to user {user.username}.",
+            username=user.username,
+            log_type=LogTypeEnum.ADMIN_INACTIVE_USERS_NOTIFIED
+        )
+    for user in recovered:
+        log_message(
+            level="INFO",
+            message=f"Sending recovery notification to user {user.username}.",
+            username=user.username,
+            log_type=LogTypeEnum.ADMIN_INACTIVE_USERS_NOTIFIED
+        )
+
+    notifications = [(went_offline, "Dikkat!", Config.MAIL_BODY, ''),
+                     (recovered, "Bağlantı Sağlandı", Config.RECOVERY_MAIL_BODY, '/recovered')]
+
+    if app.config['NOTIFICATION_DELIVERY'] == 'outbox':
+        # Delivery, retries and dedupe are handled by `flask outbox-worker`;
+        # one notification per outage episode and transition.
+        data['enqueued'] = 0
+        for users, subject, body, suffix in notifications:
+            data['enqueued'] += enqueue_notifications(
+                [(user.username, episode_start(user).isoformat() + suffix, user.email, user.chat_id) for user in users],
+                subject=subject,
+                body=body
+            )
+        return data
+
+    for key, (users, subject, body, _) in zip(('job_id', 'recovery_job_id'), notifications):
+        data[key] = start_notification_job(
+            app,
+            recipients=[(user.email, user.chat_id) for user in users],
+            subject=subject,
+            body=body
+        ) if users else None
+    return data
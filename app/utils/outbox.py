@@ -0,0 +1,279 @@
+import asyncio
+import json
+import logging
+import random
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, insert, or_, select, update
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models.log import LogTypeEnum
+from app.models.notification_outbox import NotificationOutbox
+from app.utils.async_runner import async_runner
+from app.utils.fanout import telegram_limiters
+from app.utils.logger import log_message
+from app.utils.notifications import deliver_broadcast_email, deliver_email, deliver_telegram
+
+logger = logging.getLogger(__name__)
+
+
+def _insert_ignoring_duplicates(rows, index_elements=('username', 'episode_key', 'channel')):
+    table = NotificationOutbox.__table__
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect in ('postgresql', 'sqlite'):
+        dialect_insert = postgresql_insert if dialect == 'postgresql' else sqlite_insert
+        stmt = dialect_insert(table).on_conflict_do_nothing(
+            index_elements=list(index_elements)
+        )
+        result = db.session.execute(stmt, rows)
+        return result.rowcount
+
+    inserted = 0
+    for row in rows:
+        try:
+            with db.session.begin_nested():
+                db.session.execute(insert(table), [row])
+            inserted += 1
+        except IntegrityError:
+            pass
+    return inserted
+
+
+def enqueue_notifications(notifications, subject, body):
+    # notifications: iterable of (username, episode_key, email, chat_id).
+    # Sends are deduplicated per (user, outage episode, channel), so
+    # re-running the check for the same outage never enqueues twice.
+    now = datetime.utcnow()
+    rows = []
+    for username, episode_key, email, chat_id in notifications:
+        for channel, recipient in ((NotificationOutbox.CHANNEL_EMAIL, email),
+                                   (NotificationOutbox.CHANNEL_TELEGRAM, chat_id)):
+            rows.append({
+                'username': username,
+                'episode_key': episode_key,
+                'channel': channel,
+                'recipient': recipient,
+                'subject': subject,
+                'body': body,
+                'status': NotificationOutbox.STATUS_PENDING,
+                'attempts': 0,
+                'next_attempt_at': now,
+                'created_at': now,
+            })
+
+    if not rows:
+        return 0
+
+    inserted = _insert_ignoring_duplicates(rows)
+    db.session.commit()
+    return inserted
+
+
+def enqueue_broadcast(region_outage_id, episode_key, region, email_batches, chat_id, subject, body):
+    # A regional broadcast as one row per message: a row per BCC email
+    # batch and one for the region's Telegram channel, so a failed batch is
+    # retried on its own. Deduplicated per outage and transition. Does not
+    # commit: the rows belong in the transaction that opens or resolves the
+    # outage, so neither can be lost without the other.
+    now = datetime.utcnow()
+    base = {
+        'username': None,
+        'region_outage_id': region_outage_id,
+        'subject': subject,
+        'body': body,
+        'status': NotificationOutbox.STATUS_PENDING,
+        'attempts': 0,
+        'next_attempt_at': now,
+        'created_at': now,
+    }
+    rows = [
+        dict(base, episode_key=f'{episode_key}/{index}', channel=NotificationOutbox.CHANNEL_EMAIL,
+             recipient=region, recipients=json.dumps(batch))
+        for index, batch in enumerate(email_batches)
+    ]
+    if chat_id:
+        rows.append(dict(base, episode_key=episode_key, channel=NotificationOutbox.CHANNEL_TELEGRAM,
+                         recipient=chat_id, recipients=None))
+
+    if not rows:
+        return 0
+
+    return _insert_ignoring_duplicates(rows, index_elements=('region_outage_id', 'episode_key', 'channel'))
+
+
+def backoff_delay(attempts, base, maximum):
+    # Exponential backoff with jitter: somewhere in [delay/2, delay].
+    delay = min(maximum, base * (2 ** (attempts - 1)))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+class OutboxWorker:
+    def __init__(self, app, batch_size, poll_interval):
+        self.app = app
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.max_attempts = app.config['OUTBOX_MAX_ATTEMPTS']
+        self.backoff_base = app.config['OUTBOX_BACKOFF_BASE_SECONDS']
+        self.backoff_max = app.config['OUTBOX_BACKOFF_MAX_SECONDS']
+        self.claim_timeout = timedelta(seconds=app.config['OUTBOX_CLAIM_TIMEOUT_SECONDS'])
+        self.concurrency = app.config['NOTIFICATION_CONCURRENCY']
+
+    def run(self, stop_event):
+        with self.app.app_context():
+            while not stop_event.is_set():
+                try:
+                    processed = self.process_batch()
+                except Exception as e:
+                    db.session.rollback()
+                    logger.error(f"Outbox batch failed: {str(e)}")
+                    processed = 0
+                if not processed:
+                    stop_event.wait(self.poll_interval)
+
+    def process_batch(self):
+        rows = self.claim()
+        if not rows:
+            return 0
+
+        results = async_runner.run(self._deliver(rows))
+        for row, error in zip(rows, results):
+            self._finish(row, error)
+        db.session.commit()
+        return len(rows)
+
+    def claim(self):
+        # SKIP LOCKED lets any number of workers pull disjoint batches; the
+        # conditional UPDATE keeps claims exclusive on databases without it.
+        now = datetime.utcnow()
+        token = str(uuid.uuid4())
+        claimable = or_(
+            and_(NotificationOutbox.status == NotificationOutbox.STATUS_PENDING,
+                 NotificationOutbox.next_attempt_at <= now),
+            and_(NotificationOutbox.status == NotificationOutbox.STATUS_SENDING,
+                 NotificationOutbox.claimed_at < now - self.claim_timeout)
+        )
+
+        ids = db.session.execute(
+            select(NotificationOutbox.id)
+            .where(claimable)
+            .order_by(NotificationOutbox.next_attempt_at)
+            .limit(self.batch_size)
+            .with_for_update(skip_locked=True)
+        ).scalars().all()
+        if not ids:
+            db.session.commit()
+            return []
+
+        db.session.execute(
+            update(NotificationOutbox)
+            .where(NotificationOutbox.id.in_(ids), claimable)
+            .values(status=NotificationOutbox.STATUS_SENDING, claimed_by=token, claimed_at=now)
+        )
+        db.session.commit()
+
+        return db.session.execute(
+            select(NotificationOutbox).where(NotificationOutbox.claimed_by == token)
+        ).scalars().all()
+
+    async def _deliver(self, rows):
+        with self.app.app_context():
+            telegram_limiter, chat_limiter = telegram_limiters(self.app)
+            semaphore = asyncio.Semaphore(self.concurrency)
+
+            async def deliver(row):
+                try:
+                    if row.channel == NotificationOutbox.CHANNEL_EMAIL and row.recipients is not None:
+                        async with semaphore:
+                            await asyncio.to_thread(self._in_app_context, deliver_broadcast_email,
+                                                    row.subject, json.loads(row.recipients), row.body)
+                    elif row.channel == NotificationOutbox.CHANNEL_EMAIL:
+                        async with semaphore:
+                            await asyncio.to_thread(self._in_app_context, deliver_email, row.subject, row.recipient, row.body)
+                    else:
+                        await chat_limiter.acquire(row.recipient)
+                        await telegram_limiter.acquire()
+                        async with semaphore:
+                            await deliver_telegram(row.recipient, row.body)
+                    return None
+                except Exception as e:
+                    return str(e) or e.__class__.__name__
+
+            return await asyncio.gather(*(deliver(row) for row in rows))
+
+    def _in_app_context(self, func, *args):
+        with self.app.app_context():
+            return func(*args)
+
+    def _finish(self, row, error):
+        now = datetime.utcnow()
+        row.attempts += 1
+        row.claimed_by = None
+        row.claimed_at = None
+
+        if error is None:
+            row.status = NotificationOutbox.STATUS_SENT
+            row.sent_at = now
+            row.last_error = None
+            log_message(
+                level="INFO",
+                message=f"{row.channel.capitalize()} notification sent to {row.recipient}",
+                username=row.username,
+                log_type=(LogTypeEnum.NOTIFICATION_EMAIL_SENT if row.channel == NotificationOutbox.CHANNEL_EMAIL
+                          else LogTypeEnum.NOTIFICATION_TELEGRAM_SENT)
+            )
+            return
+
+        row.last_error = error[:500]
+        if row.attempts >= self.max_attempts:
+            row.status = NotificationOutbox.STATUS_FAILED
+            log_message(
+                level="ERROR",
+                message=f"Giving up on {row.channel.lower()} notification to {row.recipient} after {row.attempts} attempts - {error}",
+                username=row.username,
+                log_type=LogTypeEnum.NOTIFICATION_FAILED
+            )
+            return
+
+        row.status = NotificationOutbox.STATUS_PENDING
+        row.next_attempt_at = now + timedelta(seconds=backoff_delay(row.attempts, self.backoff_base, self.backoff_max))
+        log_message(
+            level="ERROR",
+            message=f"Error sending {row.channel.lower()} notification to {row.recipient}, retry {row.attempts} scheduled - {error}",
+            username=row.username,
+            log_type=LogTypeEnum.ERROR_NOTIFICATION
+        )
+
+
+def run_outbox_workers(app, workers, batch_size, poll_interval, once=False):
+    if once:
+        worker = OutboxWorker(app, batch_size, poll_interval)
+        total = 0
+        with app.app_context():
+            while True:
+                processed = worker.process_batch()
+                if not processed:
+                    return total
+                total += processed
+
+    stop_event = threading.Event()
+    threads = []
+    for index in range(workers):
+        worker = OutboxWorker(app, batch_size, poll_interval)
+        thread = threading.Thread(target=worker.run, args=(stop_event,), name=f'outbox-worker-{index}', daemon=True)
+        thread.start()
+        threads.append(thread)
+
+    try:
+        while any(thread.is_alive() for thread in threads):
+            for thread in threads:
+                thread.join(1.0)
+    except KeyboardInterrupt:
+        stop_event.set()
+        for thread in threads:
+            thread.join()
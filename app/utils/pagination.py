@@ -0,0 +1,36 @@
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import tuple_
+
+from app.models.log import Log
+
+
+def encode_cursor(log):
+    payload = json.dumps([log.timestamp.isoformat(), log.id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, log_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(timestamp), int(log_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+
+def keyset_page(query, per_page, cursor=None):
+    # Seeks past the cursor on the (timestamp, id) index instead of using
+    # OFFSET, so every page costs the same no matter how deep it is.
+    if per_page < 1:
+        raise ValueError(f"Invalid page size: {per_page}")
+    if cursor:
+        timestamp, log_id = decode_cursor(cursor)
+        query = query.filter(tuple_(Log.timestamp, Log.id) < tuple_(timestamp, log_id))
+
+    rows = query.limit(per_page + 1).all()
+    items = rows[:per_page]
+    next_cursor = encode_cursor(items[-1]) if len(rows) > per_page else None
+    return items, next_cursor
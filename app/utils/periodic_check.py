@@ -0,0 +1,152 @@
+import atexit
+import logging
+import os
+import socket
+import time
+from datetime import datetime, timedelta
+
+import click
+
+from app import db
+from app.models.check_run import CheckRun
+from app.models.log import LogTypeEnum
+from app.utils.heartbeat_buffer import heartbeat_buffer
+from app.utils.leader_lock import LeaderLock
+from app.utils.logger import log_message
+from app.utils.outages import advance_outages, notify_transitions
+from app.utils.region_outages import correlate_regions
+
+logger = logging.getLogger(__name__)
+
+periodic_check_lock = LeaderLock('periodic-check')
+
+
+def perform_periodic_check(app):
+    # Only this worker's buffer can be flushed here; heartbeats buffered by
+    # other workers reach the database within max_staleness while their
+    # flushes succeed, so widen the window by that much to avoid flagging
+    # devices whose latest ping is still in flight.
+    if heartbeat_buffer.enabled:
+        heartbeat_buffer.flush()
+    now = datetime.now()
+    staleness = heartbeat_buffer.max_staleness.total_seconds()
+    went_offline, recovered, suspect = advance_outages(
+        now,
+        suspect_after=app.config['OUTAGE_SUSPECT_SECONDS'] + staleness,
+        offline_after=app.config['OUTAGE_OFFLINE_SECONDS'] + staleness
+    )
+    log_message(
+        level="INFO",
+        message=f"Periodic check performed, {len(went_offline)} users went offline, {len(recovered)} recovered, {suspect} suspect.",
+        log_type=LogTypeEnum.ADMIN_PERIODIC_CHECK_STARTED
+    )
+
+    data = {'inactive_users': len(went_offline),
+            'recovered_users': len(recovered) if app.config['OUTAGE_NOTIFY_RECOVERY'] else 0,
+            'suspect_users': suspect}
+    went_offline, recovered, regional = correlate_regions(app, went_offline, recovered, now)
+    data.update(regional)
+    data.update(notify_transitions(app, went_offline, recovered))
+    return data
+
+
+def run_periodic_check(app, trigger, min_interval=None):
+    # Runs the check under the deployment-wide lock and records it as a
+    # CheckRun. Returns (run, data), or None if another worker is running
+    # it right now, or (with min_interval) ran it less than that ago.
+    with periodic_check_lock.hold() as acquired:
+        if not acquired:
+            return None
+
+        if min_interval is not None:
+            last_started_at = db.session.execute(
+                db.select(db.func.max(CheckRun.started_at))
+            ).scalar()
+            if last_started_at is not None and last_started_at > datetime.utcnow() - min_interval:
+                db.session.rollback()
+                return None
+
+        run = CheckRun(trigger=trigger, worker=f'{socket.gethostname()}:{os.getpid()}', status='RUNNING')
+        db.session.add(run)
+        db.session.commit()
+
+        started = time.monotonic()
+        try:
+            data = perform_periodic_check(app)
+        except Exception as e:
+            db.session.rollback()
+            run.status = 'FAILED'
+            run.error = str(e)[:500]
+            raise
+        else:
+            run.status = 'OK'
+            run.went_offline = data['inactive_users']
+            run.recovered = data['recovered_users']
+            run.suspect = data['suspect_users']
+        finally:
+            run.duration_ms = int((time.monotonic() - started) * 1000)
+            run.finished_at = datetime.utcnow()
+            db.session.commit()
+
+        data['run_id'] = run.id
+        return run, data
+
+
+class PeriodicCheckScheduler:
+    # Every worker schedules the check; the leader lock lets one of them run
+    # each tick and the min_interval guard stops the others from running it
+    # again right after. A tick that is still running when the next is due
+    # makes that next one be skipped, in this worker and in all others.
+    def __init__(self, app=None):
+        self.app = None
+        self.scheduler = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.interval = app.config['PERIODIC_CHECK_INTERVAL_SECONDS']
+        app.extensions['periodic_check_scheduler'] = self
+
+        # `flask db upgrade` and the other CLI commands build the app too;
+        # only long-running servers take part in the schedule.
+        if click.get_current_context(silent=True) is not None:
+            return
+
+        from apscheduler.schedulers.background import BackgroundScheduler
+        self.scheduler = BackgroundScheduler(daemon=True, timezone='UTC')
+        self.scheduler.add_job(
+            self._tick,
+            'interval',
+            seconds=self.interval,
+            id='periodic-check',
+            max_instances=1,
+            coalesce=True,
+            misfire_grace_time=max(1, self.interval // 2)
+        )
+        self.scheduler.start()
+        atexit.register(self.shutdown)
+
+    @property
+    def running(self):
+        return self.scheduler is not None and self.scheduler.running
+
+    def shutdown(self):
+        if self.running:
+            self.scheduler.shutdown(wait=False)
+
+    def _tick(self):
+        with self.app.app_context():
+            try:
+                result = run_periodic_check(
+                    self.app,
+                    CheckRun.TRIGGER_SCHEDULER,
+                    min_interval=timedelta(seconds=self.interval / 2)
+                )
+                if result is None:
+                    logger.debug("Periodic check tick skipped, another worker has it.")
+            except Exception as e:
+                logger.error(f"Scheduled periodic check failed: {str(e)}")
+
+
+periodic_check_scheduler = PeriodicCheckScheduler()
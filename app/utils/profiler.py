@@ -0,0 +1,201 @@
+import cProfile
+import glob
+import json
+import logging
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+from flask import g, request
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+KIND_CPROFILE = 'cprofile'
+KIND_SAMPLE = 'sample'
+EXTENSIONS = {KIND_CPROFILE: 'prof', KIND_SAMPLE: 'folded'}
+PROFILE_ID = re.compile(r'^[0-9T]+-\d+-[0-9a-f]{8}$')
+
+
+class StackSampler:
+    # Wall-clock sampler for one thread: every interval a helper thread
+    # reads the target's current frame from sys._current_frames() and
+    # counts the stack, giving collapsed stacks ("outer;inner count") for
+    # flamegraph tools. Costs one frame walk per interval, nothing in the
+    # profiled thread itself.
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='stack-sampler', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def folded(self):
+        return ''.join(f'{stack} {count}\n' for stack, count in self.stacks.most_common())
+
+
+class RequestProfiler:
+    # Runs a request under a profiler when it carries the admin key and
+    # `X-Profile: cprofile` (deterministic, pstats file) or `X-Profile:
+    # sample` (collapsed stacks), and samples PROFILE_SAMPLE_RATE of all
+    # other requests with the stack sampler. Artifacts go to PROFILE_DIR,
+    # shared by the workers, which keeps only the newest
+    # PROFILE_MAX_ARTIFACTS of them.
+    def __init__(self, app=None):
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.directory = app.config['PROFILE_DIR'] or os.path.join(tempfile.gettempdir(), 'electric-check-profiles')
+        self.max_artifacts = app.config['PROFILE_MAX_ARTIFACTS']
+        self.sample_rate = app.config['PROFILE_SAMPLE_RATE']
+        self.sample_interval = app.config['PROFILE_SAMPLE_INTERVAL_MS'] / 1000
+        os.makedirs(self.directory, exist_ok=True)
+        app.extensions['request_profiler'] = self
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+
+    @property
+    def enabled(self):
+        return self.app is not None
+
+    def _requested_kind(self):
+        kind = request.headers.get('X-Profile')
+        if kind is None:
+            return None
+        admin_key = request.headers.get('admin-key')
+        if admin_key is None or admin_key != Config.ADMIN_KEY or kind not in EXTENSIONS:
+            return None
+        return kind
+
+    def _before_request(self):
+        kind = self._requested_kind()
+        trigger = 'header'
+        if kind is None:
+            if not self.sample_rate or random.random() >= self.sample_rate:
+                return
+            kind, trigger = KIND_SAMPLE, 'random'
+
+        if kind == KIND_CPROFILE:
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler already runs in this process.
+                kind = KIND_SAMPLE
+        if kind == KIND_SAMPLE:
+            profiler = StackSampler(threading.get_ident(), self.sample_interval)
+            profiler.start()
+        g._profile = (kind, trigger, profiler, time.perf_counter())
+
+    def _after_request(self, response):
+        profile = g.pop('_profile', None)
+        if profile is None:
+            return response
+        kind, trigger, profiler, started = profile
+        if kind == KIND_CPROFILE:
+            profiler.disable()
+        else:
+            profiler.stop()
+        elapsed = time.perf_counter() - started
+
+        try:
+            profile_id = self._save(kind, profiler, {
+                'trigger': trigger,
+                'method': request.method,
+                'path': request.path,
+                'endpoint': request.endpoint,
+                'status': response.status_code,
+                'duration_ms': round(elapsed * 1000, 3),
+            })
+        except OSError as e:
+            logger.error(f"Could not save request profile: {str(e)}")
+            return response
+        response.headers['X-Profile-Id'] = profile_id
+        return response
+
+    def _save(self, kind, profiler, meta):
+        now = datetime.utcnow()
+        profile_id = f'{now:%Y%m%dT%H%M%S%f}-{os.getpid()}-{uuid.uuid4().hex[:8]}'
+        path = os.path.join(self.directory, f'{profile_id}.{EXTENSIONS[kind]}')
+        if kind == KIND_CPROFILE:
+            profiler.dump_stats(path)
+        else:
+            meta['samples'] = sum(profiler.stacks.values())
+            with open(path, 'w') as f:
+                f.write(profiler.folded())
+
+        meta.update(id=profile_id, kind=kind, created_at=now.isoformat(),
+                    filename=os.path.basename(path), size=os.path.getsize(path))
+        # Metadata last: list() only shows artifacts that are complete.
+        tmp_path = os.path.join(self.directory, f'{profile_id}.json.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(self.directory, f'{profile_id}.json'))
+        self._prune()
+        return profile_id
+
+    def _prune(self):
+        # Ids start with their timestamp, so names sort oldest first.
+        expired = sorted(glob.glob(os.path.join(self.directory, '*.json')))[:-self.max_artifacts]
+        for meta_path in expired:
+            profile_id = os.path.basename(meta_path)[:-len('.json')]
+            for path in glob.glob(os.path.join(self.directory, f'{profile_id}.*')):
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def list(self):
+        profiles = []
+        for meta_path in sorted(glob.glob(os.path.join(self.directory, '*.json')), reverse=True):
+            try:
+                with open(meta_path) as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return profiles
+
+    def artifact(self, profile_id):
+        # (path, metadata) of a stored profile, or None.
+        if not PROFILE_ID.match(profile_id):
+            return None
+        try:
+            with open(os.path.join(self.directory, f'{profile_id}.json')) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        path = os.path.join(self.directory, meta['filename'])
+        return (path, meta) if os.path.exists(path) else None
+
+
+request_profiler = RequestProfiler()
@@ -0,0 +1,107 @@
+from sqlalchemy import func, or_, select
+
+from app.models.log import Log
+from app.models.log_rollup import LogDailyUserRollup, LogHourlyRollup
+from app.models.user import User
+
+# Query builders for the hot paths, shared by the routes and by
+# `flask check-query-plans` so the plans checked are the plans served.
+
+
+def logs_query(log_type=None, username=None, since=None, until=None, fields=None):
+    # With a FieldSet, only its columns are selected and rows come back
+    # instead of Log instances.
+    query = Log.query if fields is None else Log.query.with_entities(*fields.columns)
+    if log_type:
+        query = query.filter(Log.log_type == log_type)
+    if username:
+        query = query.filter(Log.username == username)
+    if since:
+        query = query.filter(Log.timestamp >= since)
+    if until:
+        query = query.filter(Log.timestamp < until)
+    return query.order_by(Log.timestamp.desc(), Log.id.desc())
+
+
+def hourly_rollup_query(since=None, until=None, log_type=None, level=None):
+    # Served by the (bucket, log_type, level) primary key.
+    query = LogHourlyRollup.query
+    if since:
+        query = query.filter(LogHourlyRollup.bucket >= since)
+    if until:
+        query = query.filter(LogHourlyRollup.bucket < until)
+    if log_type:
+        query = query.filter(LogHourlyRollup.log_type == log_type)
+    if level:
+        query = query.filter(LogHourlyRollup.level == level)
+    return query.order_by(LogHourlyRollup.bucket, LogHourlyRollup.log_type, LogHourlyRollup.level)
+
+
+def daily_user_rollup_query(since=None, until=None, username=None, log_type=None):
+    # By day through the primary key, or for one user through
+    # (username, day, log_type); both return rows in index order.
+    query = LogDailyUserRollup.query
+    if since:
+        query = query.filter(LogDailyUserRollup.day >= since)
+    if until:
+        query = query.filter(LogDailyUserRollup.day < until)
+    if log_type:
+        query = query.filter(LogDailyUserRollup.log_type == log_type)
+    if username:
+        query = query.filter(LogDailyUserRollup.username == username)
+        return query.order_by(LogDailyUserRollup.day, LogDailyUserRollup.log_type)
+    return query.order_by(LogDailyUserRollup.day, LogDailyUserRollup.username, LogDailyUserRollup.log_type)
+
+
+def outage_state_query(state, cutoff=None):
+    # Only licensed users can send heartbeats, and the partial index on
+    # (outage_state, last_request_date) only covers them. The redundant
+    # "not ONLINE" term lets SQLite match the smaller partial index for
+    # the other states; it only uses one whose WHERE the query repeats.
+    query = User.query.filter(
+        User.has_license.is_(True),
+        User.outage_state == state
+    )
+    if state != User.STATE_ONLINE:
+        query = query.filter(User.outage_state != User.STATE_ONLINE)
+    if cutoff is not None:
+        query = query.filter(User.last_request_date < cutoff)
+    return query
+
+
+def telegram_user_lookup_query(chat_id, phone_number, email):
+    return User.query.filter(
+        or_(
+            User.chat_id == chat_id,
+            User.phone_number == phone_number,
+            User.email == email
+        ))
+
+
+def users_list_query(fields):
+    # Column-projected select of a FieldSet; rows, not User instances.
+    return select(*fields.columns)
+
+
+def users_export_query(fields, licensed=None, inactive_since=None, has_chat_id=None):
+    # Column-projected select; streamed with a server-side cursor.
+    statement = select(*[getattr(User, field) for field in fields])
+    if licensed is not None:
+        statement = statement.where(User.has_license.is_(licensed))
+    if inactive_since is not None:
+        statement = statement.where(User.last_request_date < inactive_since)
+    if has_chat_id is not None:
+        # Users registered by an admin get the "default" placeholder chat id.
+        has_chat = User.chat_id != 'default'
+        statement = statement.where(has_chat if has_chat_id else ~has_chat)
+    return statement.execution_options(yield_per=1000)
+
+
+def region_status_query(region=None):
+    # Licensed users per region and outage state; served by
+    # ix_user_licensed_region_outage_state.
+    query = User.query.with_entities(User.region, User.outage_state, func.count()).filter(
+        User.has_license.is_(True), User.region.isnot(None))
+    if region is not None:
+        query = query.filter(User.region == region)
+    return query.group_by(User.region, User.outage_state).order_by(User.region, User.outage_state)
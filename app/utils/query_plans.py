@@ -0,0 +1,150 @@
+import random
+import re
+import uuid
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select, text, tuple_
+
+from app import db
+from app.models.log import Log, LogTypeEnum
+from app.models.user import User
+from app.utils.heartbeat_buffer import heartbeat_update
+from app.utils.queries import (daily_user_rollup_query, hourly_rollup_query, logs_query, outage_state_query,
+                               region_status_query, telegram_user_lookup_query)
+from app.utils.serialization import LOGS_FIELDS
+
+SQLITE_FULL_SCAN = re.compile(r'^SCAN \w+$')
+
+
+def hot_queries():
+    # (route, query, filtered) mirroring what the routes actually run. A
+    # filtered query must be answered through an index condition; walking a
+    # whole index in order is only acceptable for unfiltered, limited reads.
+    sample_username = str(uuid.uuid4())
+    return [
+        ('GET /admin/logs', logs_query(fields=LOGS_FIELDS).limit(10), False),
+        ('GET /admin/logs X-Log-Type', logs_query(
+            log_type=LogTypeEnum.ELECTRIC_CHECK_SUCCESS.name, fields=LOGS_FIELDS).limit(10), True),
+        ('GET /admin/logs X-Username', logs_query(username=sample_username, fields=LOGS_FIELDS).limit(10), True),
+        ('GET /admin/logs X-Cursor', logs_query(fields=LOGS_FIELDS).filter(
+            tuple_(Log.timestamp, Log.id) < tuple_(datetime.utcnow(), 2 ** 31 - 1)).limit(10), True),
+        ('GET /admin/logs/rollups/hourly', hourly_rollup_query(since=datetime.utcnow() - timedelta(days=1)).limit(100), True),
+        ('GET /admin/logs/rollups/daily-users', daily_user_rollup_query(since=datetime.utcnow().date()).limit(100), True),
+        ('GET /admin/logs/rollups/daily-users X-Username', daily_user_rollup_query(username=sample_username).limit(100), True),
+        ('GET /admin/periodic-check ONLINE', outage_state_query(User.STATE_ONLINE, datetime.now() - timedelta(minutes=30)), True),
+        ('GET /admin/periodic-check SUSPECT', outage_state_query(User.STATE_SUSPECT, datetime.now() - timedelta(hours=2)), True),
+        ('GET /admin/periodic-check RECOVERED', outage_state_query(User.STATE_RECOVERED), True),
+        ('GET /admin/regions/status X-Region', region_status_query('probe-region'), True),
+        ('POST /telegram/user-data', telegram_user_lookup_query('chat', '+900000000000', 'probe@example.com').limit(1), True),
+        ('POST /user/electric-check', User.query.filter_by(username=sample_username, has_license=True).limit(1), True),
+    ]
+
+
+def explain(connection, query):
+    dialect = connection.dialect
+    compiled = query.statement.compile(dialect=dialect)
+    params = compiled.construct_params()
+    if compiled.positional:
+        params = tuple(params[name] for name in compiled.positiontup)
+
+    if dialect.name == 'postgresql':
+        rows = connection.exec_driver_sql(f"EXPLAIN {compiled.string}", params).all()
+        return [row[0] for row in rows]
+    if dialect.name == 'sqlite':
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled.string}", params).all()
+        return [row[-1] for row in rows]
+    raise RuntimeError(f"Query plan checks are not supported on {dialect.name}")
+
+
+def is_sequential(dialect_name, plan, filtered):
+    if dialect_name == 'postgresql':
+        if any('Seq Scan' in line for line in plan):
+            return True
+        return filtered and not any('Index Cond' in line or 'Recheck Cond' in line for line in plan)
+
+    if any(SQLITE_FULL_SCAN.match(line) or 'USE TEMP B-TREE FOR ORDER BY' in line for line in plan):
+        return True
+    return filtered and any(line.startswith('SCAN ') for line in plan)
+
+
+def check_query_plans():
+    # On PostgreSQL sequential scans are disabled for the check, so a Seq
+    # Scan in the plan means no usable index exists, whatever the table size.
+    results = []
+    with db.engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            if connection.dialect.name == 'postgresql':
+                connection.execute(text('SET LOCAL enable_seqscan = off'))
+            for route, query, filtered in hot_queries():
+                plan = explain(connection, query)
+                results.append((route, not is_sequential(connection.dialect.name, plan, filtered), plan))
+        finally:
+            transaction.rollback()
+    return results
+
+
+def check_heartbeat_flush():
+    # Outside PostgreSQL, heartbeats are applied with the heartbeat UPDATE
+    # as an executemany, which rejects expanding parameters (IN lists) in
+    # the statement, but only once a flush holds two rows. Applies two
+    # heartbeats to two scratch users in a transaction that is rolled back.
+    # Returns (ok, detail).
+    seen_at = datetime.now().replace(microsecond=0)
+    usernames = [str(uuid.uuid4()) for _ in range(2)]
+    with db.engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            connection.execute(insert(User.__table__), [{
+                'username': username,
+                'email': f'{username}@check.invalid',
+                'last_request_date': seen_at - timedelta(hours=1),
+                'has_license': True,
+                'first_name': 'Check',
+                'last_name': 'User',
+                'phone_number': username[:20],
+                'chat_id': username,
+            } for username in usernames])
+            connection.execute(heartbeat_update(), [
+                {'b_username': username, 'b_seen_at': seen_at} for username in usernames
+            ])
+            applied = connection.execute(
+                select(func.count()).select_from(User)
+                .where(User.username.in_(usernames), User.last_request_date == seen_at)
+            ).scalar()
+        except Exception as e:
+            return False, str(e).splitlines()[0]
+        finally:
+            transaction.rollback()
+    return applied == len(usernames), f'applied {applied} of {len(usernames)}'
+
+
+def seed(users, logs):
+    now = datetime.now()
+    usernames = [str(uuid.uuid4()) for _ in range(users)]
+    db.session.execute(insert(User.__table__), [{
+        'username': username,
+        'email': f'{username}@seed.invalid',
+        'last_request_date': now - timedelta(minutes=random.randint(0, 600)),
+        'has_license': random.random() < 0.9,
+        'first_name': 'Seed',
+        'last_name': 'User',
+        'phone_number': username[:20],
+        'chat_id': username,
+    } for username in usernames])
+
+    log_types = list(LogTypeEnum)
+    for start in range(0, logs, 10000):
+        db.session.execute(insert(Log.__table__), [{
+            'timestamp': datetime.utcnow() - timedelta(seconds=random.randint(0, 30 * 86400)),
+            'level': 'INFO',
+            'message': 'Seeded log row.',
+            'username': random.choice(usernames) if usernames else None,
+            'log_type': random.choice(log_types),
+        } for _ in range(min(10000, logs - start))])
+    db.session.commit()
+
+    if db.engine.dialect.name in ('postgresql', 'sqlite'):
+        with db.engine.connect() as connection:
+            connection.execute(text('ANALYZE'))
+            connection.commit()
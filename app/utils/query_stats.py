@@ -0,0 +1,209 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+from flask import request
+from sqlalchemy import event
+
+from app import db
+
+logger = logging.getLogger(__name__)
+
+STATEMENT_PREVIEW_CHARS = 300
+
+
+class _RequestQueries(threading.local):
+    active = False
+    route = None
+    count = 0
+    seconds = 0.0
+    slow = 0
+    # Executions per statement text, only while detection is on.
+    statements = None
+
+
+class _RouteQueries:
+    __slots__ = ('requests', 'queries', 'seconds', 'max_queries', 'repeated_requests', 'slow_queries')
+
+    def __init__(self):
+        self.requests = 0
+        self.queries = 0
+        self.seconds = 0.0
+        self.max_queries = 0
+        self.repeated_requests = 0
+        self.slow_queries = 0
+
+    def to_dict(self, route):
+        return {
+            'route': route,
+            'requests': self.requests,
+            'queries': self.queries,
+            'avg_queries': round(self.queries / self.requests, 2) if self.requests else 0,
+            'max_queries': self.max_queries,
+            'db_ms': round(self.seconds * 1000, 3),
+            'avg_db_ms': round(self.seconds * 1000 / self.requests, 3) if self.requests else 0,
+            'repeated_requests': self.repeated_requests,
+            'slow_queries': self.slow_queries,
+        }
+
+
+class QueryStats:
+    # Owns the engine-wide cursor listeners: counts statements and database
+    # time per request for the metrics module, and with QUERY_STATS_ENABLED
+    # also flags statements repeated within one request (N+1 loops), logs
+    # slow statements with their route and keeps per-route aggregates for
+    # /admin/query-stats. Not initialised at all when both are off, so no
+    # listener runs. Aggregates are per worker process.
+    def __init__(self, app=None):
+        self.app = None
+        self.detect = False
+        self._current = _RequestQueries()
+        self._query_hooks = []
+        self._routes = {}
+        self._slow = deque()
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.detect = app.config['QUERY_STATS_ENABLED']
+        self.headers = app.config['QUERY_STATS_HEADERS'] or app.debug
+        self.slow_seconds = app.config['QUERY_STATS_SLOW_MS'] / 1000
+        self.repeat_threshold = app.config['QUERY_STATS_REPEAT_THRESHOLD']
+        self._slow = deque(maxlen=app.config['QUERY_STATS_SLOW_SAMPLES'])
+        app.extensions['query_stats'] = self
+
+        app.before_request(self._before_request)
+        app.after_request(self._after_request)
+        # This app's engines only: the benchmark harness and loadgen build
+        # several apps in one process, and a listener on the Engine class
+        # would be added once per app and count every statement that often.
+        with app.app_context():
+            engines = list(db.engines.values())
+        for engine in engines:
+            for name, listener in (('before_cursor_execute', self._before_cursor_execute),
+                                   ('after_cursor_execute', self._after_cursor_execute)):
+                if not event.contains(engine, name, listener):
+                    event.listen(engine, name, listener)
+
+    @property
+    def enabled(self):
+        return self.app is not None
+
+    def add_query_hook(self, hook):
+        # hook(seconds) runs after every statement, on the executing thread.
+        if hook not in self._query_hooks:
+            self._query_hooks.append(hook)
+
+    def current(self):
+        # (statements, seconds) of the request on this thread; still valid in
+        # other after_request handlers, whichever order they run in.
+        return self._current.count, self._current.seconds
+
+    def _before_request(self):
+        current = self._current
+        current.active = True
+        current.route = f'{request.method} {request.endpoint or "unmatched"}'
+        current.count = 0
+        current.seconds = 0.0
+        current.slow = 0
+        current.statements = {} if self.detect else None
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - context._query_started
+        for hook in self._query_hooks:
+            hook(elapsed)
+
+        current = self._current
+        if current.active:
+            current.count += 1
+            current.seconds += elapsed
+            if current.statements is not None:
+                current.statements[statement] = current.statements.get(statement, 0) + 1
+        if self.detect and elapsed >= self.slow_seconds:
+            if current.active:
+                current.slow += 1
+            self._record_slow(current.route if current.active else threading.current_thread().name,
+                              statement, elapsed)
+
+    def _record_slow(self, route, statement, elapsed):
+        logger.warning(f"Slow query ({elapsed * 1000:.1f} ms) in {route}: {statement[:STATEMENT_PREVIEW_CHARS]}")
+        with self._lock:
+            self._slow.append({
+                'route': route,
+                'ms': round(elapsed * 1000, 3),
+                'statement': statement[:STATEMENT_PREVIEW_CHARS],
+                'at': datetime.utcnow().isoformat(),
+            })
+
+    def _after_request(self, response):
+        current = self._current
+        if not current.active:
+            return response
+
+        if response.is_streamed:
+            # The body (e.g. the user export) is generated after this
+            # handler, on the same thread; keep counting until the server
+            # closes the response. Headers are already gone by then.
+            response.call_on_close(self._finish)
+            return response
+
+        repeated = self._finish()
+        if self.headers and repeated:
+            response.headers['X-DB-Repeated-Statements'] = str(len(repeated))
+        if self.headers:
+            response.headers['X-DB-Query-Count'] = str(current.count)
+            response.headers['X-DB-Time-Ms'] = f'{current.seconds * 1000:.3f}'
+        return response
+
+    def _finish(self):
+        current = self._current
+        if not current.active:
+            return []
+        current.active = False
+        if not self.detect:
+            return []
+
+        repeated = [(count, statement) for statement, count in current.statements.items()
+                    if count >= self.repeat_threshold]
+        current.statements = None
+        for count, statement in repeated:
+            logger.warning(f"Statement executed {count} times in one request to {current.route}: "
+                           f"{statement[:STATEMENT_PREVIEW_CHARS]}")
+        self._aggregate(current, bool(repeated))
+        return repeated
+
+    def _aggregate(self, current, repeated):
+        with self._lock:
+            stats = self._routes.get(current.route)
+            if stats is None:
+                stats = self._routes[current.route] = _RouteQueries()
+            stats.requests += 1
+            stats.queries += current.count
+            stats.seconds += current.seconds
+            stats.max_queries = max(stats.max_queries, current.count)
+            stats.repeated_requests += repeated
+            stats.slow_queries += current.slow
+
+    def snapshot(self):
+        # Routes by total database time, heaviest first.
+        with self._lock:
+            routes = [stats.to_dict(route) for route, stats in self._routes.items()]
+            slow = list(self._slow)
+        routes.sort(key=lambda route: route['db_ms'], reverse=True)
+        return {'worker': os.getpid(), 'routes': routes, 'slow_queries': slow}
+
+    def reset(self):
+        with self._lock:
+            self._routes = {}
+            self._slow.clear()
+
+
+query_stats = QueryStats()
@@ -0,0 +1,213 @@
+from datetime import timedelta
+
+from sqlalchemy import and_, case, func, or_, select
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+from app.models.log import LogTypeEnum
+from app.models.region_outage import RegionOutage
+from app.models.user import User
+from app.utils.fanout import start_broadcast_job
+from app.utils.logger import log_message
+from app.utils.outages import episode_start
+from app.utils.outbox import enqueue_broadcast
+from config import Config
+
+
+def valid_region(region):
+    return region is None or (isinstance(region, str) and 0 < len(region) <= 64)
+
+
+def _covers(outage, row, window):
+    # Whether the row's outage episode belongs to the regional outage.
+    start = episode_start(row)
+    if start < outage.started_at - window:
+        return False
+    return outage.resolved_at is None or start <= outage.resolved_at
+
+
+def _open(region, started_at, now, affected, total):
+    # Returns the new outage, or None if another worker opened one for the
+    # region first (the partial unique index allows one ACTIVE per region).
+    # ON CONFLICT rather than a savepoint where available: on SQLite,
+    # releasing a savepoint outside an explicit transaction commits it,
+    # which would split the outage from its broadcast rows.
+    values = dict(region=region, status=RegionOutage.STATUS_ACTIVE, started_at=started_at,
+                  detected_at=now, affected_users=affected, total_users=total)
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        dialect_insert = postgresql_insert if dialect == 'postgresql' else sqlite_insert
+        stmt = dialect_insert(RegionOutage).values(**values).on_conflict_do_nothing(
+            index_elements=['region'],
+            index_where=RegionOutage.status == RegionOutage.STATUS_ACTIVE
+        ).returning(RegionOutage.id)
+        outage_id = db.session.execute(stmt).scalar()
+        return None if outage_id is None else db.session.get(RegionOutage, outage_id)
+
+    outage = RegionOutage(**values)
+    try:
+        with db.session.begin_nested():
+            db.session.add(outage)
+    except IntegrityError:
+        return None
+    return outage
+
+
+def _broadcast(app, outage, episode_key, subject, body):
+    # One BCC email per REGION_BROADCAST_BCC_BATCH_SIZE users and one
+    # Telegram message to the region's channel. With outbox delivery the
+    # rows are only added to the session (the caller commits them with the
+    # outage) and None is returned; otherwise a job is started, which needs
+    # the outage committed first, and its id returned.
+    emails = db.session.execute(
+        select(User.email).where(User.has_license.is_(True), User.region == outage.region)
+    ).scalars().all()
+    batch_size = app.config['REGION_BROADCAST_BCC_BATCH_SIZE']
+    email_batches = [emails[start:start + batch_size] for start in range(0, len(emails), batch_size)]
+    # Only missing if the channel was unset while the outage was active.
+    channel = app.config['REGION_TELEGRAM_CHATS'].get(outage.region)
+    body = body.replace('{region}', outage.region)
+
+    if app.config['NOTIFICATION_DELIVERY'] == 'outbox':
+        enqueue_broadcast(outage.id, episode_key, outage.region, email_batches, channel, subject, body)
+        return None
+    return start_broadcast_job(
+        app,
+        email_batches=email_batches,
+        chat_ids=[channel] if channel else [],
+        subject=subject,
+        body=body
+    )
+
+
+def correlate_regions(app, went_offline, recovered, now):
+    # Correlation stage between the state machine and notify_transitions.
+    # A region where at least REGION_OUTAGE_MIN_SHARE of the licensed users
+    # (and REGION_OUTAGE_MIN_USERS) went offline within the last
+    # REGION_OUTAGE_WINDOW_SECONDS becomes one RegionOutage with a single
+    # broadcast; it is resolved, with a single all-clear, once no more than
+    # REGION_OUTAGE_RESOLVE_SHARE of them are still offline. Users covered
+    # by a regional outage are taken out of the rows returned, so their
+    # individual notifications are not sent. Only regions with a channel in
+    # REGION_TELEGRAM_CHATS are correlated, so a broadcast is one Telegram
+    # message however large the region; the others keep per-user
+    # notifications. Queries and sends are per affected region. Returns
+    # (went_offline, recovered, data).
+    data = {'region_outages_opened': [], 'region_outages_resolved': []}
+    if not app.config['REGION_OUTAGES_ENABLED']:
+        return went_offline, recovered, data
+
+    offline_regions = {row.region for row in went_offline if row.region}
+    recovered_regions = {row.region for row in recovered if row.region}
+    if not offline_regions and not recovered_regions:
+        return went_offline, recovered, data
+
+    window = timedelta(seconds=app.config['REGION_OUTAGE_WINDOW_SECONDS'])
+    # Resolved outages still cover users recovering after the all-clear.
+    current = RegionOutage.status == RegionOutage.STATUS_ACTIVE
+    if recovered_regions:
+        earliest = min(episode_start(row) for row in recovered if row.region)
+        current = or_(current, RegionOutage.resolved_at >= earliest)
+    outages = db.session.execute(
+        select(RegionOutage).where(RegionOutage.region.in_(offline_regions | recovered_regions), current)
+    ).scalars().all()
+    active = {outage.region: outage for outage in outages if outage.status == RegionOutage.STATUS_ACTIVE}
+
+    opened = []
+    candidates = {region for region in offline_regions - set(active) if region in app.config['REGION_TELEGRAM_CHATS']}
+    if candidates:
+        just_silent = and_(User.outage_state == User.STATE_OFFLINE, User.outage_state_changed_at >= now - window)
+        counts = db.session.execute(
+            select(User.region, func.count(), func.sum(case((just_silent, 1), else_=0)))
+            .where(User.has_license.is_(True), User.region.in_(candidates))
+            .group_by(User.region)
+        ).all()
+        for region, total, silent in counts:
+            silent = silent or 0
+            if silent < app.config['REGION_OUTAGE_MIN_USERS'] or silent < app.config['REGION_OUTAGE_MIN_SHARE'] * total:
+                continue
+            started_at = min(episode_start(row) for row in went_offline if row.region == region)
+            outage = _open(region, started_at, now, silent, total)
+            if outage is None:
+                outage = db.session.execute(
+                    select(RegionOutage).where(RegionOutage.region == region,
+                                               RegionOutage.status == RegionOutage.STATUS_ACTIVE)
+                ).scalar_one()
+            else:
+                opened.append(outage)
+            active[region] = outage
+
+    individual_offline = []
+    for row in went_offline:
+        outage = active.get(row.region)
+        if outage is None:
+            individual_offline.append(row)
+        elif outage not in opened:
+            # Stragglers of an outage that is already known.
+            outage.affected_users += 1
+
+    covering = [outage for outage in outages if outage.status == RegionOutage.STATUS_RESOLVED] + list(active.values())
+    individual_recovered = [
+        row for row in recovered
+        if not any(outage.region == row.region and _covers(outage, row, window) for outage in covering)
+    ]
+
+    resolved = []
+    for region in recovered_regions & set(active):
+        outage = active[region]
+        still_offline = db.session.execute(
+            select(func.count()).select_from(User).where(
+                User.has_license.is_(True),
+                User.region == region,
+                User.outage_state == User.STATE_OFFLINE,
+                User.outage_state_changed_at >= outage.detected_at - window
+            )
+        ).scalar()
+        if still_offline <= app.config['REGION_OUTAGE_RESOLVE_SHARE'] * outage.total_users:
+            outage.status = RegionOutage.STATUS_RESOLVED
+            outage.resolved_at = now
+            resolved.append(outage)
+
+    broadcasts = [(outage, 'opened', "Bölgesel Kesinti", Config.REGION_MAIL_BODY) for outage in opened]
+    if app.config['OUTAGE_NOTIFY_RECOVERY']:
+        broadcasts += [(outage, 'resolved', "Bölgesel Kesinti Sona Erdi", Config.REGION_RECOVERY_MAIL_BODY)
+                       for outage in resolved]
+
+    if app.config['NOTIFICATION_DELIVERY'] == 'outbox':
+        # Outages and their broadcasts commit together: an outage whose
+        # users were taken out of the per-user lists always has its
+        # broadcast queued.
+        db.session.flush()
+        for outage, episode_key, subject, body in broadcasts:
+            _broadcast(app, outage, episode_key, subject, body)
+        db.session.commit()
+    else:
+        # A job cannot share the transaction; if the process dies before it
+        # starts, the broadcast is lost.
+        db.session.commit()
+        for outage, episode_key, subject, body in broadcasts:
+            job_id = _broadcast(app, outage, episode_key, subject, body)
+            if episode_key == 'opened':
+                outage.job_id = job_id
+            else:
+                outage.recovery_job_id = job_id
+        db.session.commit()
+
+    for outage in opened:
+        log_message(
+            level="INFO",
+            message=f"Regional outage in {outage.region}: {outage.affected_users} of {outage.total_users} users offline.",
+            log_type=LogTypeEnum.REGION_OUTAGE_BROADCAST
+        )
+        data['region_outages_opened'].append(outage.id)
+    for outage in resolved:
+        log_message(
+            level="INFO",
+            message=f"Regional outage in {outage.region} resolved.",
+            log_type=LogTypeEnum.REGION_OUTAGE_BROADCAST
+        )
+        data['region_outages_resolved'].append(outage.id)
+
+    return individual_offline, individual_recovered, data
@@ -0,0 +1,66 @@
+from app.models.log import Log
+from app.models.user import User
+
+
+def isoformat(value):
+    return None if value is None else value.isoformat()
+
+
+def enum_value(value):
+    return None if value is None else value.value
+
+
+class FieldSet:
+    # The JSON fields of an endpoint's items, each read from one column:
+    # name=column, or name=(column, encode) when the value needs converting.
+    # Routes select only `columns` and turn the result rows straight into
+    # dicts, without loading ORM instances or going through to_dict().
+    def __init__(self, **fields):
+        self.names = tuple(fields)
+        self.columns = []
+        self._encoders = []
+        for index, field in enumerate(fields.values()):
+            column, encode = field if isinstance(field, tuple) else (field, None)
+            self.columns.append(column)
+            if encode is not None:
+                self._encoders.append((index, encode))
+
+    def serialize(self, rows):
+        names = self.names
+        encoders = self._encoders
+        if not encoders:
+            return [dict(zip(names, row)) for row in rows]
+
+        items = []
+        for row in rows:
+            values = list(row)
+            for index, encode in encoders:
+                values[index] = encode(values[index])
+            items.append(dict(zip(names, values)))
+        return items
+
+
+# Same output as User.to_dict() and Log.to_dict().
+USERS_LIST_FIELDS = FieldSet(
+    username=User.username,
+    email=User.email,
+    last_request_date=(User.last_request_date, isoformat),
+    has_license=(User.has_license, bool),
+    first_name=User.first_name,
+    last_name=User.last_name,
+    phone_number=User.phone_number,
+    chat_id=User.chat_id,
+    outage_state=User.outage_state,
+    outage_started_at=(User.outage_started_at, isoformat),
+    outage_threshold_seconds=User.outage_threshold_seconds,
+    region=User.region,
+)
+
+LOGS_FIELDS = FieldSet(
+    id=Log.id,
+    timestamp=(Log.timestamp, isoformat),
+    level=Log.level,
+    message=Log.message,
+    username=Log.username,
+    log_type=(Log.log_type, enum_value),
+)
@@ -0,0 +1,48 @@
+import json
+from datetime import datetime
+
+from app import db
+
+USER_FIELDS = (
+    'username', 'email', 'last_request_date', 'has_license',
+    'first_name', 'last_name', 'phone_number', 'chat_id',
+    'outage_state', 'outage_started_at', 'outage_threshold_seconds',
+    'region',
+)
+
+
+def parse_user_fields(fields):
+    if not fields:
+        return USER_FIELDS
+
+    requested = tuple(field.strip() for field in fields.split(',') if field.strip())
+    unknown = [field for field in requested if field not in USER_FIELDS]
+    if unknown or not requested:
+        raise ValueError(f"Unknown user fields: {', '.join(unknown)}")
+    return requested
+
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def stream_users(statement, fields, output_format='ndjson'):
+    # Generator for a streamed response: rows are fetched in yield_per sized
+    # chunks and written out one by one, so memory stays flat whatever the
+    # size of the user table.
+    result = db.session.execute(statement)
+    try:
+        if output_format == 'json':
+            yield '['
+            first = True
+            for row in result:
+                yield ('' if first else ',') + json.dumps(dict(zip(fields, map(_encode, row))))
+                first = False
+            yield ']'
+        else:
+            for row in result:
+                yield json.dumps(dict(zip(fields, map(_encode, row)))) + '\n'
+    finally:
+        result.close()
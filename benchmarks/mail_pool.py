@@ -0,0 +1,102 @@
+"""Compares mail throughput with and without the SMTP session pool.
+
+    python -m benchmarks.mail_pool --messages 200
+    python -m benchmarks.mail_pool --messages 500 --concurrency 4 --connect-latency-ms 80
+
+Sends --messages emails through the notification path against the fake
+SMTP server, once connecting per message (MAIL_POOL_ENABLED=false) and
+once through the pool. --connect-latency-ms stands in for the TCP, TLS
+and AUTH round trips a real server costs per session.
+"""
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.fakes import FakeSMTPServer
+
+MODES = {'per_message': False, 'pool': True}
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--messages', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=1, help='Sending threads (default 1, sequential).')
+    parser.add_argument('--latency-ms', type=float, default=2, help='Fake server delay per message.')
+    parser.add_argument('--connect-latency-ms', type=float, default=40, help='Fake server delay per session.')
+    parser.add_argument('--pool-size', type=int, default=3)
+    parser.add_argument('--output', help='Also write the results to this file.')
+    return parser.parse_args(argv)
+
+
+def run(app, smtp, messages, concurrency):
+    from app.utils.notifications import deliver_email
+
+    def one(i):
+        with app.app_context():
+            deliver_email('Benchmark', f'bench-{i}@example.com', '<p>benchmark</p>')
+
+    sent_before, connections_before = smtp.messages, smtp.connections
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, range(messages)))
+    elapsed = time.perf_counter() - started
+    return {
+        'messages': smtp.messages - sent_before,
+        'sessions': smtp.connections - connections_before,
+        'seconds': round(elapsed, 3),
+        'messages_per_second': round(messages / elapsed, 1),
+    }
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    smtp = FakeSMTPServer(args.latency_ms, connect_latency_ms=args.connect_latency_ms).start()
+    tmpdir = tempfile.mkdtemp(prefix='electric-mail-bench-')
+
+    # config.Config reads these once at import time.
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tmpdir, 'bench.db')}"
+    os.environ.setdefault('ADMIN_KEY', 'benchmark-admin-key')
+    os.environ.setdefault('TELEGRAM_TOKEN', '123456:benchmark')
+    from app import create_app
+    from config import Config
+
+    results = {}
+    try:
+        for name, pooled in MODES.items():
+            app = create_app(type('MailBenchmarkConfig', (Config,), {
+                'MAIL_SERVER': '127.0.0.1',
+                'MAIL_PORT': smtp.port,
+                'MAIL_USE_TLS': False,
+                'MAIL_USE_SSL': False,
+                'MAIL_USERNAME': None,
+                'MAIL_PASSWORD': None,
+                'MAIL_DEFAULT_SENDER': 'benchmark@example.com',
+                'MAIL_POOL_ENABLED': pooled,
+                'MAIL_POOL_SIZE': args.pool_size,
+            }))
+            print(f"Sending {args.messages} messages ({name})...", file=sys.stderr)
+            results[name] = run(app, smtp, args.messages, args.concurrency)
+    finally:
+        smtp.shutdown()
+        shutil.rmtree(tmpdir, ignore_errors=True)
+
+    print(f"{'mode':<14}{'messages':>10}{'sessions':>10}{'seconds':>10}{'msg/s':>9}")
+    for name, result in results.items():
+        print(f"{name:<14}{result['messages']:>10}{result['sessions']:>10}{result['seconds']:>10}"
+              f"{result['messages_per_second']:>9}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write('\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,366 @@
+"""Benchmarks the hot HTTP paths against a seeded database.
+
+    python -m benchmarks.run --users 2000 --logs 50000
+    python -m benchmarks.run --baseline benchmarks/baseline.json --update-baseline
+
+Mail and Telegram go to local fake servers with configurable latency, so
+runs are reproducible and never reach real recipients. The results are
+written as JSON; with a baseline the run fails (exit code 1) when a
+scenario regressed by more than --threshold.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import httpx
+
+from benchmarks.fakes import FakeSMTPServer, FakeTelegramServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ADMIN_KEY = 'benchmark-admin-key'
+LATENCY_KEYS = ('p50', 'p95', 'p99')
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--database-url', help='Empty scratch database to use (default: a temporary SQLite file).')
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--logs', type=int, default=50000)
+    parser.add_argument('--requests', type=int, default=2000, help='Timed requests per scenario.')
+    parser.add_argument('--warmup', type=int, default=50, help='Untimed requests per scenario.')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--periodic-checks', type=int, default=5, help='Timed /admin/periodic-check runs.')
+    parser.add_argument('--offline-batch', type=int, default=50, help='Users taken offline before each periodic check.')
+    parser.add_argument('--smtp-latency-ms', type=float, default=20)
+    parser.add_argument('--telegram-latency-ms', type=float, default=50)
+    parser.add_argument('--scenario', action='append', dest='scenarios',
+                        help='Run only this scenario (repeatable).')
+    parser.add_argument('--set', action='append', default=[], metavar='KEY=VALUE',
+                        help='Override an app config value (JSON values are decoded), e.g. HEARTBEAT_WRITE_BEHIND=true.')
+    parser.add_argument('--output', default=os.path.join(ROOT, 'benchmarks', 'results', 'latest.json'))
+    parser.add_argument('--baseline', help='Baseline results to compare against.')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Allowed relative regression of latency percentiles and throughput (default 0.2).')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0,
+                        help='Ignore latency regressions smaller than this many milliseconds.')
+    parser.add_argument('--update-baseline', action='store_true', help='Write the results to --baseline.')
+    parser.add_argument('--seed', type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def config_overrides(pairs):
+    overrides = {}
+    for pair in pairs:
+        key, _, value = pair.partition('=')
+        try:
+            overrides[key] = json.loads(value)
+        except ValueError:
+            overrides[key] = value
+    return overrides
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(p / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(latencies, errors, elapsed):
+    latencies = sorted(latencies)
+    count = len(latencies)
+    return {
+        'requests': count,
+        'errors': errors,
+        'duration_s': round(elapsed, 3),
+        'throughput_rps': round(count / elapsed, 1) if elapsed else None,
+        'latency_ms': {
+            'mean': round(sum(latencies) / count * 1000, 3) if count else None,
+            'p50': _ms(percentile(latencies, 50)),
+            'p95': _ms(percentile(latencies, 95)),
+            'p99': _ms(percentile(latencies, 99)),
+            'max': _ms(latencies[-1] if latencies else None),
+        },
+    }
+
+
+def _ms(seconds):
+    return None if seconds is None else round(seconds * 1000, 3)
+
+
+class Harness:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.tmpdir = None
+
+    def __enter__(self):
+        args = self.args
+        self.smtp = FakeSMTPServer(args.smtp_latency_ms).start()
+        self.telegram = FakeTelegramServer(args.telegram_latency_ms).start()
+
+        database_url = args.database_url
+        if database_url is None:
+            self.tmpdir = tempfile.mkdtemp(prefix='electric-bench-')
+            database_url = f"sqlite:///{os.path.join(self.tmpdir, 'bench.db')}"
+
+        # config.Config reads these once at import time, and the routes
+        # compare against Config.ADMIN_KEY itself.
+        os.environ['DATABASE_URL'] = database_url
+        os.environ['ADMIN_KEY'] = ADMIN_KEY
+        os.environ['TELEGRAM_TOKEN'] = '123456:benchmark'
+        from app import create_app
+        from config import Config
+
+        overrides = {
+            'MAIL_SERVER': '127.0.0.1',
+            'MAIL_PORT': self.smtp.port,
+            'MAIL_USE_TLS': False,
+            'MAIL_USE_SSL': False,
+            'MAIL_USERNAME': None,
+            'MAIL_PASSWORD': None,
+            'MAIL_DEFAULT_SENDER': 'benchmark@example.com',
+            'TELEGRAM_API_URL': self.telegram.api_url,
+            # The delivery scenario times the in-process job; there is no
+            # outbox worker running next to the benchmark.
+            'NOTIFICATION_DELIVERY': 'job',
+        }
+        overrides.update(config_overrides(args.set))
+        self.app = create_app(type('BenchmarkConfig', (Config,), overrides))
+
+        with self.app.app_context():
+            self._seed()
+
+        from werkzeug.serving import make_server
+        logging.getLogger('werkzeug').setLevel(logging.ERROR)
+        self.server = make_server('127.0.0.1', 0, self.app, threaded=True)
+        threading.Thread(target=self.server.serve_forever, name='benchmark-server', daemon=True).start()
+        self.base_url = f'http://127.0.0.1:{self.server.server_port}'
+        return self
+
+    def __exit__(self, *exc_info):
+        self.server.shutdown()
+        self.smtp.shutdown()
+        self.telegram.shutdown()
+        if self.tmpdir is not None:
+            shutil.rmtree(self.tmpdir, ignore_errors=True)
+
+    def _seed(self):
+        from benchmarks.seed import create_schema, seed_logs, seed_users
+        now = datetime.now()
+        started = time.monotonic()
+        create_schema()
+        seed_users(self.args.users, now)
+        seed_logs(self.args.logs, self.args.users, now, seed=self.args.seed)
+        print(f"Seeded {self.args.users} users and {self.args.logs} logs in {time.monotonic() - started:.1f}s.",
+              file=sys.stderr)
+
+    def drive(self, call, expected_status):
+        # Runs `call(client, i)` for the warmup and then the timed requests
+        # on --concurrency threads, each with its own keep-alive client.
+        local = threading.local()
+        clients = []
+
+        def one(i):
+            client = getattr(local, 'client', None)
+            if client is None:
+                client = local.client = httpx.Client(base_url=self.base_url, timeout=60)
+                clients.append(client)
+            started = time.perf_counter()
+            try:
+                ok = call(client, i).status_code == expected_status
+            except httpx.HTTPError:
+                ok = False
+            return time.perf_counter() - started, ok
+
+        with ThreadPoolExecutor(max_workers=self.args.concurrency) as pool:
+            list(pool.map(one, range(self.args.warmup)))
+            started = time.perf_counter()
+            outcomes = list(pool.map(one, range(self.args.requests)))
+            elapsed = time.perf_counter() - started
+        for client in clients:
+            client.close()
+
+        return summarize([latency for latency, ok in outcomes if ok],
+                         sum(1 for _, ok in outcomes if not ok), elapsed)
+
+    def electric_check(self):
+        from benchmarks.seed import bench_username
+        usernames = [bench_username(self.rng.randrange(self.args.users)) for _ in range(1024)]
+        return self.drive(
+            lambda client, i: client.post('/user/electric-check', json={'username': usernames[i % len(usernames)]}),
+            200
+        )
+
+    def admin_logs(self):
+        return self.drive(
+            lambda client, i: client.get('/admin/logs', headers={
+                'admin-key': ADMIN_KEY, 'X-Page': str(i % 20 + 1), 'X-Per-Page': '50'}),
+            200
+        )
+
+    def admin_users_list(self):
+        return self.drive(lambda client, i: client.get('/admin/users/list', headers={'admin-key': ADMIN_KEY}), 200)
+
+    def admin_periodic_check(self):
+        # Sequential by nature (it runs under a deployment-wide lock). Each
+        # run takes --offline-batch users offline; with job delivery the time
+        # until the fake servers received every notification is reported as
+        # a scenario of its own.
+        from benchmarks.seed import age_users, bench_username
+        silent_for = self.app.config['OUTAGE_OFFLINE_SECONDS'] + 3600
+        batch = min(self.args.offline_batch, self.args.users)
+        latencies, deliveries, errors = [], [], 0
+
+        with httpx.Client(base_url=self.base_url, timeout=300) as client:
+            started = time.perf_counter()
+            for run in range(self.args.periodic_checks):
+                usernames = [bench_username((run * batch + i) % self.args.users) for i in range(batch)]
+                with self.app.app_context():
+                    age_users(usernames, silent_for)
+
+                request_started = time.perf_counter()
+                response = client.get('/admin/periodic-check', headers={'admin-key': ADMIN_KEY})
+                latencies.append(time.perf_counter() - request_started)
+                if response.status_code != 202:
+                    errors += 1
+                    continue
+
+                job_id = response.json()['data'].get('job_id')
+                if job_id is not None:
+                    if self._wait_for_job(client, job_id):
+                        deliveries.append(time.perf_counter() - request_started)
+                    else:
+                        errors += 1
+            elapsed = time.perf_counter() - started
+
+        results = {'admin_periodic_check': summarize(latencies, errors, elapsed)}
+        if deliveries:
+            results['periodic_check_delivery'] = summarize(deliveries, 0, elapsed)
+        return results
+
+    def _wait_for_job(self, client, job_id, timeout=300):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            job = client.get(f'/admin/notification-jobs/{job_id}', headers={'admin-key': ADMIN_KEY}).json()['data']
+            if job['status'] in ('DONE', 'FAILED'):
+                return job['status'] == 'DONE'
+            time.sleep(0.05)
+        return False
+
+
+SCENARIOS = ('electric_check', 'admin_logs', 'admin_users_list', 'admin_periodic_check')
+
+
+def compare(results, baseline, threshold, min_delta_ms):
+    # Returns a description of every regression beyond the threshold.
+    regressions = []
+    for name, base in baseline['scenarios'].items():
+        current = results['scenarios'].get(name)
+        if current is None:
+            continue
+        for key in LATENCY_KEYS:
+            before, after = base['latency_ms'][key], current['latency_ms'][key]
+            if before is None or after is None:
+                continue
+            if after > before * (1 + threshold) and after - before >= min_delta_ms:
+                regressions.append(f"{name}: {key} latency {before}ms -> {after}ms")
+        before, after = base['throughput_rps'], current['throughput_rps']
+        if before and after is not None and after < before * (1 - threshold):
+            regressions.append(f"{name}: throughput {before}/s -> {after}/s")
+        if current['errors'] > base['errors']:
+            regressions.append(f"{name}: errors {base['errors']} -> {current['errors']}")
+    return regressions
+
+
+def print_table(results):
+    print(f"{'scenario':<26}{'req':>7}{'err':>5}{'rps':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, result in results['scenarios'].items():
+        latency = result['latency_ms']
+        print(f"{name:<26}{result['requests']:>7}{result['errors']:>5}{result['throughput_rps'] or 0:>9}"
+              f"{latency['p50'] or 0:>10}{latency['p95'] or 0:>10}{latency['p99'] or 0:>10}")
+
+
+def write_json(path, data):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+        f.write('\n')
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    scenarios = args.scenarios or SCENARIOS
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        print(f"Unknown scenarios: {', '.join(sorted(unknown))}", file=sys.stderr)
+        return 2
+
+    results = {
+        'meta': {
+            'created_at': datetime.utcnow().isoformat(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'database': 'sqlite' if args.database_url is None else args.database_url.split(':', 1)[0],
+            'users': args.users,
+            'logs': args.logs,
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'periodic_checks': args.periodic_checks,
+            'offline_batch': args.offline_batch,
+            'smtp_latency_ms': args.smtp_latency_ms,
+            'telegram_latency_ms': args.telegram_latency_ms,
+            'config': config_overrides(args.set),
+        },
+        'scenarios': {},
+    }
+
+    with Harness(args) as harness:
+        for name in scenarios:
+            print(f"Running {name}...", file=sys.stderr)
+            result = getattr(harness, name)()
+            if 'latency_ms' in result:
+                result = {name: result}
+            results['scenarios'].update(result)
+        results['meta']['fake_smtp_messages'] = harness.smtp.messages
+        results['meta']['fake_telegram_messages'] = harness.telegram.messages
+
+    print_table(results)
+    write_json(args.output, results)
+    print(f"Results written to {args.output}.", file=sys.stderr)
+
+    if args.baseline is None:
+        return 0
+    if args.update_baseline:
+        write_json(args.baseline, results)
+        print(f"Baseline written to {args.baseline}.", file=sys.stderr)
+        return 0
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --update-baseline to create it.", file=sys.stderr)
+        return 0
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    mismatched = [key for key in ('database', 'users', 'logs', 'requests', 'concurrency', 'config')
+                  if baseline['meta'].get(key) != results['meta'][key]]
+    if mismatched:
+        print(f"Warning: baseline was recorded with different {', '.join(mismatched)}.", file=sys.stderr)
+
+    regressions = compare(results, baseline, args.threshold, args.min_delta_ms)
+    for regression in regressions:
+        print(f"REGRESSION {regression}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,77 @@
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+from app import db
+from app.models.log import Log, LogTypeEnum
+from app.models.user import User
+
+CHUNK_SIZE = 5000
+LOG_TYPES = list(LogTypeEnum)
+
+
+def bench_username(i):
+    return f'bench-user-{i:07d}'
+
+
+def create_schema():
+    # The migration chain starts from a pre-existing database, so the
+    # schema is created from the models. log_type's enum is not created
+    # with its table (create_type=False) and needs to exist first on
+    # PostgreSQL.
+    with db.engine.begin() as connection:
+        Log.__table__.c.log_type.type.create(connection, checkfirst=True)
+    db.create_all()
+
+
+def seed_users(count, now):
+    # Every user is licensed and online with a fresh heartbeat.
+    for start in range(0, count, CHUNK_SIZE):
+        db.session.execute(insert(User), [
+            {
+                'username': bench_username(i),
+                'email': f'{bench_username(i)}@example.com',
+                'first_name': 'Bench',
+                'last_name': f'User {i}',
+                'phone_number': f'+90{i:010d}',
+                'chat_id': str(100000 + i),
+                'has_license': True,
+                'last_request_date': now,
+                'outage_state': User.STATE_ONLINE,
+            }
+            for i in range(start, min(start + CHUNK_SIZE, count))
+        ])
+        db.session.commit()
+
+
+def seed_logs(count, users, now, seed=0):
+    # Spread over the last 30 days, a mix of types, most of them per user.
+    rng = random.Random(seed)
+    for start in range(0, count, CHUNK_SIZE):
+        db.session.execute(insert(Log), [
+            {
+                'timestamp': now - timedelta(seconds=rng.randrange(30 * 24 * 3600)),
+                'level': 'INFO',
+                'message': 'Benchmark log row.',
+                'username': bench_username(rng.randrange(users)) if users and rng.random() < 0.8 else None,
+                'log_type': rng.choice(LOG_TYPES),
+            }
+            for _ in range(start, min(start + CHUNK_SIZE, count))
+        ])
+        db.session.commit()
+
+
+def age_users(usernames, seconds):
+    # Puts users back to ONLINE with a heartbeat `seconds` old, so the next
+    # periodic check takes them OFFLINE and notifies them.
+    db.session.execute(
+        db.update(User)
+        .where(User.username.in_(usernames))
+        .values(last_request_date=datetime.now() - timedelta(seconds=seconds),
+                outage_state=User.STATE_ONLINE,
+                outage_started_at=None,
+                outage_state_changed_at=None),
+        execution_options={'synchronize_session': False}
+    )
+    db.session.commit()
@@ -0,0 +1,109 @@
+"""Measures cold-start time and memory of a worker and of a CLI invocation.
+
+    python -m benchmarks.startup --runs 5
+    python -m benchmarks.startup --mode lazy --output benchmarks/results/startup.json
+
+Every run is a fresh interpreter that imports the app, calls create_app()
+and answers a first request, like a new gunicorn worker, or builds the app
+inside a click context, like `flask db upgrade`. It is done with
+LAZY_STARTUP on and off, and the medians are reported.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODES = {'lazy': 'true', 'eager': 'false'}
+KINDS = ('worker', 'cli')
+# Heavy imports LAZY_STARTUP defers; the child reports which were loaded.
+TRACKED_MODULES = ('telegram', 'httpx', 'flasgger', 'flask_mail', 'flask_migrate', 'alembic', 'psutil',
+                   'apscheduler', 'jsonschema', 'yaml')
+
+CHILD = r'''
+import json, resource, sys, time
+started = time.perf_counter()
+import click
+from app import create_app
+imported = time.perf_counter()
+if sys.argv[1] == 'cli':
+    with click.Context(click.Command('db')):
+        app = create_app()
+else:
+    app = create_app()
+created = time.perf_counter()
+response = app.test_client().get('/health-check')
+first_request = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'first_request_ms': (first_request - created) * 1000,
+    'total_ms': (first_request - started) * 1000,
+    'status': response.status_code,
+    'rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    'modules': [name for name in json.loads(sys.argv[2]) if name in sys.modules],
+}))
+'''
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--runs', type=int, default=5, help='Cold starts per mode and kind.')
+    parser.add_argument('--mode', action='append', dest='modes', choices=sorted(MODES),
+                        help='Only this LAZY_STARTUP mode (repeatable).')
+    parser.add_argument('--output', help='Also write the results to this file.')
+    return parser.parse_args(argv)
+
+
+def cold_start(kind, lazy, database_url):
+    env = dict(os.environ,
+               PYTHONPATH=ROOT,
+               DATABASE_URL=database_url,
+               ADMIN_KEY='benchmark-admin-key',
+               TELEGRAM_TOKEN='123456:benchmark',
+               LAZY_STARTUP=lazy,
+               # Keep the background threads from touching the network.
+               HEALTH_PROBE_INTERVAL_SECONDS='3600')
+    completed = subprocess.run([sys.executable, '-c', CHILD, kind, json.dumps(TRACKED_MODULES)],
+                               cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+
+def summarize(samples):
+    summary = {key: round(statistics.median(sample[key] for sample in samples), 1)
+               for key in ('import_ms', 'create_app_ms', 'first_request_ms', 'total_ms', 'rss_mb')}
+    summary['runs'] = len(samples)
+    summary['modules'] = samples[-1]['modules']
+    return summary
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    modes = args.modes or list(MODES)
+    results = {}
+    with tempfile.TemporaryDirectory(prefix='electric-startup-') as tmpdir:
+        database_url = f"sqlite:///{os.path.join(tmpdir, 'startup.db')}"
+        for mode in modes:
+            for kind in KINDS:
+                print(f"Starting {kind} ({mode}) {args.runs} times...", file=sys.stderr)
+                samples = [cold_start(kind, MODES[mode], database_url) for _ in range(args.runs)]
+                results[f'{kind}_{mode}'] = summarize(samples)
+
+    print(f"{'start':<16}{'import ms':>11}{'create ms':>11}{'1st req ms':>12}{'total ms':>10}{'rss MB':>9}  heavy modules")
+    for name, result in results.items():
+        print(f"{name:<16}{result['import_ms']:>11}{result['create_app_ms']:>11}{result['first_request_ms']:>12}"
+              f"{result['total_ms']:>10}{result['rss_mb']:>9}  {', '.join(result['modules']) or '-'}")
+
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write('\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -13,10 +13,104 @@ class Config:
     MAIL_USERNAME = os.environ.get('MAIL_USERNAME')
     MAIL_PASSWORD = os.environ.get('MAIL_PASSWORD')
     MAIL_DEFAULT_SENDER = os.environ.get('MAIL_DEFAULT_SENDER')
+    MAIL_POOL_ENABLED = os.environ.get('MAIL_POOL_ENABLED', 'false').lower() == 'true'
+    MAIL_POOL_SIZE = int(os.environ.get('MAIL_POOL_SIZE', 3))
+    MAIL_POOL_MAX_PER_SESSION = int(os.environ.get('MAIL_POOL_MAX_PER_SESSION', 100))
+    MAIL_POOL_IDLE_SECONDS = int(os.environ.get('MAIL_POOL_IDLE_SECONDS', 60))
     ADMIN_KEY = os.environ.get('ADMIN_KEY')
+    MAX_PER_PAGE = int(os.environ.get('MAX_PER_PAGE', 1000))
     TELEGRAM_TOKEN = os.environ.get('TELEGRAM_TOKEN')
+    TELEGRAM_API_URL = os.environ.get('TELEGRAM_API_URL', 'https://api.telegram.org/bot')
+    TELEGRAM_CONNECTION_POOL_SIZE = int(os.environ.get('TELEGRAM_CONNECTION_POOL_SIZE', 20))
+    TELEGRAM_POOL_TIMEOUT = float(os.environ.get('TELEGRAM_POOL_TIMEOUT', 30))
+    HEALTH_PROBE_INTERVAL_SECONDS = float(os.environ.get('HEALTH_PROBE_INTERVAL_SECONDS', 15))
+    HEALTH_DATABASE_TIMEOUT_SECONDS = float(os.environ.get('HEALTH_DATABASE_TIMEOUT_SECONDS', 2))
+    HEALTH_TELEGRAM_TIMEOUT_SECONDS = float(os.environ.get('HEALTH_TELEGRAM_TIMEOUT_SECONDS', 5))
+    HEALTH_SYSTEM_TIMEOUT_SECONDS = float(os.environ.get('HEALTH_SYSTEM_TIMEOUT_SECONDS', 2))
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+    METRICS_MULTIPROC_DIR = os.environ.get('METRICS_MULTIPROC_DIR')
+    METRICS_FLUSH_SECONDS = float(os.environ.get('METRICS_FLUSH_SECONDS', 5))
+    QUERY_STATS_ENABLED = os.environ.get('QUERY_STATS_ENABLED', 'false').lower() == 'true'
+    QUERY_STATS_HEADERS = os.environ.get('QUERY_STATS_HEADERS', 'false').lower() == 'true'
+    QUERY_STATS_SLOW_MS = float(os.environ.get('QUERY_STATS_SLOW_MS', 250))
+    QUERY_STATS_REPEAT_THRESHOLD = int(os.environ.get('QUERY_STATS_REPEAT_THRESHOLD', 5))
+    QUERY_STATS_SLOW_SAMPLES = int(os.environ.get('QUERY_STATS_SLOW_SAMPLES', 50))
+    PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'true').lower() == 'true'
+    PROFILE_DIR = os.environ.get('PROFILE_DIR')
+    PROFILE_MAX_ARTIFACTS = int(os.environ.get('PROFILE_MAX_ARTIFACTS', 50))
+    PROFILE_SAMPLE_RATE = float(os.environ.get('PROFILE_SAMPLE_RATE', 0))
+    PROFILE_SAMPLE_INTERVAL_MS = float(os.environ.get('PROFILE_SAMPLE_INTERVAL_MS', 5))
+    JSON_PROVIDER = os.environ.get('JSON_PROVIDER', 'orjson')
+    LAZY_STARTUP = os.environ.get('LAZY_STARTUP', 'true').lower() == 'true'
+    ASYNC_RUNNER_SHUTDOWN_TIMEOUT = float(os.environ.get('ASYNC_RUNNER_SHUTDOWN_TIMEOUT', 5))
     SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    HEARTBEAT_WRITE_BEHIND = os.environ.get('HEARTBEAT_WRITE_BEHIND', 'false').lower() == 'true'
+    HEARTBEAT_FLUSH_INTERVAL_MS = int(os.environ.get('HEARTBEAT_FLUSH_INTERVAL_MS', 1000))
+    HEARTBEAT_FLUSH_MAX_ENTRIES = int(os.environ.get('HEARTBEAT_FLUSH_MAX_ENTRIES', 500))
+    HEARTBEAT_BATCH_MAX_ENTRIES = int(os.environ.get('HEARTBEAT_BATCH_MAX_ENTRIES', 5000))
+    LICENSE_INDEX_ENABLED = os.environ.get('LICENSE_INDEX_ENABLED', 'false').lower() == 'true'
+    LICENSE_INDEX_PATH = os.environ.get('LICENSE_INDEX_PATH')
+    LICENSE_INDEX_CAPACITY = int(os.environ.get('LICENSE_INDEX_CAPACITY', 262144))
+    LICENSE_INDEX_RECONCILE_SECONDS = int(os.environ.get('LICENSE_INDEX_RECONCILE_SECONDS', 300))
+    NOTIFICATION_CONCURRENCY = int(os.environ.get('NOTIFICATION_CONCURRENCY', 20))
+    TELEGRAM_GLOBAL_RATE = float(os.environ.get('TELEGRAM_GLOBAL_RATE', 30))
+    TELEGRAM_PER_CHAT_INTERVAL = float(os.environ.get('TELEGRAM_PER_CHAT_INTERVAL', 1.0))
+    NOTIFICATION_DELIVERY = os.environ.get('NOTIFICATION_DELIVERY', 'outbox')
+    OUTBOX_WORKERS = int(os.environ.get('OUTBOX_WORKERS', 4))
+    OUTBOX_BATCH_SIZE = int(os.environ.get('OUTBOX_BATCH_SIZE', 50))
+    OUTBOX_POLL_INTERVAL = float(os.environ.get('OUTBOX_POLL_INTERVAL', 2.0))
+    OUTBOX_MAX_ATTEMPTS = int(os.environ.get('OUTBOX_MAX_ATTEMPTS', 8))
+    OUTBOX_BACKOFF_BASE_SECONDS = float(os.environ.get('OUTBOX_BACKOFF_BASE_SECONDS', 30))
+    OUTBOX_BACKOFF_MAX_SECONDS = float(os.environ.get('OUTBOX_BACKOFF_MAX_SECONDS', 3600))
+    OUTBOX_CLAIM_TIMEOUT_SECONDS = int(os.environ.get('OUTBOX_CLAIM_TIMEOUT_SECONDS', 300))
+    OUTAGE_SUSPECT_SECONDS = int(os.environ.get('OUTAGE_SUSPECT_SECONDS', 1800))
+    OUTAGE_OFFLINE_SECONDS = int(os.environ.get('OUTAGE_OFFLINE_SECONDS', 7200))
+    PERIODIC_CHECK_SCHEDULER = os.environ.get('PERIODIC_CHECK_SCHEDULER', 'false').lower() == 'true'
+    PERIODIC_CHECK_INTERVAL_SECONDS = int(os.environ.get('PERIODIC_CHECK_INTERVAL_SECONDS', 300))
+    OUTAGE_DETECTOR_ENABLED = os.environ.get('OUTAGE_DETECTOR_ENABLED', 'false').lower() == 'true'
+    OUTAGE_DETECTOR_TICK_SECONDS = float(os.environ.get('OUTAGE_DETECTOR_TICK_SECONDS', 1.0))
+    OUTAGE_DETECTOR_LEADER_RETRY_SECONDS = float(os.environ.get('OUTAGE_DETECTOR_LEADER_RETRY_SECONDS', 15))
+    OUTAGE_NOTIFY_RECOVERY = os.environ.get('OUTAGE_NOTIFY_RECOVERY', 'true').lower() == 'true'
+    REGION_OUTAGES_ENABLED = os.environ.get('REGION_OUTAGES_ENABLED', 'true').lower() == 'true'
+    REGION_OUTAGE_MIN_USERS = int(os.environ.get('REGION_OUTAGE_MIN_USERS', 5))
+    REGION_OUTAGE_MIN_SHARE = float(os.environ.get('REGION_OUTAGE_MIN_SHARE', 0.5))
+    REGION_OUTAGE_WINDOW_SECONDS = int(os.environ.get('REGION_OUTAGE_WINDOW_SECONDS', 900))
+    REGION_OUTAGE_RESOLVE_SHARE = float(os.environ.get('REGION_OUTAGE_RESOLVE_SHARE', 0.1))
+    REGION_BROADCAST_BCC_BATCH_SIZE = int(os.environ.get('REGION_BROADCAST_BCC_BATCH_SIZE', 500))
+    # region=chat_id pairs, e.g. "kadikoy-f12=-1001234567890,besiktas-f03=-1009876543210";
+    # only regions listed here are treated as regional outages.
+    REGION_TELEGRAM_CHATS = dict(
+        item.strip().split('=', 1)
+        for item in os.environ.get('REGION_TELEGRAM_CHATS', '').split(',') if '=' in item
+    )
+    LOG_RETENTION_GROUPS = {
+        'electric_check': {
+            'interval': os.environ.get('LOG_PARTITION_INTERVAL_ELECTRIC_CHECK', 'day'),
+            'retention_days': int(os.environ.get('LOG_RETENTION_DAYS_ELECTRIC_CHECK', 7)),
+        },
+        'security': {
+            'interval': os.environ.get('LOG_PARTITION_INTERVAL_SECURITY', 'month'),
+            'retention_days': int(os.environ.get('LOG_RETENTION_DAYS_SECURITY', 365)),
+        },
+        'default': {
+            'interval': os.environ.get('LOG_PARTITION_INTERVAL_DEFAULT', 'month'),
+            'retention_days': int(os.environ.get('LOG_RETENTION_DAYS_DEFAULT', 90)),
+        },
+    }
+    LOG_PARTITIONS_AHEAD = int(os.environ.get('LOG_PARTITIONS_AHEAD', 3))
+    LOG_ARCHIVE_DIR = os.environ.get('LOG_ARCHIVE_DIR')
+    LOG_ROLLUPS_ENABLED = os.environ.get('LOG_ROLLUPS_ENABLED', 'true').lower() == 'true'
+    LOG_ROLLUP_INTERVAL_SECONDS = float(os.environ.get('LOG_ROLLUP_INTERVAL_SECONDS', 60))
+    LOG_ROLLUP_BATCH_SIZE = int(os.environ.get('LOG_ROLLUP_BATCH_SIZE', 50000))
+    LOG_ROLLUP_SAFETY_LAG_SECONDS = float(os.environ.get('LOG_ROLLUP_SAFETY_LAG_SECONDS', 30))
+    LOG_ROLLUP_GAP_TIMEOUT_SECONDS = float(os.environ.get('LOG_ROLLUP_GAP_TIMEOUT_SECONDS', 600))
+    LOG_SINK = os.environ.get('LOG_SINK', 'sync')
+    LOG_SINK_QUEUE_SIZE = int(os.environ.get('LOG_SINK_QUEUE_SIZE', 10000))
+    LOG_SINK_BATCH_SIZE = int(os.environ.get('LOG_SINK_BATCH_SIZE', 200))
+    LOG_SINK_FLUSH_INTERVAL_MS = int(os.environ.get('LOG_SINK_FLUSH_INTERVAL_MS', 500))
+    LOG_SINK_FULL_POLICY = os.environ.get('LOG_SINK_FULL_POLICY', 'drop')
+    LOG_SINK_BLOCK_TIMEOUT_MS = int(os.environ.get('LOG_SINK_BLOCK_TIMEOUT_MS', 100))
     SWAGGER = {
         'title': 'Electric Checker API',
         'uiversion': 3,
@@ -42,3 +136,54 @@ class Config:
                 </body>
                 </html>
                 """
+    RECOVERY_MAIL_BODY = """<!DOCTYPE html>
+                <html lang="tr">
+                <head>
+                    <meta charset="UTF-8">
+                    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+                    <title>Elektrik Bağlantısı Yeniden Sağlandı</title>
+                </head>
+                <body style="font-family: Arial, sans-serif; background-color: #f4f4f4; padding: 20px;">
+                    <div style="max-width: 600px; margin: 0 auto; background-color: #fff; padding: 20px; border-radius: 8px; box-shadow: 0 0 10px rgba(0, 0, 0, 0.1);">
+                        <h2 style="color: #5cb85c;">Bağlantı Sağlandı</h2>
+                        <p>Değerli Kullanıcımız,</p>
+                        <p>Elektrik bağlantınıza yeniden ulaşabiliyoruz. Kesinti sona ermiş görünüyor.</p>
+                        <p>Herhangi bir sorunuz olursa size yardımcı olmaktan memnuniyet duyarız.</p>
+                    </div>
+                </body>
+                </html>
+                """
+    REGION_MAIL_BODY = """<!DOCTYPE html>
+                <html lang="tr">
+                <head>
+                    <meta charset="UTF-8">
+                    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+                    <title>Bölgesel Elektrik Kesintisi Hakkında Bilgilendirme</title>
+                </head>
+                <body style="font-family: Arial, sans-serif; background-color: #f4f4f4; padding: 20px;">
+                    <div style="max-width: 600px; margin: 0 auto; background-color: #fff; padding: 20px; border-radius: 8px; box-shadow: 0 0 10px rgba(0, 0, 0, 0.1);">
+                        <h2 style="color: #d9534f;">Bölgesel Kesinti</h2>
+                        <p>Değerli Kullanıcımız,</p>
+                        <p>{region} bölgesindeki kullanıcılarımızın büyük bölümüne aynı anda ulaşamıyoruz. Bölgenizde genel bir elektrik kesintisi yaşanıyor olabilir.</p>
+                        <p>Kesinti sona erdiğinde sizi ayrıca bilgilendireceğiz.</p>
+                    </div>
+                </body>
+                </html>
+                """
+    REGION_RECOVERY_MAIL_BODY = """<!DOCTYPE html>
+                <html lang="tr">
+                <head>
+                    <meta charset="UTF-8">
+                    <meta name="viewport" content="width=device-width, initial-scale=1.0">
+                    <title>Bölgesel Elektrik Kesintisi Sona Erdi</title>
+                </head>
+                <body style="font-family: Arial, sans-serif; background-color: #f4f4f4; padding: 20px;">
+                    <div style="max-width: 600px; margin: 0 auto; background-color: #fff; padding: 20px; border-radius: 8px; box-shadow: 0 0 10px rgba(0, 0, 0, 0.1);">
+                        <h2 style="color: #5cb85c;">Bölgesel Kesinti Sona Erdi</h2>
+                        <p>Değerli Kullanıcımız,</p>
+                        <p>{region} bölgesindeki kullanıcılarımızın büyük bölümüne yeniden ulaşabiliyoruz. Bölgesel kesinti sona ermiş görünüyor.</p>
+                        <p>Herhangi bir sorunuz olursa size yardımcı olmaktan memnuniyet duyarız.</p>
+                    </div>
+                </body>
+                </html>
+                """
@@ -0,0 +1,46 @@
+"""add hot path indexes
+
+Revision ID: 5d4a8e1f0c27
+Revises: 2f8d6b3e9a41
+Create Date: 2026-10-18 11:20:52.904113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d4a8e1f0c27'
+down_revision = '2f8d6b3e9a41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Built CONCURRENTLY on PostgreSQL so heartbeats and log writes keep
+    # flowing while the indexes are created on large tables.
+    concurrently = op.get_bind().dialect.name == 'postgresql'
+    with op.get_context().autocommit_block():
+        op.create_index('ix_log_timestamp_id', 'log',
+                        [sa.text('timestamp DESC'), sa.text('id DESC')],
+                        unique=False, postgresql_concurrently=concurrently)
+        op.create_index('ix_log_log_type_timestamp_id', 'log',
+                        ['log_type', sa.text('timestamp DESC'), sa.text('id DESC')],
+                        unique=False, postgresql_concurrently=concurrently)
+        op.create_index('ix_log_username_timestamp_id', 'log',
+                        ['username', sa.text('timestamp DESC'), sa.text('id DESC')],
+                        unique=False, postgresql_concurrently=concurrently)
+        op.create_index('ix_user_licensed_last_request_date', 'user',
+                        ['last_request_date'],
+                        unique=False, postgresql_concurrently=concurrently,
+                        postgresql_where=sa.text('has_license IS true'),
+                        sqlite_where=sa.text('has_license IS 1'))
+
+
+def downgrade():
+    concurrently = op.get_bind().dialect.name == 'postgresql'
+    with op.get_context().autocommit_block():
+        op.drop_index('ix_user_licensed_last_request_date', table_name='user', postgresql_concurrently=concurrently)
+        op.drop_index('ix_log_username_timestamp_id', table_name='log', postgresql_concurrently=concurrently)
+        op.drop_index('ix_log_log_type_timestamp_id', table_name='log', postgresql_concurrently=concurrently)
+        op.drop_index('ix_log_timestamp_id', table_name='log', postgresql_concurrently=concurrently)
@@ -0,0 +1,104 @@
+"""partition log table
+
+Revision ID: 8e3b1c6f2d90
+Revises: 5d4a8e1f0c27
+Create Date: 2026-10-18 14:05:31.417260
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8e3b1c6f2d90'
+down_revision = '5d4a8e1f0c27'
+branch_labels = None
+depends_on = None
+
+# Retention groups as of this revision, frozen here so the migration does
+# not change when app.models.log.LOG_RETENTION_GROUP_TYPES does.
+LOG_RETENTION_GROUP_TYPES = {
+    'electric_check': [
+        'ELECTRIC_CHECK_SUCCESS',
+        'ELECTRIC_CHECK_USER_NOT_FOUND',
+        'ELECTRIC_CHECK_INVALID_REQUEST',
+        'ELECTRIC_CHECK_RETRIEVAL',
+    ],
+    'security': [
+        'SECURITY_UNAUTHORIZED_ACCESS',
+        'SECURITY_LOGIN_FAILURE',
+        'SECURITY_PASSWORD_RESET',
+    ],
+}
+
+LOG_INDEXES = (
+    ('ix_log_timestamp_id', [sa.text('timestamp DESC'), sa.text('id DESC')]),
+    ('ix_log_log_type_timestamp_id', ['log_type', sa.text('timestamp DESC'), sa.text('id DESC')]),
+    ('ix_log_username_timestamp_id', ['username', sa.text('timestamp DESC'), sa.text('id DESC')]),
+)
+
+
+def upgrade():
+    # PostgreSQL only: log becomes LIST-partitioned by retention group, each
+    # group RANGE-partitioned by timestamp. Time partitions are created by
+    # `flask logs create-partitions`; until then rows land in the group's
+    # default partition. Other databases keep the plain table and are pruned
+    # with DELETEs. Rewrites the whole table, so run it in a maintenance window.
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    for name, _ in LOG_INDEXES:
+        op.drop_index(name, table_name='log')
+    op.execute('ALTER TABLE log RENAME TO log_unpartitioned')
+    op.execute('ALTER TABLE log_unpartitioned ALTER COLUMN id DROP DEFAULT')
+
+    op.execute("""
+        CREATE TABLE log (
+            id INTEGER NOT NULL DEFAULT nextval('log_id_seq'),
+            timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            level VARCHAR(20) NOT NULL,
+            message VARCHAR(500) NOT NULL,
+            username VARCHAR(36) REFERENCES "user" (username),
+            log_type logtypeenum NOT NULL,
+            PRIMARY KEY (id, log_type, timestamp)
+        ) PARTITION BY LIST (log_type)
+    """)
+    for group, types in LOG_RETENTION_GROUP_TYPES.items():
+        values = ', '.join(f"'{log_type}'" for log_type in types)
+        op.execute(f'CREATE TABLE log_{group} PARTITION OF log FOR VALUES IN ({values}) PARTITION BY RANGE (timestamp)')
+        op.execute(f'CREATE TABLE log_{group}_default PARTITION OF log_{group} DEFAULT')
+    op.execute('CREATE TABLE log_default PARTITION OF log DEFAULT PARTITION BY RANGE (timestamp)')
+    op.execute('CREATE TABLE log_default_default PARTITION OF log_default DEFAULT')
+
+    op.execute('INSERT INTO log (id, timestamp, level, message, username, log_type) '
+               'SELECT id, timestamp, level, message, username, log_type FROM log_unpartitioned')
+    op.execute('ALTER SEQUENCE log_id_seq OWNED BY log.id')
+    op.execute('DROP TABLE log_unpartitioned')
+
+    for name, columns in LOG_INDEXES:
+        op.create_index(name, 'log', columns, unique=False)
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.execute('ALTER TABLE log RENAME TO log_partitioned')
+    op.execute('ALTER TABLE log_partitioned ALTER COLUMN id DROP DEFAULT')
+    op.execute("""
+        CREATE TABLE log (
+            id INTEGER NOT NULL DEFAULT nextval('log_id_seq') PRIMARY KEY,
+            timestamp TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            level VARCHAR(20) NOT NULL,
+            message VARCHAR(500) NOT NULL,
+            username VARCHAR(36) REFERENCES "user" (username),
+            log_type logtypeenum NOT NULL
+        )
+    """)
+    op.execute('INSERT INTO log (id, timestamp, level, message, username, log_type) '
+               'SELECT id, timestamp, level, message, username, log_type FROM log_partitioned')
+    op.execute('ALTER SEQUENCE log_id_seq OWNED BY log.id')
+    op.execute('DROP TABLE log_partitioned CASCADE')
+
+    for name, columns in LOG_INDEXES:
+        op.create_index(name, 'log', columns, unique=False)
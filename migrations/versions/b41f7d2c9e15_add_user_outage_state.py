@@ -0,0 +1,37 @@
+"""add user outage state
+
+Revision ID: b41f7d2c9e15
+Revises: 8e3b1c6f2d90
+Create Date: 2026-10-18 15:12:47.602318
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b41f7d2c9e15'
+down_revision = '8e3b1c6f2d90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('outage_state', sa.String(length=16), nullable=False, server_default='ONLINE'))
+        batch_op.add_column(sa.Column('outage_started_at', sa.DateTime(), nullable=True))
+        batch_op.add_column(sa.Column('outage_state_changed_at', sa.DateTime(), nullable=True))
+
+    op.create_index('ix_user_licensed_outage_state_last_request_date', 'user',
+                    ['outage_state', 'last_request_date'],
+                    unique=False,
+                    postgresql_where=sa.text('has_license IS true'),
+                    sqlite_where=sa.text('has_license IS 1'))
+
+
+def downgrade():
+    op.drop_index('ix_user_licensed_outage_state_last_request_date', table_name='user')
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('outage_state_changed_at')
+        batch_op.drop_column('outage_started_at')
+        batch_op.drop_column('outage_state')
@@ -0,0 +1,30 @@
+"""add region outage broadcast log type
+
+Revision ID: d4f8a2c6e1b9
+Revises: 9b2f6d4e1a73
+Create Date: 2026-10-19 09:14:27.503861
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f8a2c6e1b9'
+down_revision = '9b2f6d4e1a73'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # PostgreSQL only: other databases store log_type as a plain string.
+    # ADD VALUE cannot be used in the transaction that adds it.
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    with op.get_context().autocommit_block():
+        op.execute("ALTER TYPE logtypeenum ADD VALUE IF NOT EXISTS 'REGION_OUTAGE_BROADCAST'")
+
+
+def downgrade():
+    # PostgreSQL cannot drop a value from an enum type; the unused value stays.
+    pass
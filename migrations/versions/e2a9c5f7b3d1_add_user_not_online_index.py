@@ -0,0 +1,28 @@
+"""add user not online index
+
+Revision ID: e2a9c5f7b3d1
+Revises: d4f8a2c6e1b9
+Create Date: 2026-10-19 10:02:51.774302
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2a9c5f7b3d1'
+down_revision = 'd4f8a2c6e1b9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_user_licensed_not_online_outage_state', 'user',
+                    ['outage_state', 'last_request_date'],
+                    unique=False,
+                    postgresql_where=sa.text("has_license IS true AND outage_state != 'ONLINE'"),
+                    sqlite_where=sa.text("has_license IS 1 AND outage_state != 'ONLINE'"))
+
+
+def downgrade():
+    op.drop_index('ix_user_licensed_not_online_outage_state', table_name='user')